@@ -0,0 +1,336 @@
+import argparse
+import ast
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import urllib.request
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from models.client_key_value_store import ClientKeyValueStore
+from models.local_cluster import LocalCluster
+from utils.constants import Constants
+from utils.exceptions import ClusterStartupException, ServerDiscovererNotFoundException, ServersNotFoundException
+from utils.logger import logger
+from utils.workload import Workload
+
+WORKLOADS = {
+    'a': 0.5,
+    'b': 0.95,
+    'c': 1.0,
+}
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark a local DUR cluster with YCSB-style transactions.')
+
+    parser.add_argument('--replicas', type=int, default=3, help='Replicas started by the local cluster')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent clients')
+    parser.add_argument('--processes', type=int, default=1, help='Processes the clients are spread across')
+    parser.add_argument('--in-process', action='store_true', help='Run the cluster in threads of the benchmark process')
+    parser.add_argument('--external', action='store_true', help='Use a cluster that is already running instead of starting one')
+    parser.add_argument('--workload', choices=sorted(WORKLOADS), help='YCSB core workload preset for the read proportion')
+    parser.add_argument('--read-proportion', type=float, default=0.95, help='Probability of each operation being a read')
+    parser.add_argument('--pipeline', type=int, default=1, help='Commits each client keeps in flight')
+    parser.add_argument('--operations', type=int, default=4, help='Operations per transaction')
+    parser.add_argument('--keys', type=int, default=1000, help='Keys loaded before the run')
+    parser.add_argument('--value-size', type=int, default=100, help='Size in bytes of the written values')
+    parser.add_argument('--zipf', type=float, default=0.99, help='Zipfian skew of the key choice (0 is uniform)')
+    parser.add_argument('--duration', type=float, default=10, help='Measured time in seconds')
+    parser.add_argument('--warmup', type=float, default=2, help='Time in seconds before measurements start')
+    parser.add_argument('--output', help='File the JSON results are written to (default: standard output)')
+    parser.add_argument('--log-level', default='ERROR', help='Log level of the benchmark and of the cluster')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE', help='Override a constant, e.g. --set CLIENT_HEDGED_READS=True')
+
+    arguments = parser.parse_args()
+
+    if arguments.workload is not None:
+        arguments.read_proportion = WORKLOADS[arguments.workload]
+
+    return arguments
+
+def parse_overrides(assignments):
+    overrides = {}
+
+    for assignment in assignments:
+        name, _, value = assignment.partition('=')
+
+        if not hasattr(Constants, name):
+            raise ValueError(f'Unknown constant {name}')
+
+        try:
+            overrides[name] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            overrides[name] = value
+
+    return overrides
+
+def configure(overrides, log_level):
+    for name, value in overrides.items():
+        setattr(Constants, name, value)
+
+    logger.setLevel(getattr(logging, log_level.upper()))
+
+def serve(arguments):
+    log_level, assignments, (role, id) = arguments[0], arguments[1:-2], arguments[-2:]
+    configure(parse_overrides(assignments), log_level)
+
+    LocalCluster.run_role(role, int(id))
+    os._exit(0)
+
+def percentiles(latencies):
+    if not latencies:
+        return {'count': 0}
+
+    latencies = sorted(latencies)
+    summary = {'count': len(latencies), 'mean': sum(latencies) / len(latencies)}
+
+    for percentile in (50, 95, 99):
+        summary[f'p{percentile}'] = latencies[min(len(latencies) - 1, len(latencies) * percentile // 100)]
+
+    summary['max'] = latencies[-1]
+    return summary
+
+def load(workload):
+    logger.info(f'Loading the initial data in transactions of {Constants.BENCHMARK_LOAD_BATCH_SIZE} items.')
+    db = ClientKeyValueStore(0)
+
+    for index, (key, value) in enumerate(workload.items(), start=1):
+        db.write(key, value)
+
+        if index % Constants.BENCHMARK_LOAD_BATCH_SIZE == 0 and not db.commit():
+            raise RuntimeError('Loading the initial data failed')
+
+    if not db.commit():
+        raise RuntimeError('Loading the initial data failed')
+
+    db.close()
+
+def new_results():
+    return {'commits': 0, 'aborts': 0, 'unknown': 0, 'errors': 0, 'read': [], 'commit': [], 'transaction': [], 'client_counters': {}}
+
+def merge(results, outcome):
+    for name, value in outcome.items():
+        if name == 'client_counters':
+            for counter, count in value.items():
+                results[name][counter] = results[name].get(counter, 0) + count
+        else:
+            results[name] += value
+
+def record(outcome, lock, read, updated, started, commit_started, future):
+    committed = future.result()
+    finished = time.monotonic()
+
+    with lock:
+        outcome['read'].extend(read)
+
+        if committed is None:
+            outcome['unknown'] += 1
+            return
+
+        if updated:
+            outcome['commit'].append(finished - commit_started)
+
+        if committed:
+            outcome['commits'] += 1
+            outcome['transaction'].append(finished - started)
+        else:
+            outcome['aborts'] += 1
+
+def run_client(id, settings, start, results, lock):
+    workload = Workload(settings['keys'], settings['read_proportion'], settings['operations'], settings['value_size'], settings['zipf'], seed=id)
+    db = ClientKeyValueStore(id)
+
+    measured_from = start + settings['warmup']
+    deadline = measured_from + settings['duration']
+    outcome = new_results()
+    outcome_lock = threading.Lock()
+    in_flight = deque()
+
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        read, updated = [], False
+
+        try:
+            for operation, key in workload.transaction():
+                if operation == 'read':
+                    read_started = time.monotonic()
+                    db.read(key)
+                    read.append(time.monotonic() - read_started)
+                else:
+                    db.write(key, workload.value())
+                    updated = True
+
+            commit_started = time.monotonic()
+            future = db.commit_async()
+        except Exception as e:
+            logger.error(f'Benchmark client {id} -> Transaction failed: {e}')
+            db.abort()
+
+            if started >= measured_from:
+                with outcome_lock:
+                    outcome['errors'] += 1
+            continue
+
+        if started >= measured_from:
+            future.add_done_callback(partial(record, outcome, outcome_lock, read, updated, started, commit_started))
+
+        in_flight.append(future)
+        while len(in_flight) >= settings['pipeline']:
+            in_flight.popleft().result()
+
+    for future in in_flight:
+        future.result()
+
+    for name, value in db.metrics()['counters'].items():
+        outcome['client_counters'][name] = value
+
+    db.close()
+
+    with lock, outcome_lock:
+        merge(results, outcome)
+
+def run_clients(ids, settings, overrides, log_level, start):
+    configure(overrides, log_level)
+
+    results = new_results()
+    lock = threading.Lock()
+
+    threads = [threading.Thread(target=run_client, args=(id, settings, start, results, lock)) for id in ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+def benchmark(arguments, overrides):
+    settings = {
+        'keys': arguments.keys,
+        'read_proportion': arguments.read_proportion,
+        'operations': arguments.operations,
+        'value_size': arguments.value_size,
+        'zipf': arguments.zipf,
+        'pipeline': max(1, arguments.pipeline),
+        'warmup': arguments.warmup,
+        'duration': arguments.duration,
+    }
+
+    load(Workload(arguments.keys, arguments.read_proportion, arguments.operations, arguments.value_size, arguments.zipf))
+    logger.info(f'Running {arguments.clients} clients for {arguments.warmup} + {arguments.duration} seconds.')
+
+    processes = max(1, min(arguments.processes, arguments.clients))
+    ids = [list(range(1 + process, 1 + arguments.clients, processes)) for process in range(processes)]
+    start = time.monotonic()
+
+    if processes == 1:
+        parts = [run_clients(ids[0], settings, overrides, arguments.log_level, start)]
+    else:
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as executor:
+            parts = list(executor.map(run_clients, ids, [settings] * processes, [overrides] * processes, [arguments.log_level] * processes, [start] * processes))
+
+    results = new_results()
+    for part in parts:
+        merge(results, part)
+
+    finished = results['commits'] + results['aborts']
+
+    return {
+        'configuration': {
+            'replicas': arguments.replicas,
+            'clients': arguments.clients,
+            'processes': processes,
+            'in_process': arguments.in_process,
+            'external': arguments.external,
+            'server_mode': Constants.SERVER_MODE,
+            'storage_backend': Constants.STORAGE_BACKEND,
+            'overrides': overrides,
+            **settings,
+        },
+        'commits': results['commits'],
+        'aborts': results['aborts'],
+        'unknown': results['unknown'],
+        'errors': results['errors'],
+        'commits_per_second': results['commits'] / arguments.duration,
+        'abort_rate': results['aborts'] / finished if finished else 0,
+        'latency': {
+            'read': percentiles(results['read']),
+            'commit': percentiles(results['commit']),
+            'transaction': percentiles(results['transaction']),
+        },
+        'client_counters': dict(sorted(results['client_counters'].items())),
+        'metrics': scrape_metrics(arguments.replicas) if Constants.METRICS_ENABLED else {},
+    }
+
+def scrape_metrics(replicas):
+    ports = {'sequencer': Constants.METRICS_SERVER_SEQUENCER_PORT}
+    ports.update({f'server{id}': Constants.METRICS_SERVER_KEY_VALUE_STORE_BASE_PORT + id for id in range(replicas)})
+
+    metrics = {}
+
+    for role, port in ports.items():
+        try:
+            with urllib.request.urlopen(f'http://{Constants.METRICS_ADDRESS}:{port}/metrics.json', timeout=Constants.BENCHMARK_STOP_TIMEOUT) as response:
+                metrics[role] = json.load(response)
+        except OSError as e:
+            logger.warning(f'Could not scrape the metrics of {role}: {e}')
+
+    return metrics
+
+def report(results, output):
+    for name, summary in results['latency'].items():
+        if summary['count']:
+            print(f'{name:<12} count {summary["count"]:>8}  p50 {1000 * summary["p50"]:8.3f} ms  p95 {1000 * summary["p95"]:8.3f} ms  p99 {1000 * summary["p99"]:8.3f} ms', file=sys.stderr)
+
+    print(f'{results["commits_per_second"]:.1f} commits/s, abort rate {100 * results["abort_rate"]:.2f}%, {results["unknown"]} unknown outcomes, {results["errors"]} errors', file=sys.stderr)
+
+    for role, metrics in results['metrics'].items():
+        for name, histogram in metrics['histograms'].items():
+            if histogram['count'] and name.endswith('_seconds'):
+                p99 = '+Inf' if histogram['p99'] is None else f'{1000 * histogram["p99"]:.3f}'
+                print(f'{role:<10} {name:<32} count {histogram["count"]:>8}  mean {1000 * histogram["sum"] / histogram["count"]:8.3f} ms  p99 <= {p99:>8} ms', file=sys.stderr)
+
+    data = json.dumps(results, indent=2)
+
+    if output is None:
+        print(data)
+        sys.stdout.flush()
+        return
+
+    with open(output, 'w') as file:
+        file.write(data + '\n')
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        serve(sys.argv[2:])
+        return
+
+    arguments = parse_arguments()
+    overrides = {'EXAMPLE_INSTACE': Constants.BENCHMARK_EXAMPLE_INSTANCE, **parse_overrides(arguments.set)}
+
+    configure(overrides, arguments.log_level)
+
+    cluster = None
+    if not arguments.external:
+        launcher = [sys.executable, os.path.abspath(__file__), 'serve', arguments.log_level] + [f'{name}={value!r}' for name, value in overrides.items()]
+        cluster = LocalCluster(arguments.replicas, None if arguments.in_process else launcher)
+
+    try:
+        if cluster is not None:
+            cluster.start()
+
+        report(benchmark(arguments, overrides), arguments.output)
+    except (ClusterStartupException, ServerDiscovererNotFoundException, ServersNotFoundException) as e:
+        logger.error(e)
+    finally:
+        if cluster is not None:
+            cluster.stop()
+
+    os._exit(0)
+
+if __name__ == '__main__':
+    main()
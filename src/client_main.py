@@ -2,7 +2,7 @@ import sys
 import code
 
 from models.client_key_value_store import ClientKeyValueStore
-from utils.exceptions import ServersNotFoundException
+from utils.exceptions import ServerDiscovererNotFoundException, ServersNotFoundException
 from utils.logger import logger
 
 def main():
@@ -17,6 +17,9 @@ def main():
 
     try:
         db = ClientKeyValueStore(id)
+    except ServerDiscovererNotFoundException as e:
+        logger.error(e)
+        return
     except ServersNotFoundException as e:
         logger.error(e)
         return
@@ -26,7 +29,10 @@ def main():
     local_context = locals()
     logger.info('Now you are free to execute any code you want. To call the database, just use the db variable. Enjoy!')
 
-    code.interact(local=local_context)
+    try:
+        code.interact(local=local_context)
+    finally:
+        db.close()
 
 if __name__ == '__main__':
     main()
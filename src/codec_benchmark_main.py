@@ -0,0 +1,60 @@
+import pickle
+import sys
+import timeit
+
+from utils.codec import BinaryCodec
+from utils.logger import logger
+
+def build_transaction(size, value):
+    write_set = {f'item-{i}': value for i in range(size)}
+    read_set = {f'read-item-{i}': (value, i) for i in range(size)}
+
+    return write_set, read_set
+
+def measure(name, function, operations):
+    runs = timeit.repeat(function, number=operations, repeat=5)
+    best = min(runs)
+
+    logger.info(f'{name:<40} {operations / best:>14,.0f} ops/s')
+
+def compare(label, payload_size, binary_encode, binary_decode, pickle_encode, pickle_decode, operations):
+    binary_data = binary_encode()
+    pickle_data = pickle_encode()
+
+    logger.info(f'{label}: binary {len(binary_data)} bytes, pickle {len(pickle_data)} bytes ({payload_size})')
+    measure(f'{label} - binary encode', binary_encode, operations)
+    measure(f'{label} - pickle encode', pickle_encode, operations)
+    measure(f'{label} - binary decode', lambda: binary_decode(binary_data), operations)
+    measure(f'{label} - pickle decode', lambda: pickle_decode(pickle_data), operations)
+
+def main():
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    codec = BinaryCodec()
+
+    values = {
+        'int': 42,
+        'short string': 'hello world',
+        '1 KB bytes': b'x' * 1024,
+        'record': {'name': 'alice', 'balance': 1500, 'tags': ['a', 'b'], 'active': True},
+    }
+
+    for name, value in values.items():
+        compare(f'Value ({name})', 'single value', lambda: codec.encode_value(value), codec.decode_value, lambda: pickle.dumps(value), pickle.loads, operations)
+
+    for size in (1, 10, 100):
+        write_set, read_set = build_transaction(size, 'value')
+        compare(
+            f'Transaction ({size} writes, {size} reads)',
+            'commit payload',
+            lambda: codec.encode_transaction(write_set, read_set),
+            codec.decode_transaction,
+            lambda: pickle.dumps((write_set, read_set)),
+            pickle.loads,
+            max(operations // size, 100),
+        )
+
+    servers = [('127.0.0.1', 5000 + i, '127.0.0.1', 5300 + i) for i in range(5)]
+    compare('Server list (5 servers)', 'discoverer reply', lambda: codec.encode_servers(servers), codec.decode_servers, lambda: pickle.dumps(servers), pickle.loads, operations)
+
+if __name__ == '__main__':
+    main()
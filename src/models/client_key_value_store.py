@@ -1,13 +1,21 @@
 import socket
 import struct
-import pickle
-import random
+import threading
 import time
 import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 
+from utils.codec import codec
+from utils.connection_pool import ConnectionPool
 from utils.constants import Constants
-from utils.exceptions import ServersNotFoundException
+from utils.exceptions import ServerBusyException, ServersNotFoundException, SnapshotTooOldException
+from utils.framing import FrameReader
 from utils.logger import logger
+from utils.lru_cache import LruCache
+from utils.membership_view import MembershipView
+from utils.metrics import Metrics
+from utils.replica_selector import ReplicaSelector
+from utils.sorted_key_index import prefix_end
 
 
 class ClientKeyValueStore:
@@ -16,69 +24,88 @@ class ClientKeyValueStore:
 
         self._write_set = {}
         self._read_set = {}
+        self._scanned_ranges = []
         self._transaction_id = 0
+        self._snapshot = None
+        self._snapshot_server = None
+        self._snapshot_consistent = True
+        self._last_server = None
 
-        self._socket = None
-        self._server_address, self._server_port, _, _ = self._choose_random_server()
+        self._metrics = Metrics(f'client{self._id}')
 
-    def _choose_random_server(self):
-        logger.info('Attempting to choose a random server from all servers available.')
-        servers = self._fetch_all_servers()
+        self._cache = LruCache(Constants.CLIENT_CACHE_MAX_ENTRIES, Constants.CLIENT_CACHE_MAX_BYTES) if Constants.CLIENT_CACHE_ENABLED else None
+        self._cache_server = None
 
-        for i in range(len(servers)):
-            if servers[i][0] == Constants.SERVER_SEQUENCER_ADDRESS and servers[i][1] == Constants.SERVER_SEQUENCER_PORT:
-                del servers[i]
-                break
+        self._membership = MembershipView()
+        self._connection_pool = ConnectionPool(on_message=self._receive_invalidations, on_lost=self._lose_invalidations)
+        self._executor = ThreadPoolExecutor(max_workers=Constants.CLIENT_BROADCAST_WORKERS)
+        self._selector = ReplicaSelector()
 
-        random_server = random.choice(servers)
-        logger.info(f'Random server chosen -> {random_server}')
+        self._commits = {}
+        self._commits_lock = threading.Lock()
 
-        return random_server
+        self._reply_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._reply_socket.bind(('127.0.0.1', 0))
+        self._reply_socket.listen()
 
-    def _fetch_all_servers(self):
-        logger.info('Attempting to fetching all servers from server discoverer')
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.connect((Constants.SERVER_DISCOVERER_ADDRESS, Constants.SERVER_DISCOVERER_PORT))
+        self._reply_address, self._reply_port = self._reply_socket.getsockname()
+        logger.info(f'Client reply channel listening -> Address {self._reply_address}, Port {self._reply_port}')
 
-            addr, port = s.getsockname()
-            message = struct.pack(Constants.SERVER_DISCOVERER_REQUEST_FORMAT, 2, socket.inet_aton(addr), port, socket.inet_aton(addr), port)
+        threading.Thread(target=self._accept_replies, daemon=True).start()
+        threading.Thread(target=self._expire_commits, daemon=True).start()
 
-            logger.info(f'Sending request for all servers to server discoverer. Message -> {message}')
-            s.send(message)
+        self._choose_server()
 
-            response = b''
-        
-            while True:
-                packet = s.recv(4096)
+    def _choose_server(self, exclude=()):
+        logger.info('Attempting to choose the fastest healthy server from all servers available.')
+        servers = self._fetch_all_servers()
 
-                if not packet:
-                    break
+        servers = [server for server in servers if not self._is_sequencer(server)]
+        if len(servers) == 0:
+            raise ServersNotFoundException()
 
-                logger.info(f'Received response from server discoverer. Response -> {packet}')
-                response += packet
+        server = self._selector.choose(servers, exclude)
+        logger.info(f'Server chosen -> {server}')
 
-        servers = pickle.loads(response)
+        return server
+
+    def _fetch_all_servers(self):
+        servers = self._membership.servers()
 
         if len(servers) == 0:
             raise ServersNotFoundException()
 
-        logger.info(f'Deserialized fetch servers response from server discoverer -> {servers}')
+        logger.info(f'Servers known at membership epoch {self._membership.epoch} -> {servers}')
         return servers
 
+    def _is_sequencer(self, server):
+        return server[0] == Constants.SERVER_SEQUENCER_ADDRESS and server[1] == Constants.SERVER_SEQUENCER_PORT
+
     def read(self, item):
         logger.info(f'Attempting to read item {item}')
 
-        value = self._write_set.get(item)
-        if value:
+        if item in self._write_set:
             logger.info('Item already in local write set')
-            return value
+            return self._write_set[item]
 
-        value = self._read_set.get(item)
-        if value:
+        if item in self._read_set:
             logger.info('Item already in local read set')
-            return value
+            return self._read_set[item][0]
+
+        cached = self._cache.get(item) if self._cache is not None else None
+        if cached is not None:
+            logger.info(f'Item read from cache: Value -> {cached[0]}, Version -> {cached[1]}')
+            self._metrics.increment('cache_hits_total')
+            self._read_set[item] = cached
+            self._snapshot_consistent = False
 
-        value, version = self._read_from_server(item)
+            return cached[0]
+
+        if self._cache is not None:
+            self._metrics.increment('cache_misses_total')
+
+        with self._metrics.timer('read_seconds'):
+            value, version = self._read_from_server(item)
 
         if value is None and version is None:
             logger.error('Item not found in local sets or remote server')
@@ -87,37 +114,364 @@ class ClientKeyValueStore:
         logger.info(f'Item read from server: Value -> {value}, Version -> {version}')
         self._read_set[item] = (value, version)
 
+        if self._cache is not None:
+            self._cache.put(item, value, version)
+
         return value
 
-    def _read_from_server(self, item):
-        logger.info('Attempting to read from server KVS.')
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(20)
+    def read_many(self, items):
+        logger.info(f'Attempting to read items {items}')
 
-                s.connect((self._server_address, self._server_port))
+        values = {}
+        missing = []
 
-                message = struct.pack(Constants.READ_REQUEST_FORMAT, 0, item.encode('utf-8'))
-                logger.info(f'Sending request for value to server KVS. Address -> {self._server_address}, Port -> {self._server_port}, Message -> {message}')
-                s.sendall(message)
+        for item in items:
+            if item in self._write_set:
+                values[item] = self._write_set[item]
+            elif item in self._read_set:
+                values[item] = self._read_set[item][0]
+            elif item not in missing:
+                missing.append(item)
 
-                data = s.recv(4096)
-        except Exception as e:
-            logger.warning('Attempt to read from server KVS failed. Attempting to find another server.')
+        if self._cache is not None:
+            hits = 0
+
+            for item in list(missing):
+                cached = self._cache.get(item)
+
+                if cached is not None:
+                    self._read_set[item] = cached
+                    self._snapshot_consistent = False
+                    values[item] = cached[0]
+                    missing.remove(item)
+                    hits += 1
 
-            self._server_address, self._server_port, _, _ = self._choose_random_server()
+            self._metrics.increment('cache_hits_total', hits)
+            self._metrics.increment('cache_misses_total', len(missing))
 
-            return self._read_from_server(item)
+        logger.info(f'{len(values)} items already in local sets or cache, {len(missing)} to be read from server')
 
-        if not data:
+        if missing:
+            with self._metrics.timer('read_many_seconds'):
+                entries = self._read_many_from_server(missing)
+
+            for item, entry in zip(missing, entries):
+                if entry is None:
+                    logger.error(f'Item {item} not found in local sets or remote server')
+                    values[item] = None
+                    continue
+
+                version, value = entry
+                self._read_set[item] = (value, version)
+                values[item] = value
+
+                if self._cache is not None:
+                    self._cache.put(item, value, version)
+
+        return {item: values[item] for item in items}
+
+    def scan(self, start, end=None, limit=None):
+        logger.info(f'Attempting to scan items from {start} to {end}, limit {limit}')
+
+        cursor = start
+        remaining = limit
+
+        while remaining is None or remaining > 0:
+            with self._metrics.timer('scan_seconds'):
+                entries, more = self._scan_from_server(cursor, end, Constants.CLIENT_SCAN_PAGE_SIZE if remaining is None else min(remaining, Constants.CLIENT_SCAN_PAGE_SIZE))
+
+            page_end = entries[-1][0] + '\0' if more else end
+            self._scanned_ranges.append((cursor, page_end))
+
+            logger.info(f'Scanned a page of {len(entries)} items from {cursor} to {page_end}')
+            self._metrics.increment('scanned_items_total', len(entries))
+
+            for key, value in self._merge_scan_page(cursor, page_end, entries):
+                if remaining is not None:
+                    if remaining == 0:
+                        return
+                    remaining -= 1
+
+                yield key, value
+
+            if not more:
+                return
+
+            cursor = page_end
+
+    def scan_prefix(self, prefix, limit=None):
+        return self.scan(prefix, prefix_end(prefix), limit)
+
+    def _merge_scan_page(self, start, end, entries):
+        items = {}
+
+        for key, (version, value) in entries:
+            if key in self._write_set:
+                items[key] = self._write_set[key]
+            elif key in self._read_set:
+                items[key] = self._read_set[key][0]
+            else:
+                self._read_set[key] = (value, version)
+                items[key] = value
+
+        for key, value in self._write_set.items():
+            if key >= start and (end is None or key < end):
+                items[key] = value
+
+        return sorted(items.items())
+
+    def _scan_from_server(self, start, end, limit):
+        snapshot = self._pinned_snapshot() if Constants.CLIENT_SNAPSHOT_READS else Constants.SNAPSHOT_LATEST
+        message = struct.pack(Constants.SCAN_REQUEST_INITIAL_FORMAT, snapshot, limit, end is not None) + codec.encode_keys([start] if end is None else [start, end])
+
+        data = self._request_from_server(Constants.SCAN_REQUEST, message, self._snapshot_available)
+
+        initial_size = struct.calcsize(Constants.SCAN_RESPONSE_INITIAL_FORMAT)
+        status, snapshot, more, keys_size = struct.unpack(Constants.SCAN_RESPONSE_INITIAL_FORMAT, data[:initial_size])
+
+        if Constants.CLIENT_SNAPSHOT_READS:
+            self._pin_snapshot(status, snapshot)
+        elif status == 2:
+            raise SnapshotTooOldException(snapshot)
+
+        keys = codec.decode_keys(data[initial_size:initial_size + keys_size])
+        entries = codec.decode_entries(data[initial_size + keys_size:])
+
+        return list(zip(keys, entries)), more
+
+    def _read_from_server(self, item):
+        if Constants.CLIENT_SNAPSHOT_READS:
+            return self._read_from_snapshot(item)
+
+        data = self._request_from_server(Constants.READ_REQUEST, item.encode('utf-8'))
+
+        found, version = struct.unpack(Constants.READ_RESPONSE_INITIAL_FORMAT, data[:struct.calcsize(Constants.READ_RESPONSE_INITIAL_FORMAT)])
+
+        if not found:
             logger.info('Server KVS did not return any values')
             return None, None
 
-        version = struct.unpack(Constants.READ_RESPONSE_INITIAL_FORMAT, data[:4])[0]
-        value = pickle.loads(data[4:])
+        value = codec.decode_value(data[struct.calcsize(Constants.READ_RESPONSE_INITIAL_FORMAT):])
 
         return value, version
 
+    def _read_from_snapshot(self, item):
+        message = struct.pack(Constants.READ_AT_REQUEST_INITIAL_FORMAT, self._pinned_snapshot()) + item.encode('utf-8')
+        data = self._request_from_server(Constants.READ_AT_REQUEST, message, self._snapshot_available)
+
+        initial_size = struct.calcsize(Constants.READ_AT_RESPONSE_INITIAL_FORMAT)
+        status, snapshot, version = struct.unpack(Constants.READ_AT_RESPONSE_INITIAL_FORMAT, data[:initial_size])
+
+        self._pin_snapshot(status, snapshot)
+
+        if status == 0:
+            logger.info('Server KVS did not return any values')
+            return None, None
+
+        return codec.decode_value(data[initial_size:]), version
+
+    def _read_many_from_server(self, items):
+        if not Constants.CLIENT_SNAPSHOT_READS:
+            return codec.decode_entries(self._request_from_server(Constants.READ_MANY_REQUEST, codec.encode_keys(items)))
+
+        message = struct.pack(Constants.READ_AT_REQUEST_INITIAL_FORMAT, self._pinned_snapshot()) + codec.encode_keys(items)
+        data = self._request_from_server(Constants.READ_MANY_AT_REQUEST, message, self._snapshot_available)
+
+        initial_size = struct.calcsize(Constants.READ_MANY_AT_RESPONSE_INITIAL_FORMAT)
+        status, snapshot = struct.unpack(Constants.READ_MANY_AT_RESPONSE_INITIAL_FORMAT, data[:initial_size])
+
+        self._pin_snapshot(status, snapshot)
+
+        return codec.decode_entries(data[initial_size:])
+
+    def _snapshot_available(self, data):
+        return data[0] != 2
+
+    def _pinned_snapshot(self):
+        return Constants.SNAPSHOT_LATEST if self._snapshot is None else self._snapshot
+
+    def _pin_snapshot(self, status, snapshot):
+        if status == 2:
+            raise SnapshotTooOldException(snapshot)
+
+        if self._snapshot is None:
+            logger.info(f'Transaction pinned to snapshot at sequence number {snapshot} of server KVS {self._last_server}')
+            self._snapshot = snapshot
+            self._snapshot_server = self._last_server
+
+    def _request_from_server(self, message_type, payload, accept=None, preferred=None):
+        logger.info('Attempting to read from server KVS.')
+
+        backoff = Constants.CLIENT_BUSY_BACKOFF
+        retry_backoff = Constants.CLIENT_RETRY_BACKOFF
+        failed = set()
+        passes = 0
+
+        while True:
+            server = self._preferred_server(failed, preferred)
+
+            if server is None:
+                passes += 1
+                if passes >= Constants.CLIENT_RETRY_MAX_PASSES:
+                    logger.error(f'Request failed on every server KVS {passes} times. Giving up.')
+                    raise ServersNotFoundException()
+
+                logger.warning(f'Request failed on every server KVS. Retrying in {retry_backoff} seconds.')
+                time.sleep(retry_backoff)
+                retry_backoff = min(2 * retry_backoff, Constants.CLIENT_RETRY_MAX_BACKOFF)
+
+                failed.clear()
+                continue
+
+            try:
+                self._subscribe_to_invalidations()
+
+                logger.info(f'Sending request to server KVS. Server -> {server}, Message type -> {message_type}')
+                return self._send_request(server, message_type, payload, accept)
+            except ServerBusyException:
+                logger.warning(f'Server KVS is overloaded. Retrying in {backoff} seconds.')
+                self._metrics.increment('busy_responses_total')
+
+                time.sleep(backoff)
+                backoff = min(2 * backoff, Constants.CLIENT_BUSY_MAX_BACKOFF)
+            except Exception:
+                logger.warning('Attempt to read from server KVS failed. Attempting to find another server.')
+                self._metrics.increment('request_failures_total')
+
+                self._selector.record_failure(server)
+                self._connection_pool.discard(*self._request_address(server, message_type))
+                failed.add(server[:2])
+
+    def _preferred_server(self, failed, preferred=None):
+        preferred = self._snapshot_server if preferred is None else preferred
+
+        if preferred is not None and preferred[:2] not in failed:
+            return preferred
+
+        return self._choose_server(failed)
+
+    def _send_request(self, server, message_type, payload, accept):
+        primary = self._timed_request(server, message_type, payload)
+        hedge_delay = self._selector.hedge_delay()
+
+        if not Constants.CLIENT_HEDGED_READS or hedge_delay is None or message_type not in Constants.HEDGED_REQUESTS:
+            data = primary.result(timeout=Constants.CLIENT_REQUEST_TIMEOUT)
+            self._last_server = server
+
+            return data
+
+        deadline = time.monotonic() + Constants.CLIENT_REQUEST_TIMEOUT
+        futures = {primary: server}
+
+        done, _ = wait(futures, timeout=hedge_delay)
+        if not done:
+            hedge_server = self._choose_server({server[:2]})
+
+            if hedge_server is not None:
+                logger.info(f'Server KVS {server} did not answer within {hedge_delay:.4f} seconds. Hedging the request to {hedge_server}')
+                self._metrics.increment('hedged_requests_total')
+                futures[self._timed_request(hedge_server, message_type, payload)] = hedge_server
+
+        while True:
+            done, _ = wait(futures, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f'No server KVS answered the request within {Constants.CLIENT_REQUEST_TIMEOUT} seconds')
+
+            for future in done:
+                answering_server = futures.pop(future)
+
+                if future.exception() is None and (accept is None or accept(future.result())):
+                    self._last_server = answering_server
+                    return future.result()
+
+                if not futures:
+                    self._last_server = answering_server
+                    return future.result()
+
+    def _timed_request(self, server, message_type, payload):
+        started = time.monotonic()
+        future = self._connection_pool.request(*self._request_address(server, message_type), message_type, payload)
+
+        future.add_done_callback(lambda future: self._record_latency(server, started, future))
+        return future
+
+    def _request_address(self, server, message_type):
+        if Constants.SERVER_READ_WORKERS > 0 and message_type in Constants.READ_WORKER_REQUESTS:
+            return server[0], server[1] - Constants.SERVER_KEY_VALUE_STORE_BASE_PORT + Constants.SERVER_KEY_VALUE_STORE_READ_BASE_PORT
+
+        return server[0], server[1]
+
+    def _record_latency(self, server, started, future):
+        if future.exception() is None:
+            self._selector.record(server, time.monotonic() - started)
+        elif not isinstance(future.exception(), ServerBusyException):
+            self._selector.record_failure(server)
+
+    def _subscribe_to_invalidations(self):
+        if self._cache is None or self._cache_server is not None:
+            return
+
+        if len(self._cache) > 0:
+            logger.info('Cache invalidations may have been missed. Clearing the cache.')
+            self._cache.clear()
+
+        server = self._choose_server()
+
+        try:
+            logger.info(f'Subscribing to cache invalidations from server KVS {server}')
+            self._connection_pool.send(server[0], server[1], Constants.CACHE_SUBSCRIBE_REQUEST, b'')
+        except OSError as e:
+            logger.warning(f'Could not subscribe to cache invalidations from server KVS {server}: {e}')
+            self._selector.record_failure(server)
+            return
+
+        self._cache_server = server[:2]
+
+    def _receive_invalidations(self, address, port, message_type, data):
+        if message_type != Constants.INVALIDATION or self._cache is None:
+            logger.warning(f'Unexpected message of type {message_type} from {address}:{port}')
+            return
+
+        initial_size = struct.calcsize(Constants.INVALIDATION_INITIAL_FORMAT)
+        keys_size = struct.unpack(Constants.INVALIDATION_INITIAL_FORMAT, data[:initial_size])[0]
+        keys = codec.decode_keys(data[initial_size:initial_size + keys_size])
+        versions = struct.unpack(f'!{len(keys)}I', data[initial_size + keys_size:])
+
+        logger.info(f'Invalidating {len(keys)} cached items')
+        for key, version in zip(keys, versions):
+            self._cache.invalidate(key, version)
+
+    def _lose_invalidations(self, address, port):
+        if self._cache is not None and self._cache_server == (address, port):
+            logger.warning('Connection carrying cache invalidations lost. Clearing the cache.')
+            self._cache_server = None
+            self._cache.clear()
+
+    def _update_cache(self, committed, write_set, read_set):
+        if self._cache is None:
+            return
+
+        if committed:
+            for key, value in write_set.items():
+                if key in read_set:
+                    self._cache.put(key, value, read_set[key][1] + 1)
+                else:
+                    self._cache.invalidate(key)
+            return
+
+        for key in list(read_set) + list(write_set):
+            self._cache.invalidate(key)
+
+    def metrics(self):
+        return self._metrics.snapshot()
+
+    def close(self):
+        logger.info('Closing client connections')
+
+        self._executor.shutdown()
+        self._connection_pool.close()
+        self._reply_socket.close()
+
     def write(self, item, value):
         logger.info(f'Writing to write set. Item {item}, Value {value}')
         self._write_set[item] = value
@@ -127,49 +481,181 @@ class ClientKeyValueStore:
         self._reset_transaction()
 
     def commit(self):
+        return self.commit_async().result()
+
+    def commit_async(self):
         logger.info(f'Client commit in progress -> Write set: {self._write_set}, Read set: {self._read_set}')
-        data = pickle.dumps((self._write_set, self._read_set))
+        future = Future()
+
+        if not self._write_set:
+            future.set_result(self._commit_read_only())
+            return future
 
-        logger.info('Creating a socket to receive server commit or abort message')
-        awaiting_response_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        awaiting_response_socket.bind(('127.0.0.1', 0))
-        awaiting_response_socket.listen()
+        if Constants.CLIENT_PREVALIDATE and (self._read_set or self._scanned_ranges) and not self._prevalidate():
+            future.set_result(False)
+            return future
 
-        ar_socket_address, ar_socket_port = awaiting_response_socket.getsockname()
-        logger.info(f'Client created response socket -> Address {ar_socket_address}, Port {ar_socket_port}')
+        started = time.perf_counter()
+        write_set, read_set, transaction_id = self._write_set, self._read_set, self._transaction_id
 
-        message = struct.pack(Constants.DELIVER_REQUEST_INITIAL_FORMAT, 1, socket.inet_aton(ar_socket_address), ar_socket_port, self._transaction_id)
-        message += data
+        message = struct.pack(Constants.DELIVER_REQUEST_INITIAL_FORMAT, socket.inet_aton(self._reply_address), self._reply_port, transaction_id)
+        message += codec.encode_transaction(write_set, read_set, self._scanned_ranges)
 
-        for server_address, server_port, _, _ in self._fetch_all_servers():
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                logger.info(f'Client sending commit to server. Address -> {server_address}, Port -> {server_port}, Message -> {message}')
-                s.connect((server_address, server_port))
+        with self._commits_lock:
+            self._commits[transaction_id] = (future, time.monotonic() + Constants.CLIENT_COMMIT_TIMEOUT, write_set, read_set, started)
 
-                s.send(message)
+        if Constants.BROADCAST_MODE == 'sequencer':
+            logger.info('Sending commit only to the server sequencer, which forwards it to every server KVS')
+            self._send_commit((Constants.SERVER_SEQUENCER_ADDRESS, Constants.SERVER_SEQUENCER_PORT), message, Constants.BROADCAST_REQUEST)
+        else:
+            for server in self._fetch_all_servers():
+                self._executor.submit(self._send_commit, server, message)
 
-            time.sleep(10)
+        self._metrics.observe('commit_send_seconds', time.perf_counter() - started)
+        self._reset_transaction()
 
-        connection, _ = awaiting_response_socket.accept()
+        return future
 
-        try:
-            data = connection.recv(1)
-            logger.info(f'Client received response from server -> {data}')
+    def _prevalidate(self):
+        logger.info('Pre-validating the read set before sending the transaction for sequencing')
 
-            if data == b'0':
-                logger.warning('Transaction aborted!')
-            else:
-                logger.info('Transaction committed!')
-        except Exception as e:
+        with self._metrics.timer('prevalidate_seconds'):
+            data = self._request_from_server(Constants.PREVALIDATE_REQUEST, codec.encode_transaction({}, self._read_set, self._scanned_ranges))
+
+        initial_size = struct.calcsize(Constants.PREVALIDATE_RESPONSE_INITIAL_FORMAT)
+        keys_size = struct.unpack(Constants.PREVALIDATE_RESPONSE_INITIAL_FORMAT, data[:initial_size])[0]
+        stale_keys = codec.decode_keys(data[initial_size:initial_size + keys_size])
+
+        if not stale_keys:
+            logger.info('Read set is up to date')
+            return True
+
+        logger.warning(f'Transaction read out of date versions of items {stale_keys}. Aborting it without sequencing.')
+        self._update_cache(False, self._write_set, self._read_set)
+
+        if self._cache is not None:
+            for key, entry in zip(stale_keys, codec.decode_entries(data[initial_size + keys_size:])):
+                if entry is not None:
+                    self._cache.put(key, entry[1], entry[0])
+
+        self._metrics.increment('prevalidation_aborts_total')
+        self._metrics.increment('aborts_total')
+        self._metrics.increment('sequencer_requests_saved_total')
+        self._metrics.increment('commit_messages_saved_total', 1 if Constants.BROADCAST_MODE == 'sequencer' else len(self._fetch_all_servers()))
+
+        self._reset_transaction()
+        return False
+
+    def _finish_commit(self, entry, committed):
+        future, _, write_set, read_set, started = entry
+
+        if committed:
+            logger.info('Transaction committed!')
+        elif committed is None:
+            logger.error('No server answered the commit request in time. Transaction outcome is unknown.')
+        else:
+            logger.warning('Transaction aborted!')
+
+        self._update_cache(committed, write_set, read_set)
+
+        self._metrics.increment({True: 'commits_total', False: 'aborts_total', None: 'commits_unknown_total'}[committed])
+        self._metrics.observe('commit_seconds', time.perf_counter() - started)
+
+        future.set_result(committed)
+
+    def _accept_replies(self):
+        while True:
+            try:
+                connection, address = self._reply_socket.accept()
+            except OSError:
+                logger.info('Client reply channel closed')
+                return
+
+            logger.info(f'Client reply channel connected to server KVS {address}')
+
+            threading.Thread(target=self._receive_replies, args=(connection,), daemon=True).start()
+
+    def _receive_replies(self, connection):
+        reader = FrameReader(connection)
+
+        with connection:
+            try:
+                while True:
+                    message_type, transaction_id, data = reader.receive()
+
+                    if message_type != Constants.COMMIT_RESPONSE:
+                        logger.error(f'Unexpected message of type {message_type} on the reply channel')
+                        return
+
+                    self._resolve_commit(transaction_id, struct.unpack(Constants.COMMIT_RESPONSE_FORMAT, data)[0] == 1)
+            except ConnectionError:
+                logger.info('Reply channel closed by server KVS')
+            except Exception as e:
                 logger.error(f'Client KVS -> An error occurred: {e}')
                 traceback.print_exc()
-        finally:
-            awaiting_response_socket.close()
 
+    def _resolve_commit(self, transaction_id, committed):
+        with self._commits_lock:
+            entry = self._commits.pop(transaction_id, None)
+
+        if entry is None:
+            logger.info(f'Ignoring duplicate reply for transaction {transaction_id}')
+            self._metrics.increment('duplicate_replies_total')
+            return
+
+        logger.info(f'Client received outcome of transaction {transaction_id} -> {committed}')
+        self._finish_commit(entry, committed)
+
+    def _expire_commits(self):
+        while True:
+            time.sleep(Constants.CLIENT_COMMIT_EXPIRY_INTERVAL)
+            now = time.monotonic()
+
+            with self._commits_lock:
+                expired = [self._commits.pop(transaction_id) for transaction_id, entry in list(self._commits.items()) if entry[1] < now]
+
+            for entry in expired:
+                self._finish_commit(entry, None)
+
+    def _commit_read_only(self):
+        started = time.perf_counter()
+        committed = True
+
+        if Constants.CLIENT_SNAPSHOT_READS and self._snapshot_consistent:
+            logger.info('Read-only transaction read a single snapshot. Committing it locally.')
+        elif self._read_set or self._scanned_ranges:
+            logger.info('Read-only transaction. Validating it against the server KVS that served the reads.')
+            data = self._request_from_server(Constants.VALIDATE_REQUEST, codec.encode_transaction({}, self._read_set, self._scanned_ranges), preferred=self._snapshot_server or self._last_server)
+            committed = struct.unpack(Constants.VALIDATE_RESPONSE_FORMAT, data)[0] == 1
+
+        if committed:
+            logger.info('Read-only transaction committed!')
+        else:
+            logger.warning('Read-only transaction aborted!')
+
+        self._update_cache(committed, self._write_set, self._read_set)
         self._reset_transaction()
 
+        self._metrics.increment('read_only_commits_total' if committed else 'read_only_aborts_total')
+        self._metrics.observe('read_only_commit_seconds', time.perf_counter() - started)
+
+        return committed
+
+    def _send_commit(self, server, message, message_type=Constants.DELIVER_REQUEST):
+        server_address, server_port = server[:2]
+        logger.info(f'Client sending commit to server. Address -> {server_address}, Port -> {server_port}, Message -> {message}')
+
+        try:
+            self._connection_pool.send(server_address, server_port, message_type, message)
+        except Exception as e:
+            logger.error(f'Client KVS -> Failed to send commit to {server_address}:{server_port}: {e}')
+
     def _reset_transaction(self):
         logger.info('Cleaning read set, write set, and jumping to next transaction')
         self._read_set = {}
         self._write_set = {}
+        self._scanned_ranges = []
+        self._snapshot = None
+        self._snapshot_server = None
+        self._snapshot_consistent = True
         self._transaction_id += 1
@@ -0,0 +1,245 @@
+import threading
+import time
+from concurrent.futures import Future
+
+from utils.constants import Constants
+from utils.logger import logger
+
+
+class HoldbackQueue:
+    def __init__(self, deliver, on_drop=None):
+        self._deliver = deliver
+        self._on_drop = on_drop
+
+        self._next_sequence_number = None
+        self._first_sequence_number = None
+        self._started = False
+        self._sequence_numbers = {}
+        self._transactions = {}
+        self._ready = {}
+        self._overdue = set()
+        self._stalled = None
+        self._captures = []
+        self._condition = threading.Condition()
+
+        threading.Thread(target=self._apply_in_order, daemon=True).start()
+        threading.Thread(target=self._report_overdue_transactions, daemon=True).start()
+
+    @property
+    def sequence_number(self):
+        return self._next_sequence_number
+
+    def wait_first_sequence_number(self, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: self._first_sequence_number is not None, timeout)
+
+            return self._first_sequence_number
+
+    def first_missing_sequence_number(self):
+        with self._condition:
+            known = list(self._ready) + list(self._sequence_numbers.values())
+
+            if self._next_sequence_number in self._ready or not known or min(known) <= self._next_sequence_number:
+                return None
+
+            return min(known)
+
+    def suspend_if_stalled(self, timeout, ignored=None):
+        with self._condition:
+            if not self._missing_transaction(timeout) or self._stalled[0] == ignored:
+                return None
+
+            self._started = False
+
+            logger.info(f'Holdback queue suspended at sequence number {self._next_sequence_number}, which is missing its transaction')
+            return self._next_sequence_number
+
+    def stalled_before(self, sequence_number, timeout):
+        with self._condition:
+            if not self._missing_transaction(timeout) or self._stalled[0] >= sequence_number:
+                return None
+
+            return self._stalled[0]
+
+    def start(self, sequence_number=None):
+        with self._condition:
+            if sequence_number is None:
+                sequence_number = self._first_sequence_number
+
+            self._next_sequence_number = sequence_number
+
+            if sequence_number is not None:
+                self._discard_before(sequence_number)
+
+            self._started = True
+            self._stalled = None
+            self._condition.notify_all()
+
+        logger.info(f'Holdback queue started at sequence number {sequence_number}')
+
+    def capture(self, callback, minimum_sequence_number=0):
+        future = Future()
+
+        with self._condition:
+            self._captures.append((minimum_sequence_number, callback, future))
+            self._condition.notify_all()
+
+        return future
+
+    def cancel_capture(self, future):
+        with self._condition:
+            captures = [capture for capture in self._captures if capture[2] is not future]
+            cancelled = len(captures) < len(self._captures)
+            self._captures = captures
+
+        return cancelled
+
+    def add_sequence_numbers(self, entries):
+        self.add_sequenced_transactions((sequence_number, key, None) for sequence_number, key in entries)
+
+    def add_sequenced_transactions(self, entries):
+        with self._condition:
+            waiting = len(self._transactions)
+
+            for sequence_number, key, transaction in entries:
+                if self._first_sequence_number is None:
+                    self._first_sequence_number = sequence_number
+                    self._condition.notify_all()
+
+                    if self._started and self._next_sequence_number is None:
+                        self._next_sequence_number = sequence_number
+
+                if self._next_sequence_number is not None and sequence_number < self._next_sequence_number:
+                    if key in self._transactions:
+                        self._drop_transactions([key])
+                    continue
+
+                if transaction is not None:
+                    self._ready[sequence_number] = (key, transaction)
+                elif key in self._transactions:
+                    self._ready[sequence_number] = (key, self._transactions.pop(key)[0])
+                    self._overdue.discard(key)
+                else:
+                    self._sequence_numbers[key] = sequence_number
+
+            if self._next_sequence_number in self._ready or waiting >= Constants.HOLDBACK_MAX_PAYLOADS:
+                self._condition.notify_all()
+
+    def add_transaction(self, key, transaction, block=True):
+        with self._condition:
+            sequence_number = self._sequence_numbers.pop(key, None)
+
+            if sequence_number is None:
+                if len(self._transactions) >= Constants.HOLDBACK_MAX_PAYLOADS:
+                    if not block:
+                        return False
+
+                    logger.warning(f'Holdback queue holds {len(self._transactions)} transactions without sequence numbers. Blocking the sender.')
+                    self._condition.wait_for(lambda: key in self._sequence_numbers or len(self._transactions) < Constants.HOLDBACK_MAX_PAYLOADS)
+
+                sequence_number = self._sequence_numbers.pop(key, None)
+
+            if sequence_number is None:
+                self._transactions[key] = (transaction, time.monotonic())
+                return True
+
+            self._ready[sequence_number] = (key, transaction)
+
+            if sequence_number == self._next_sequence_number:
+                self._condition.notify_all()
+
+            return True
+
+    def _apply_in_order(self):
+        while True:
+            group = self._collect_group()
+            if not group:
+                self._run_captures()
+                continue
+
+            logger.info(f'Holdback queue delivering {len(group)} transactions up to sequence number {self._next_sequence_number - 1}')
+            self._deliver(group)
+
+            self._run_captures()
+
+    def _run_captures(self):
+        with self._condition:
+            captures = [capture for capture in self._captures if self._capture_due(capture)]
+            self._captures = [capture for capture in self._captures if not self._capture_due(capture)]
+
+        for _, callback, future in captures:
+            try:
+                future.set_result((self._next_sequence_number, callback()))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _missing_transaction(self, timeout):
+        if self._stalled is None or time.monotonic() - self._stalled[1] < timeout:
+            return False
+
+        known = list(self._ready) + list(self._sequence_numbers.values())
+
+        return self._stalled[0] in self._sequence_numbers.values() or (self._stalled[0] not in self._ready and any(sequence_number > self._stalled[0] for sequence_number in known))
+
+    def _capture_due(self, capture):
+        return self._next_sequence_number is None or capture[0] <= self._next_sequence_number
+
+    def _discard_before(self, sequence_number):
+        for discarded in [discarded for discarded in self._ready if discarded < sequence_number]:
+            del self._ready[discarded]
+
+        for key in [key for key, discarded in self._sequence_numbers.items() if discarded < sequence_number]:
+            del self._sequence_numbers[key]
+
+    def _collect_group(self):
+        with self._condition:
+            while not self._started or self._next_sequence_number not in self._ready:
+                if self._started and any(map(self._capture_due, self._captures)):
+                    self._stalled = None
+                    return []
+
+                if self._started and (self._stalled is None or self._stalled[0] != self._next_sequence_number):
+                    self._stalled = (self._next_sequence_number, time.monotonic())
+
+                self._condition.wait()
+
+            self._stalled = None
+
+            deadline = time.monotonic() + Constants.GROUP_COMMIT_MAX_WAIT
+            group = []
+
+            while len(group) < Constants.GROUP_COMMIT_MAX_SIZE:
+                if self._next_sequence_number in self._ready:
+                    group.append((self._next_sequence_number, *self._ready.pop(self._next_sequence_number)))
+                    self._next_sequence_number += 1
+                    continue
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+
+                self._condition.wait(remaining)
+
+            return group
+
+    def _drop_transactions(self, keys):
+        for key in keys:
+            del self._transactions[key]
+            self._overdue.discard(key)
+
+        logger.info(f'Holdback queue dropped {len(keys)} transactions without sequence numbers -> {keys}')
+
+        if self._on_drop is not None:
+            self._on_drop(len(keys))
+
+    def _report_overdue_transactions(self):
+        while True:
+            time.sleep(Constants.HOLDBACK_GC_INTERVAL)
+            now = time.monotonic()
+
+            with self._condition:
+                overdue = [key for key, (_, arrival) in self._transactions.items() if arrival < now - Constants.HOLDBACK_TIMEOUT and key not in self._overdue]
+                self._overdue.update(overdue)
+
+            if overdue:
+                logger.warning(f'Holdback queue holds {len(overdue)} transactions without sequence numbers for more than {Constants.HOLDBACK_TIMEOUT} seconds -> {overdue}')
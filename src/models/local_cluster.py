@@ -0,0 +1,108 @@
+import shutil
+import socket
+import subprocess
+import threading
+import time
+
+from models.server_discoverer import ServerDiscoverer
+from models.server_key_value_store import ServerKeyValueStore
+from models.server_sequencer import ServerSequencer
+from utils.constants import Constants
+from utils.exceptions import ClusterStartupException, ServerDiscovererNotFoundException
+from utils.logger import logger
+from utils.membership_view import MembershipView
+
+
+class LocalCluster:
+    def __init__(self, replicas, launcher=None):
+        self._replicas = replicas
+        self._launcher = launcher
+
+        self._path = Constants.FOLDER_NAME / str(Constants.EXAMPLE_INSTACE)
+        self._processes = []
+        self._log_files = []
+
+    def start(self):
+        logger.info(f'Starting a local cluster with {self._replicas} replicas {"in subprocesses" if self._launcher else "in process"} at {self._path}')
+
+        shutil.rmtree(self._path, ignore_errors=True)
+        self._path.mkdir(parents=True)
+
+        self._start_role('discoverer')
+        self._wait_for_port(Constants.SERVER_DISCOVERER_ADDRESS, Constants.SERVER_DISCOVERER_PORT)
+
+        self._start_role('sequencer')
+        self._wait_for_port(Constants.SERVER_SEQUENCER_ADDRESS, Constants.SERVER_SEQUENCER_PORT)
+
+        for id in range(self._replicas):
+            self._start_role('server', id)
+
+        self._wait_for_replicas()
+        logger.info('Local cluster started!')
+
+    def stop(self):
+        for process in self._processes:
+            process.terminate()
+
+        for process in self._processes:
+            try:
+                process.wait(Constants.BENCHMARK_STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+        for log_file in self._log_files:
+            log_file.close()
+
+        self._processes = []
+        self._log_files = []
+
+    def _start_role(self, role, id=0):
+        if self._launcher is None:
+            threading.Thread(target=self.run_role, args=(role, id), daemon=True).start()
+            return
+
+        log_file = open(self._path / f'{role}{id}.log', 'wb')
+        self._log_files.append(log_file)
+        self._processes.append(subprocess.Popen(self._launcher + [role, str(id)], stdout=log_file, stderr=subprocess.STDOUT))
+
+    @staticmethod
+    def run_role(role, id):
+        try:
+            if role == 'discoverer':
+                ServerDiscoverer()
+            elif role == 'sequencer':
+                ServerSequencer()
+            else:
+                ServerKeyValueStore(id)
+        except Exception as e:
+            logger.error(f'Local cluster -> {role} {id} stopped: {e}')
+
+    def _wait_for_port(self, address, port):
+        deadline = time.monotonic() + Constants.BENCHMARK_STARTUP_TIMEOUT
+
+        while time.monotonic() < deadline:
+            try:
+                with socket.create_connection((address, port), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.1)
+
+        raise ClusterStartupException(Constants.BENCHMARK_STARTUP_TIMEOUT)
+
+    def _wait_for_replicas(self):
+        deadline = time.monotonic() + Constants.BENCHMARK_STARTUP_TIMEOUT
+
+        try:
+            membership = MembershipView()
+        except ServerDiscovererNotFoundException:
+            raise ClusterStartupException(Constants.BENCHMARK_STARTUP_TIMEOUT)
+
+        while time.monotonic() < deadline:
+            replicas = [server for server in membership.servers() if server[:2] != (Constants.SERVER_SEQUENCER_ADDRESS, Constants.SERVER_SEQUENCER_PORT)]
+
+            if len(replicas) >= self._replicas:
+                return
+
+            time.sleep(0.1)
+
+        raise ClusterStartupException(Constants.BENCHMARK_STARTUP_TIMEOUT)
@@ -0,0 +1,349 @@
+import os
+import struct
+import threading
+import zlib
+
+from models.storage import Storage, StorageSnapshot
+from utils.codec import codec
+from utils.constants import Constants
+from utils.logger import logger
+from utils.mmap_hash_index import MmapHashIndex, slot_entries
+from utils.sorted_key_index import SortedKeyIndex
+
+_RECORD = struct.Struct(Constants.STORAGE_RECORD_HEADER_FORMAT)
+_CHECKPOINT = struct.Struct(Constants.STORAGE_CHECKPOINT_FORMAT)
+
+
+class LogStructuredStorage(Storage):
+    def __init__(self, path):
+        super().__init__(path)
+
+        os.makedirs(path, exist_ok=True)
+
+        self._index = MmapHashIndex(str(path / 'index'), self._read_key)
+        self._readers = {}
+        self._writers = {}
+        self._unflushed = {}
+        self._pending = []
+        self._flush_lock = threading.Lock()
+        self._snapshots = 0
+
+        self._recover()
+
+        self._start_background_flush()
+        threading.Thread(target=self._compact_periodically, daemon=True).start()
+
+        logger.info(f'Log structured storage opened at {path} with {len(self._versions)} items in {len(self._readers)} segments')
+
+    def get(self, key):
+        with self._lock:
+            entry = self._unflushed.get(key)
+            if entry is not None:
+                return entry
+
+            location = self._index.get(key)
+            if location is None:
+                return None
+
+            version, segment, offset = location
+            record_key, record_version, value = self._read_record(segment, offset)
+
+        if record_key != key:
+            logger.error(f'Index entry for item {key} points to a record of item {record_key}')
+            return None
+
+        return record_version, codec.decode_value(value)
+
+    def get_many(self, keys):
+        records = []
+
+        with self._lock:
+            for key in keys:
+                entry = self._unflushed.get(key)
+                if entry is not None:
+                    records.append(entry)
+                    continue
+
+                location = self._index.get(key)
+                records.append(None if location is None else self._read_record(location[1], location[2]))
+
+        entries = []
+        for key, record in zip(keys, records):
+            if record is None or len(record) == 2:
+                entries.append(record)
+                continue
+
+            record_key, record_version, value = record
+            if record_key != key:
+                logger.error(f'Index entry for item {key} points to a record of item {record_key}')
+                entries.append(None)
+                continue
+
+            entries.append((record_version, codec.decode_value(value)))
+
+        return entries
+
+    def load(self, items):
+        with self._lock:
+            for key, (version, value) in items:
+                self._append(key, version, value, codec.encode_value(value))
+
+    def apply(self, write_set, sequence_number=None):
+        entries = {}
+
+        with self._lock:
+            for key, value in write_set.items():
+                previous = self._latest_entry(key) if sequence_number is not None and key not in self._history else None
+
+                entries[key] = self._append(key, self._next_version(key), value, codec.encode_value(value))
+                self._record_version(key, previous, entries[key], sequence_number)
+
+        return entries
+
+    def snapshot(self):
+        with self._lock:
+            slots = self._index.copy()
+            unflushed = list(self._unflushed.items())
+            self._snapshots += 1
+
+        return StorageSnapshot(self._read_snapshot(slot_entries(slots), unflushed), self._release_snapshot)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if self._index is None:
+                    return
+
+                writes, self._writes = self._writes, [(self._active_segment, bytearray())]
+                pending, self._pending = self._pending, []
+
+            for segment, buffer in writes:
+                writer = self._writers[segment]
+                view = memoryview(buffer)
+
+                while view:
+                    view = view[os.write(writer, view):]
+
+                os.fsync(writer)
+                checkpoint = (segment, os.fstat(writer).st_size)
+
+                if segment != self._active_segment:
+                    os.close(self._writers.pop(segment))
+
+            with self._lock:
+                for key, version, segment, offset in pending:
+                    self._index.put(key, version, segment, offset)
+
+                    if self._unflushed.get(key, (None,))[0] == version:
+                        del self._unflushed[key]
+
+                self._index.flush()
+
+            self._write_checkpoint(*checkpoint)
+
+        if pending:
+            logger.info(f'Storage persisted {len(pending)} records up to segment {checkpoint[0]} offset {checkpoint[1]}')
+
+    def close(self):
+        super().close()
+
+        with self._flush_lock, self._lock:
+            self._index.close()
+            self._index = None
+
+            for descriptor in list(self._readers.values()) + list(self._writers.values()):
+                os.close(descriptor)
+
+    def _append(self, key, version, value, encoded_value):
+        encoded_key = key.encode('utf-8')
+        body = _RECORD.pack(0, version, len(encoded_key), len(encoded_value))[4:] + encoded_key + encoded_value
+        record = struct.pack('!I', zlib.crc32(body)) + body
+
+        if self._active_size > 0 and self._active_size + len(record) > Constants.STORAGE_SEGMENT_SIZE:
+            self._open_segment(self._active_segment + 1)
+            self._writes.append((self._active_segment, bytearray()))
+
+        offset = self._active_size
+        self._writes[-1][1].extend(record)
+        self._active_size += len(record)
+
+        self._pending.append((key, version, self._active_segment, offset))
+        self._unflushed[key] = (version, value)
+        self._set_version(key, version)
+
+        return version, value
+
+    def _latest_entry(self, key):
+        entry = self._unflushed.get(key)
+        if entry is not None:
+            return entry
+
+        location = self._index.get(key)
+        if location is None:
+            return None
+
+        record_key, version, value = self._read_record(location[1], location[2])
+        return (version, codec.decode_value(value)) if record_key == key else None
+
+    def _read_record(self, segment, offset):
+        reader = self._readers[segment]
+        header = os.pread(reader, _RECORD.size, offset)
+        _, version, key_length, value_length = _RECORD.unpack(header)
+
+        data = os.pread(reader, key_length + value_length, offset + _RECORD.size)
+
+        return str(data[:key_length], 'utf-8'), version, data[key_length:]
+
+    def _read_key(self, segment, offset):
+        reader = self._readers[segment]
+        _, _, key_length, _ = _RECORD.unpack(os.pread(reader, _RECORD.size, offset))
+
+        return str(os.pread(reader, key_length, offset + _RECORD.size), 'utf-8')
+
+    def _read_snapshot(self, locations, unflushed):
+        for version, segment, offset in locations:
+            with self._lock:
+                key, _, value = self._read_record(segment, offset)
+
+            yield key, (version, codec.decode_value(value))
+
+        yield from unflushed
+
+    def _release_snapshot(self):
+        with self._lock:
+            self._snapshots -= 1
+
+    def _scan_segment(self, segment, offset=0):
+        size = os.fstat(self._readers[segment]).st_size
+
+        with open(self._segment_path(segment), 'rb') as file:
+            file.seek(offset)
+
+            while offset < size:
+                header = file.read(_RECORD.size)
+                if len(header) < _RECORD.size:
+                    yield offset, None
+                    return
+
+                crc, version, key_length, value_length = _RECORD.unpack(header)
+                data = file.read(key_length + value_length)
+
+                if len(data) < key_length + value_length or zlib.crc32(header[4:] + data) != crc:
+                    yield offset, None
+                    return
+
+                yield offset, (str(data[:key_length], 'utf-8'), version, data[key_length:])
+                offset += _RECORD.size + key_length + value_length
+
+    def _recover(self):
+        segments = sorted(int(name[8:-4]) for name in os.listdir(self._path) if name.startswith('segment-') and name.endswith('.log'))
+        checkpoint_segment, checkpoint_offset = self._read_checkpoint()
+
+        for segment in segments:
+            self._readers[segment] = os.open(self._segment_path(segment), os.O_RDONLY)
+
+        replayed = 0
+        for segment in segments:
+            if segment < checkpoint_segment:
+                continue
+
+            for offset, record in self._scan_segment(segment, checkpoint_offset if segment == checkpoint_segment else 0):
+                if record is None:
+                    logger.warning(f'Truncating torn record at segment {segment} offset {offset}')
+                    os.truncate(self._segment_path(segment), offset)
+                    break
+
+                key, version, _ = record
+                self._index.put(key, version, segment, offset)
+                replayed += 1
+
+        logger.info(f'Storage replayed {replayed} records after checkpoint at segment {checkpoint_segment} offset {checkpoint_offset}')
+
+        for version, segment, offset in self._index.entries():
+            key, _, _ = self._read_record(segment, offset)
+            self._versions[key] = version
+
+        self._keys = SortedKeyIndex(self._versions)
+
+        self._open_segment(segments[-1] if segments else 1)
+        self._writes = [(self._active_segment, bytearray())]
+
+        self._index.flush()
+        self._write_checkpoint(self._active_segment, self._active_size)
+
+    def _open_segment(self, segment):
+        path = self._segment_path(segment)
+
+        self._writers[segment] = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        if segment not in self._readers:
+            self._readers[segment] = os.open(path, os.O_RDONLY)
+
+        self._active_segment = segment
+        self._active_size = os.fstat(self._writers[segment]).st_size
+
+    def _read_checkpoint(self):
+        try:
+            with open(self._path / 'checkpoint', 'rb') as file:
+                return _CHECKPOINT.unpack(file.read(_CHECKPOINT.size))
+        except (OSError, struct.error):
+            logger.warning('No valid storage checkpoint found. Replaying the whole log.')
+            return 0, 0
+
+    def _write_checkpoint(self, segment, offset):
+        self._checkpoint_segment = segment
+        temporary_path = self._path / 'checkpoint.tmp'
+
+        with open(temporary_path, 'wb') as file:
+            file.write(_CHECKPOINT.pack(segment, offset))
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temporary_path, self._path / 'checkpoint')
+
+    def _compact_periodically(self):
+        while not self._closed.wait(Constants.STORAGE_COMPACTION_INTERVAL):
+            with self._lock:
+                segments = sorted(self._readers)
+
+            for segment in segments:
+                if segment >= self._checkpoint_segment or self._closed.is_set():
+                    break
+
+                try:
+                    self._compact(segment)
+                except Exception as e:
+                    logger.error(f'Storage -> Compaction of segment {segment} failed: {e}')
+
+    def _compact(self, segment):
+        records = [(offset, record) for offset, record in self._scan_segment(segment) if record is not None]
+        total_size = sum(_RECORD.size + len(key.encode('utf-8')) + len(value) for _, (key, _, value) in records)
+
+        with self._lock:
+            if self._snapshots:
+                return
+
+            live = [
+                (key, version, value) for offset, (key, version, value) in records
+                if key not in self._unflushed and self._index.get(key) == (version, segment, offset)
+            ]
+            live_size = sum(_RECORD.size + len(key.encode('utf-8')) + len(value) for key, _, value in live)
+
+            if total_size and live_size / total_size >= Constants.STORAGE_COMPACTION_THRESHOLD:
+                return
+
+            for key, version, value in live:
+                self._append(key, version, codec.decode_value(value), value)
+
+        self.flush()
+
+        with self._lock:
+            if self._snapshots:
+                return
+
+            os.close(self._readers.pop(segment))
+
+        os.remove(self._segment_path(segment))
+        logger.info(f'Storage compacted segment {segment}: moved {len(live)} of {len(records)} records ({live_size} of {total_size} bytes)')
+
+    def _segment_path(self, segment):
+        return self._path / f'segment-{segment:08d}.log'
@@ -0,0 +1,220 @@
+import os
+import struct
+import threading
+import time
+import traceback
+
+from utils.codec import codec
+from utils.connection_pool import ConnectionPool
+from utils.constants import Constants
+from utils.exceptions import ServerBusyException
+from utils.framing import FrameReader, send_frame
+from utils.logger import logger
+from utils.metrics import Metrics
+from utils.network import create_listening_socket
+from utils.shared_snapshot import SharedSnapshot
+
+
+class ReadWorker:
+    def __init__(self, id, worker, path, ready):
+        self._id = id
+        self._worker = worker
+
+        self._address = Constants.SERVER_KEY_VALUE_STORE_ADDRESS
+        self._port = Constants.SERVER_KEY_VALUE_STORE_READ_BASE_PORT + self._id
+        self._server_port = Constants.SERVER_KEY_VALUE_STORE_BASE_PORT + self._id
+
+        self._socket = create_listening_socket(self._address, self._port, reuse_port=True)
+        self._snapshot = SharedSnapshot(path, Constants.SERVER_READ_WORKERS)
+        self._connection_pool = ConnectionPool()
+
+        self._metrics = Metrics(f'server{self._id}-reader{self._worker}')
+
+        self._request_handlers = {
+            Constants.READ_REQUEST: (Constants.READ_RESPONSE, self._fetch_value),
+            Constants.READ_MANY_REQUEST: (Constants.READ_MANY_RESPONSE, self._fetch_values),
+            Constants.READ_AT_REQUEST: (Constants.READ_AT_RESPONSE, self._fetch_value_at),
+            Constants.READ_MANY_AT_REQUEST: (Constants.READ_MANY_AT_RESPONSE, self._fetch_values_at),
+        }
+
+        self._snapshots = {}
+        self._snapshots_lock = threading.Lock()
+
+        threading.Thread(target=self._expire_snapshots, daemon=True).start()
+        threading.Thread(target=self._watch_server, args=(os.getppid(),), daemon=True).start()
+
+        ready.set()
+        self._accept_connections()
+
+    @staticmethod
+    def run(id, worker, path, constants, log_level, ready):
+        for name, value in constants.items():
+            setattr(Constants, name, value)
+
+        logger.setLevel(log_level)
+
+        try:
+            ReadWorker(id, worker, path, ready)
+        except Exception as e:
+            logger.error(f'Read worker {worker} of server KVS {id} stopped: {e}')
+
+    def _accept_connections(self):
+        logger.info(f'Read worker {self._worker} of server KVS {self._id} listening on port {self._port}')
+
+        while True:
+            connection, address = self._socket.accept()
+            logger.info(f'Read worker {self._worker} connected to {address}')
+
+            threading.Thread(target=self._handle_connection, args=(connection,), daemon=True).start()
+
+    def _handle_connection(self, connection):
+        reader = FrameReader(connection)
+
+        with connection:
+            try:
+                while True:
+                    message_type, request_id, data = reader.receive(keep=True)
+                    logger.info(f'Read worker received request of type {message_type}')
+
+                    if message_type not in self._request_handlers:
+                        logger.error('Operation not known by read worker!')
+                        return
+
+                    response_type, handler = self._request_handlers[message_type]
+
+                    with self._metrics.timer('read_worker_seconds'):
+                        payload = handler(data)
+
+                    if payload is None:
+                        response_type, payload = self._forward(message_type, data, response_type)
+                    else:
+                        self._metrics.increment('reads_served_total')
+
+                    send_frame(connection, response_type, payload, request_id)
+            except ConnectionError:
+                logger.info('Connection closed by peer')
+            except Exception as e:
+                logger.error(f'Read worker -> An error occurred: {e}')
+                traceback.print_exc()
+
+    def _forward(self, message_type, data, response_type):
+        logger.info(f'Read worker forwarding request of type {message_type} to server KVS {self._id}')
+        self._metrics.increment('reads_forwarded_total')
+
+        try:
+            return response_type, self._connection_pool.request(self._address, self._server_port, message_type, data).result(timeout=Constants.CLIENT_REQUEST_TIMEOUT)
+        except ServerBusyException:
+            return Constants.BUSY_RESPONSE, b''
+        except Exception:
+            self._connection_pool.discard(self._address, self._server_port)
+            raise
+
+    def _fetch_value(self, data):
+        item = str(data, 'utf-8')
+        snapshot = self._snapshot.read([item])
+
+        if snapshot is None:
+            return None
+
+        _, (entry,) = snapshot
+
+        if entry is None:
+            logger.info(f'Item {item} not found in the read snapshot.')
+            return struct.pack(Constants.READ_RESPONSE_INITIAL_FORMAT, 0, 0)
+
+        version, _, value = entry
+        return struct.pack(Constants.READ_RESPONSE_INITIAL_FORMAT, 1, version) + value
+
+    def _fetch_values(self, data):
+        items = codec.decode_keys(data)
+        snapshot = self._snapshot.read(items)
+
+        if snapshot is None:
+            return None
+
+        _, entries = snapshot
+        return codec.encode_entries([None if entry is None else (entry[0], codec.decode_value(entry[2])) for entry in entries])
+
+    def _fetch_value_at(self, data):
+        initial_size = struct.calcsize(Constants.READ_AT_REQUEST_INITIAL_FORMAT)
+        sequence_number = struct.unpack(Constants.READ_AT_REQUEST_INITIAL_FORMAT, data[:initial_size])[0]
+        item = str(data[initial_size:], 'utf-8')
+
+        snapshot = self._read_at([item], sequence_number)
+        if snapshot is None:
+            return None
+
+        sequence_number, (entry,) = snapshot
+
+        if entry is None:
+            logger.info(f'Item {item} not found in snapshot {sequence_number}.')
+            return struct.pack(Constants.READ_AT_RESPONSE_INITIAL_FORMAT, 0, sequence_number, 0)
+
+        version, _, value = entry
+        return struct.pack(Constants.READ_AT_RESPONSE_INITIAL_FORMAT, 1, sequence_number, version) + value
+
+    def _fetch_values_at(self, data):
+        initial_size = struct.calcsize(Constants.READ_AT_REQUEST_INITIAL_FORMAT)
+        sequence_number = struct.unpack(Constants.READ_AT_REQUEST_INITIAL_FORMAT, data[:initial_size])[0]
+        items = codec.decode_keys(data[initial_size:])
+
+        snapshot = self._read_at(items, sequence_number)
+        if snapshot is None:
+            return None
+
+        sequence_number, entries = snapshot
+        entries = [None if entry is None else (entry[0], codec.decode_value(entry[2])) for entry in entries]
+
+        return struct.pack(Constants.READ_MANY_AT_RESPONSE_INITIAL_FORMAT, 1, sequence_number) + codec.encode_entries(entries)
+
+    def _read_at(self, items, sequence_number):
+        published = self._snapshot.published()
+        if published is None:
+            return None
+
+        if sequence_number == Constants.SNAPSHOT_LATEST:
+            sequence_number = published
+        elif published < sequence_number:
+            logger.info(f'Snapshot {sequence_number} not published yet. Read worker is at {published}')
+            return None
+
+        self._pin_snapshot(sequence_number)
+
+        snapshot = self._snapshot.read(items)
+        if snapshot is None:
+            return None
+
+        _, entries = snapshot
+
+        if any(entry is not None and entry[1] >= sequence_number for entry in entries):
+            logger.info(f'Read snapshot holds versions newer than snapshot {sequence_number}')
+            return None
+
+        return sequence_number, entries
+
+    def _pin_snapshot(self, sequence_number):
+        with self._snapshots_lock:
+            known = sequence_number in self._snapshots
+            self._snapshots[sequence_number] = time.monotonic()
+
+            if not known:
+                self._snapshot.pin(self._worker, min(self._snapshots))
+
+    def _expire_snapshots(self):
+        while True:
+            time.sleep(Constants.MVCC_GC_INTERVAL)
+
+            with self._snapshots_lock:
+                deadline = time.monotonic() - Constants.MVCC_SNAPSHOT_TTL
+
+                for sequence_number in [sequence_number for sequence_number, last_read in self._snapshots.items() if last_read < deadline]:
+                    del self._snapshots[sequence_number]
+
+                self._snapshot.pin(self._worker, min(self._snapshots, default=None))
+
+    def _watch_server(self, server_pid):
+        while os.getppid() == server_pid:
+            time.sleep(1)
+
+        logger.info(f'Server KVS {self._id} stopped. Read worker {self._worker} exiting.')
+        os._exit(0)
@@ -1,24 +1,37 @@
+import asyncio
+import queue
 import socket
 import traceback
-import pickle
 import struct
 import threading
 
+from utils.codec import codec
 from utils.constants import Constants
+from utils.framing import FrameReader, frame_parts, read_frame, send_frame
 from utils.logger import logger
+from utils.metrics import Metrics
+from utils.network import create_listening_socket
 
 
 class ServerDiscoverer:
     def __init__(self):
         self._servers = []
+        self._epoch = 0
 
-        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._socket.bind((Constants.SERVER_DISCOVERER_ADDRESS, Constants.SERVER_DISCOVERER_PORT))
-        self._socket.listen(3)
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+        self._metrics = Metrics('discoverer', Constants.METRICS_SERVER_DISCOVERER_PORT)
+
+        self._socket = create_listening_socket(Constants.SERVER_DISCOVERER_ADDRESS, Constants.SERVER_DISCOVERER_PORT)
 
         self._run()
 
     def _run(self):
+        if Constants.SERVER_MODE == 'asyncio':
+            asyncio.run(self._serve())
+            return
+
         while True:
             logger.info('Server discoverer listening!')
 
@@ -27,37 +40,106 @@ class ServerDiscoverer:
 
             threading.Thread(target=self._handle_connection, args=(connection,)).start()
 
+    async def _serve(self):
+        logger.info('Server discoverer listening with an event loop!')
+        self._pending_requests = 0
+
+        server = await asyncio.start_server(self._handle_stream, sock=self._socket)
+
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_stream(self, reader, writer):
+        pending = False
+
+        try:
+            message_type, request_id, data = await read_frame(reader)
+            logger.info(f'Received message type {message_type}: {data}')
+
+            self._pending_requests += 1
+            pending = True
+
+            if message_type == Constants.CONNECT_REQUEST:
+                logger.info('Received connect request')
+                self._connect(*self._unpack_server(data))
+            elif message_type == Constants.DISCONNECT_REQUEST:
+                logger.info('Received disconnect request')
+                self._disconnect(*self._unpack_server(data))
+            elif self._pending_requests > Constants.SERVER_MAX_PENDING_REQUESTS:
+                logger.warning(f'Server discoverer overloaded with {self._pending_requests} pending requests. Answering busy.')
+                writer.writelines(frame_parts(Constants.BUSY_RESPONSE, b'', request_id))
+            elif message_type == Constants.FETCH_SERVERS_REQUEST:
+                logger.info('Received fetch all servers request')
+                writer.writelines(frame_parts(Constants.SERVERS_RESPONSE, self._fetch_all_servers(), request_id))
+            elif message_type == Constants.SUBSCRIBE_REQUEST:
+                logger.info('Received subscribe request')
+
+                self._pending_requests -= 1
+                pending = False
+
+                await self._subscribe_stream(reader, writer)
+            else:
+                logger.error('Operation not known by server discoverer!')
+
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            logger.info('Connection closed by peer')
+        except Exception as e:
+            logger.error(f'Server discoverer -> An error occurred: {e}')
+            traceback.print_exc()
+        finally:
+            if pending:
+                self._pending_requests -= 1
+
+            writer.close()
+
+    async def _subscribe_stream(self, reader, writer):
+        subscriber = lambda message: writer.writelines(frame_parts(Constants.MEMBERSHIP_UPDATE, message))
+        self._add_subscriber(subscriber)
+
+        try:
+            while await reader.read(4096):
+                pass
+        finally:
+            self._remove_subscriber(subscriber)
+
     def _handle_connection(self, connection):
         with connection:
             try:
-                data, _ = connection.recvfrom(4096)
-                logger.info(f'Received message {data}')
+                message_type, request_id, data = FrameReader(connection).receive()
+                logger.info(f'Received message type {message_type}: {bytes(data)}')
 
-                message_id, addr, port, sn_addr, sn_port = struct.unpack(Constants.SERVER_DISCOVERER_REQUEST_FORMAT, data)
-                addr = socket.inet_ntoa(addr)
-                sn_addr = socket.inet_ntoa(sn_addr)
-
-                if message_id == 0:
+                if message_type == Constants.CONNECT_REQUEST:
                     logger.info('Received connect request')
-                    self._connect(addr, port, sn_addr, sn_port)
-                elif message_id == 1:
+                    self._connect(*self._unpack_server(data))
+                elif message_type == Constants.DISCONNECT_REQUEST:
                     logger.info('Received disconnect request')
-                    self._disconnect(addr, port, sn_addr, sn_port)
-                elif message_id == 2:
+                    self._disconnect(*self._unpack_server(data))
+                elif message_type == Constants.FETCH_SERVERS_REQUEST:
                     logger.info('Received fetch all servers request')
-                    self._fetch_all_servers(connection)
+                    send_frame(connection, Constants.SERVERS_RESPONSE, self._fetch_all_servers(), request_id)
+                elif message_type == Constants.SUBSCRIBE_REQUEST:
+                    logger.info('Received subscribe request')
+                    self._subscribe(connection)
                 else:
                     logger.error('Operation not known by server discoverer!')
             except Exception as e:
                 logger.error(f'Server discoverer -> An error occurred: {e}')
                 traceback.print_exc()
 
+    def _unpack_server(self, data):
+        addr, port, sn_addr, sn_port = struct.unpack(Constants.SERVER_DISCOVERER_REQUEST_FORMAT, data)
+
+        return socket.inet_ntoa(addr), port, socket.inet_ntoa(sn_addr), sn_port
+
     def _connect(self, address, port, sn_address, sn_port):
         logger.info(f'Server discoverer adding: Address -> {address}, Port -> {port}, SN Address -> {sn_address}, SN Port -> {sn_port}')
 
         server = (address, port, sn_address, sn_port)
-        if server not in self._servers:
-            self._servers.append(server)
+        with self._lock:
+            if server not in self._servers:
+                self._servers.append(server)
+                self._publish(1, server)
 
         logger.info(f'Server discoverer added: Address -> {address}, Port -> {port}, SN Address -> {sn_address}, SN Port -> {sn_port}')
 
@@ -65,16 +147,87 @@ class ServerDiscoverer:
         logger.info(f'Server discoverer removing: Address -> {address}, Port -> {port}, SN Address -> {sn_address}, SN Port -> {sn_port}')
 
         server = (address, port, sn_address, sn_port)
-        if server in self._servers:
-            self._servers.remove(server)
+        with self._lock:
+            if server in self._servers:
+                self._servers.remove(server)
+                self._publish(2, server)
 
         logger.info(f'Server discoverer removed: Address -> {address}, Port -> {port}, SN Address -> {sn_address}, SN Port -> {sn_port}')
 
-    def _fetch_all_servers(self, connection):
-        logger.info('Server discoverer fetching all servers')
-        serialized_server_data = pickle.dumps(self._servers)
-
+    def _fetch_all_servers(self):
         logger.info(f'Server discoverer sending servers: {self._servers}')
-        connection.sendall(serialized_server_data)
+        self._metrics.increment('fetch_servers_total')
 
-        logger.info('Server discoverer finished sending all servers')
+        return codec.encode_servers(self._servers)
+
+    def _subscribe(self, connection):
+        updates = queue.Queue()
+        subscriber = updates.put
+
+        connection.settimeout(Constants.MEMBERSHIP_SEND_TIMEOUT)
+        threading.Thread(target=self._send_updates, args=(connection, updates), daemon=True).start()
+
+        self._add_subscriber(subscriber)
+
+        try:
+            while True:
+                try:
+                    if not connection.recv(4096):
+                        break
+                except TimeoutError:
+                    continue
+        except OSError:
+            pass
+        finally:
+            self._remove_subscriber(subscriber)
+            updates.put(None)
+
+    def _send_updates(self, connection, updates):
+        while True:
+            message = updates.get()
+            if message is None:
+                return
+
+            try:
+                send_frame(connection, Constants.MEMBERSHIP_UPDATE, message)
+            except OSError as e:
+                logger.warning(f'Server discoverer dropping subscriber: {e}')
+                break
+
+        try:
+            connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _add_subscriber(self, subscriber):
+        with self._lock:
+            logger.info(f'Server discoverer sending membership snapshot at epoch {self._epoch}: {self._servers}')
+            subscriber(self._membership_update(0, self._servers))
+            self._subscribers.append(subscriber)
+
+        self._metrics.increment('subscriptions_total')
+
+    def _remove_subscriber(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+        logger.info('Server discoverer subscriber left')
+
+    def _publish(self, update_type, server):
+        self._epoch += 1
+        message = self._membership_update(update_type, [server])
+
+        logger.info(f'Server discoverer pushing membership update of epoch {self._epoch} to {len(self._subscribers)} subscribers')
+        self._metrics.increment('membership_updates_total')
+
+        with self._metrics.timer('publish_seconds'):
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber(message)
+                except OSError as e:
+                    logger.warning(f'Server discoverer dropping subscriber: {e}')
+                    self._subscribers.remove(subscriber)
+
+    def _membership_update(self, update_type, servers):
+        return struct.pack(Constants.MEMBERSHIP_UPDATE_INITIAL_FORMAT, self._epoch, update_type) + codec.encode_servers(servers)
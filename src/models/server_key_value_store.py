@@ -1,21 +1,39 @@
+import asyncio
+import itertools
+import multiprocessing
 import os
+import queue
+import select
 import shelve
 import socket
 import struct
 import traceback
-import pickle
 import threading
-
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from models.holdback_queue import HoldbackQueue
+from models.log_structured_storage import LogStructuredStorage
+from models.read_worker import ReadWorker
+from models.shelve_storage import ShelveStorage
+from utils.codec import codec
 from utils.constants import Constants
-from utils.exceptions import ServerDiscovererNotFoundException
+from utils.exceptions import ServerBusyException, ServerDiscovererNotFoundException, SnapshotTooOldException, StalledDeliveryException, StateTransferException
+from utils.framing import FrameReader, frame_parts, read_frame, send_frame
 from utils.logger import logger
+from utils.metrics import Metrics
+from utils.network import create_listening_socket
+from utils.shared_snapshot import SharedSnapshot
+
+STORAGES = {
+    'shelve': ShelveStorage,
+    'log': LogStructuredStorage,
+}
 
 
 class ServerKeyValueStore:
     def __init__(self, id):
-        self._holdback = {}
-        self._sequence_number = 0
-
         self._id = id
         self._address = Constants.SERVER_KEY_VALUE_STORE_ADDRESS
         self._port = Constants.SERVER_KEY_VALUE_STORE_BASE_PORT + self._id
@@ -23,41 +41,322 @@ class ServerKeyValueStore:
         self._sequence_number_address = Constants.SERVER_KEY_VALUE_STORE_SN_ADDRESS
         self._sequence_number_port = Constants.SERVER_KEY_VALUE_STORE_SN_PORT + self._id
 
-        self._load_initial_database()
-        self._connect_to_server_discoverer()
+        self._socket = create_listening_socket(self._address, self._port)
+        self._sequence_number_socket = create_listening_socket(self._sequence_number_address, self._sequence_number_port)
+
+        self._metrics = Metrics(f'server{self._id}', Constants.METRICS_SERVER_KEY_VALUE_STORE_BASE_PORT + self._id)
+
+        self._request_handlers = {
+            Constants.READ_REQUEST: (Constants.READ_RESPONSE, self._fetch_value, 'read_seconds'),
+            Constants.READ_MANY_REQUEST: (Constants.READ_MANY_RESPONSE, self._fetch_values, 'read_many_seconds'),
+            Constants.VALIDATE_REQUEST: (Constants.VALIDATE_RESPONSE, self._validate_read_only, 'validate_seconds'),
+            Constants.READ_AT_REQUEST: (Constants.READ_AT_RESPONSE, self._fetch_value_at, 'read_at_seconds'),
+            Constants.READ_MANY_AT_REQUEST: (Constants.READ_MANY_AT_RESPONSE, self._fetch_values_at, 'read_many_at_seconds'),
+            Constants.PREVALIDATE_REQUEST: (Constants.PREVALIDATE_RESPONSE, self._prevalidate, 'prevalidate_seconds'),
+            Constants.SCAN_REQUEST: (Constants.SCAN_RESPONSE, self._scan, 'scan_seconds'),
+        }
+
+        self._applied_sequence_number = 0
+        self._delivery_failed = False
+        self._transferring = False
+        self._applied_condition = threading.Condition()
+        self._snapshots = {}
 
-        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._socket.bind((self._address, self._port))
-        self._socket.listen(3)
+        self._reply_queues = OrderedDict()
+        self._reply_lock = threading.Lock()
 
-        self._sequence_number_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._sequence_number_socket.bind((self._sequence_number_address, self._sequence_number_port))
-        self._sequence_number_socket.listen(3)
+        self._holdback = HoldbackQueue(self._deliver_transactions, lambda count: self._metrics.increment('holdback_dropped_total', count))
 
-        self._holdback_condition = threading.Condition()
+        self._cache_subscribers = []
+        self._cache_subscribers_lock = threading.Lock()
+        self._invalidations = queue.Queue()
+        threading.Thread(target=self._push_invalidations, daemon=True).start()
+
+        peers = self._fetch_peers()
+
+        self._load_initial_database(peers)
+        self._start_read_workers()
+        self._connect_to_server_discoverer()
 
         threading.Thread(target=self._receive_sequence_numbers).start()
 
+        self._transfer_state(peers)
+        self._rebuild_read_snapshot()
+        threading.Thread(target=self._collect_versions, daemon=True).start()
+        threading.Thread(target=self._recover_stalled_delivery, daemon=True).start()
+
         self._run()
 
-    def _load_initial_database(self):
+    def _load_initial_database(self, peers):
         self._database_path = Constants.FOLDER_NAME / str(Constants.EXAMPLE_INSTACE) / f'server{self._id}'
 
         os.makedirs(self._database_path, exist_ok=True)
         logger.info('Server folder successfully initialized!')
 
+        self._storage = STORAGES[Constants.STORAGE_BACKEND](self._database_path)
+
+        if peers:
+            logger.info('Live peers found. State will be transferred from one of them.')
+            return
+
+        if len(self._storage) > 0:
+            logger.info(f'Server KVS recovered {len(self._storage)} items from local storage. Skipping model database.')
+            return
+
         source_path = Constants.FOLDER_NAME / str(Constants.EXAMPLE_INSTACE) / 'data'
         if not os.path.isfile(source_path):
             logger.warning('No model database provided. Skipping creation a copy.')
             return
 
         with shelve.open(source_path) as source:
-            with shelve.open(self._database_path / 'db') as destination:
-                for key, value in source.items():
-                    destination[key] = value
+            self._storage.load(source.items())
 
         logger.info('Data successfully copied from model database!')
 
+    def _start_read_workers(self):
+        self._read_snapshot = None
+        self._read_workers = []
+
+        if Constants.SERVER_READ_WORKERS <= 0:
+            return
+
+        logger.info(f'Starting {Constants.SERVER_READ_WORKERS} read workers on port {Constants.SERVER_KEY_VALUE_STORE_READ_BASE_PORT + self._id}')
+        self._read_snapshot = SharedSnapshot(self._database_path, Constants.SERVER_READ_WORKERS, writer=True)
+
+        context = multiprocessing.get_context('spawn')
+        constants = {name: value for name, value in vars(Constants).items() if name.isupper()}
+        events = []
+
+        for worker in range(Constants.SERVER_READ_WORKERS):
+            ready = context.Event()
+            process = context.Process(target=ReadWorker.run, args=(self._id, worker, self._database_path, constants, logger.level, ready), daemon=True)
+            process.start()
+
+            self._read_workers.append(process)
+            events.append(ready)
+
+        deadline = time.monotonic() + Constants.SERVER_READ_WORKERS_STARTUP_TIMEOUT
+
+        for worker, ready in enumerate(events):
+            if not ready.wait(max(0, deadline - time.monotonic())):
+                logger.warning(f'Read worker {worker} did not start listening within {Constants.SERVER_READ_WORKERS_STARTUP_TIMEOUT} seconds')
+
+        logger.info('Read workers started!')
+
+    def _rebuild_read_snapshot(self):
+        if self._read_snapshot is None:
+            return
+
+        logger.info('Server KVS building the read snapshot from the committed state')
+
+        self._holdback.capture(
+            self._build_read_snapshot
+        ).result(timeout=Constants.STATE_TRANSFER_TIMEOUT)
+
+        logger.info(f'Read snapshot built at sequence number {self._applied_sequence_number}. Read workers now serve reads.')
+
+    def _build_read_snapshot(self):
+        with self._storage.snapshot() as items:
+            self._read_snapshot.rebuild(items, self._applied_sequence_number)
+
+    def _fetch_peers(self):
+        backoff = Constants.CLIENT_BUSY_BACKOFF
+        deadline = time.monotonic() + Constants.STATE_TRANSFER_TIMEOUT
+
+        while True:
+            try:
+                with socket.create_connection((Constants.SERVER_DISCOVERER_ADDRESS, Constants.SERVER_DISCOVERER_PORT)) as s:
+                    send_frame(s, Constants.FETCH_SERVERS_REQUEST)
+                    message_type, _, data = FrameReader(s).receive()
+            except OSError:
+                raise ServerDiscovererNotFoundException()
+
+            if message_type == Constants.SERVERS_RESPONSE:
+                break
+
+            if message_type != Constants.BUSY_RESPONSE or time.monotonic() + backoff > deadline:
+                logger.error(f'Server discoverer did not return the live servers. Last message type -> {message_type}')
+                raise ServerDiscovererNotFoundException()
+
+            logger.warning(f'Server discoverer is overloaded. Fetching the live servers again in {backoff} seconds.')
+            time.sleep(backoff)
+            backoff = min(2 * backoff, Constants.CLIENT_BUSY_MAX_BACKOFF)
+
+        return [
+            server for server in codec.decode_servers(data)
+            if server[:2] != (Constants.SERVER_SEQUENCER_ADDRESS, Constants.SERVER_SEQUENCER_PORT) and server[:2] != (self._address, self._port)
+        ]
+
+    def _transfer_state(self, peers):
+        if not peers:
+            logger.info('No live peers. Delivering from the first sequence number received.')
+            self._holdback.start()
+            return
+
+        minimum_sequence_number = self._holdback.wait_first_sequence_number(Constants.STATE_TRANSFER_WAIT) or 0
+
+        while True:
+            sequence_number = self._receive_snapshot(peers, minimum_sequence_number)
+            self._holdback.start(sequence_number)
+            self._set_applied(sequence_number or 0)
+
+            missing_sequence_number = self._holdback.first_missing_sequence_number()
+            if missing_sequence_number is None:
+                return
+
+            logger.warning(f'Snapshot at sequence number {sequence_number} does not reach sequence number {missing_sequence_number}. Transferring again.')
+            minimum_sequence_number = missing_sequence_number
+
+    def _recover_stalled_delivery(self):
+        abandoned_sequence_number = None
+
+        while True:
+            time.sleep(Constants.HOLDBACK_GC_INTERVAL)
+
+            stalled_sequence_number = self._holdback.suspend_if_stalled(Constants.HOLDBACK_PAYLOAD_WAIT, abandoned_sequence_number)
+            if stalled_sequence_number is None:
+                continue
+
+            logger.warning(f'Sequence number {stalled_sequence_number} waited more than {Constants.HOLDBACK_PAYLOAD_WAIT} seconds for its transaction. Transferring state again.')
+            self._metrics.increment('state_retransfers_total')
+
+            with self._applied_condition:
+                self._transferring = True
+
+            try:
+                sequence_number = self._receive_snapshot(self._fetch_peers(), stalled_sequence_number + 1)
+            except StalledDeliveryException as e:
+                logger.error(f'Server KVS cannot recover the transaction of sequence number {stalled_sequence_number}: {e}. It stops transferring state again.')
+                self._metrics.increment('state_retransfers_abandoned_total')
+
+                abandoned_sequence_number = stalled_sequence_number
+                sequence_number = None
+            except (ServerDiscovererNotFoundException, StateTransferException) as e:
+                logger.warning(f'Server KVS could not transfer state again: {e}')
+                sequence_number = None
+
+            if sequence_number is None or sequence_number <= stalled_sequence_number:
+                self._holdback.start(stalled_sequence_number)
+                self._resume_snapshot_reads()
+                continue
+
+            self._holdback.start(sequence_number)
+            self._set_applied(sequence_number)
+            self._resume_snapshot_reads()
+            self._rebuild_read_snapshot()
+
+    def _resume_snapshot_reads(self):
+        with self._applied_condition:
+            self._transferring = False
+            self._applied_condition.notify_all()
+
+    def _receive_snapshot(self, peers, minimum_sequence_number):
+        initial_size = struct.calcsize(Constants.SNAPSHOT_CHUNK_INITIAL_FORMAT)
+        stalled = []
+
+        for _, _, peer_address, peer_port in peers:
+            logger.info(f'Requesting snapshot from {peer_address}:{peer_port} from sequence number {minimum_sequence_number}')
+
+            try:
+                with socket.create_connection((peer_address, peer_port), timeout=Constants.STATE_TRANSFER_TIMEOUT) as s:
+                    send_frame(s, Constants.SNAPSHOT_REQUEST, struct.pack(Constants.SNAPSHOT_REQUEST_FORMAT, minimum_sequence_number))
+                    reader = FrameReader(s)
+
+                    _, _, data = reader.receive()
+                    status, sequence_number = struct.unpack(Constants.SNAPSHOT_RESPONSE_FORMAT, data)
+                    known = status == 1
+
+                    if status == 2:
+                        logger.warning(f'Peer {peer_address}:{peer_port} is missing the transaction of sequence number {sequence_number} too')
+                        stalled.append(sequence_number)
+                        continue
+
+                    if known:
+                        with self._applied_condition:
+                            self._storage.collect_versions(sequence_number)
+
+                    count = 0
+                    while True:
+                        _, _, data = reader.receive()
+                        if len(data) == 0:
+                            break
+
+                        keys_size = struct.unpack(Constants.SNAPSHOT_CHUNK_INITIAL_FORMAT, data[:initial_size])[0]
+                        keys = codec.decode_keys(data[initial_size:initial_size + keys_size])
+                        entries = codec.decode_entries(data[initial_size + keys_size:])
+                        versions = {key: version for key, (version, _) in zip(keys, entries)}
+                        changed_keys = self._storage.changed_keys(versions) if self._cache_subscribers else []
+
+                        self._storage.load(zip(keys, entries))
+                        count += len(keys)
+
+                        if changed_keys:
+                            self._invalidations.put({key: versions[key] for key in changed_keys})
+
+                self._storage.flush()
+                logger.info(f'Server KVS received a snapshot of {count} items at sequence number {sequence_number if known else None}')
+
+                return sequence_number if known else None
+            except (OSError, ValueError, struct.error) as e:
+                logger.warning(f'State transfer from {peer_address}:{peer_port} failed: {e}')
+
+        if stalled and len(stalled) == len(peers) and len(set(stalled)) == 1:
+            raise StalledDeliveryException(stalled[0])
+
+        raise StateTransferException()
+
+    def _send_snapshot(self, connection, data):
+        minimum_sequence_number = struct.unpack(Constants.SNAPSHOT_REQUEST_FORMAT, data)[0]
+        stalled_sequence_number = self._holdback.stalled_before(minimum_sequence_number, Constants.HOLDBACK_PAYLOAD_WAIT)
+        if stalled_sequence_number is not None:
+            logger.warning(f'Server KVS is missing the transaction of sequence number {stalled_sequence_number}. Reporting the stall instead of a snapshot.')
+            send_frame(connection, Constants.SNAPSHOT_RESPONSE, struct.pack(Constants.SNAPSHOT_RESPONSE_FORMAT, 2, stalled_sequence_number))
+            return
+
+        logger.info(f'Server KVS capturing a snapshot from sequence number {minimum_sequence_number}')
+
+        capture = self._holdback.capture(self._storage.snapshot, minimum_sequence_number)
+
+        try:
+            sequence_number, snapshot = self._wait_capture(connection, capture)
+        except (TimeoutError, ConnectionError):
+            if not self._holdback.cancel_capture(capture):
+                capture.add_done_callback(lambda capture: capture.exception() is None and capture.result()[1].close())
+            raise
+
+        with snapshot:
+            send_frame(connection, Constants.SNAPSHOT_RESPONSE, struct.pack(Constants.SNAPSHOT_RESPONSE_FORMAT, sequence_number is not None, sequence_number or 0))
+
+            items = iter(snapshot)
+            count = 0
+
+            while True:
+                chunk = list(itertools.islice(items, Constants.SNAPSHOT_CHUNK_SIZE))
+                if not chunk:
+                    break
+
+                encoded_keys = codec.encode_keys([key for key, _ in chunk])
+                send_frame(connection, Constants.SNAPSHOT_CHUNK, struct.pack(Constants.SNAPSHOT_CHUNK_INITIAL_FORMAT, len(encoded_keys)) + encoded_keys + codec.encode_entries([entry for _, entry in chunk]))
+                count += len(chunk)
+
+        send_frame(connection, Constants.SNAPSHOT_CHUNK)
+        logger.info(f'Server KVS sent a snapshot of {count} items at sequence number {sequence_number}')
+
+    def _wait_capture(self, connection, capture):
+        deadline = time.monotonic() + Constants.STATE_TRANSFER_TIMEOUT
+
+        while True:
+            try:
+                return capture.result(timeout=max(0, min(Constants.HOLDBACK_GC_INTERVAL, deadline - time.monotonic())))
+            except TimeoutError:
+                if time.monotonic() >= deadline:
+                    logger.warning(f'Snapshot was not captured within {Constants.STATE_TRANSFER_TIMEOUT} seconds')
+                    raise
+
+            readable, _, _ = select.select([connection], [], [], 0)
+            if readable and connection.recv(1, socket.MSG_PEEK) == b'':
+                raise ConnectionAbortedError('Snapshot requester disconnected')
+
     def _connect_to_server_discoverer(self):
         logger.info('Attempting to get known by the server discoverer.')
 
@@ -65,9 +364,9 @@ class ServerKeyValueStore:
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
                 s.connect((Constants.SERVER_DISCOVERER_ADDRESS, Constants.SERVER_DISCOVERER_PORT))
 
-                message = struct.pack(Constants.SERVER_DISCOVERER_REQUEST_FORMAT, 0, socket.inet_aton(self._address), self._port, socket.inet_aton(self._sequence_number_address), self._sequence_number_port)
+                message = struct.pack(Constants.SERVER_DISCOVERER_REQUEST_FORMAT, socket.inet_aton(self._address), self._port, socket.inet_aton(self._sequence_number_address), self._sequence_number_port)
 
-                s.send(message)
+                send_frame(s, Constants.CONNECT_REQUEST, message)
 
                 logger.info('Server now known!')
         except Exception:
@@ -77,156 +376,614 @@ class ServerKeyValueStore:
         while True:
             connection, _ = self._sequence_number_socket.accept()
 
-            with connection:
-                data = connection.recv(4096)
+            threading.Thread(target=self._handle_sequence_number_connection, args=(connection,), daemon=True).start()
 
-                address, port, t_id, sn = struct.unpack(Constants.SERVER_SEQUENCER_FORMAT, data)
-                address = socket.inet_ntoa(address)
+    def _handle_sequence_number_connection(self, connection):
+        initial_size = struct.calcsize(Constants.SERVER_SEQUENCER_BATCH_INITIAL_FORMAT)
+        reader = FrameReader(connection)
 
-                logger.info(f'Server KVS received sequence number {sn} for: Address {address}, Port {port}, Transaction ID {t_id}')
+        with connection:
+            try:
+                while True:
+                    message_type, _, data = reader.receive()
 
-            with self._holdback_condition:
-                logger.info(f'Server KVS updating holdback')
-                self._holdback[(address, port, t_id)] = sn
+                    if message_type == Constants.SNAPSHOT_REQUEST:
+                        self._send_snapshot(connection, data)
+                        return
 
-                logger.info('Server KVS notifying all listeners of the holdback update')
-                self._holdback_condition.notify_all()
+                    if message_type == Constants.SEQUENCED_TRANSACTIONS:
+                        self._hold_sequenced_transactions(data)
+                        continue
 
-    def _run(self):
-        try:
-            while True:
-                logger.info('KVS Server listening')
+                    if message_type != Constants.SEQUENCE_NUMBERS:
+                        logger.error('Operation not known by server KVS!')
+                        return
+
+                    first_sn, count = struct.unpack(Constants.SERVER_SEQUENCER_BATCH_INITIAL_FORMAT, data[:initial_size])
 
-                connection, address = self._socket.accept()
-                logger.info(f'KVS Server connected to {address}')
+                    logger.info(f'Server KVS received sequence numbers {first_sn} to {first_sn + count - 1}')
+                    self._metrics.observe('sequence_number_batch_size', count, Constants.METRICS_SIZE_BUCKETS)
 
-                threading.Thread(target=self._handle_connection, args=(connection,)).start()
+                    logger.info(f'Server KVS updating holdback')
+                    self._holdback.add_sequence_numbers(
+                        (sn, (socket.inet_ntoa(address), port, t_id))
+                        for sn, (address, port, t_id) in enumerate(struct.iter_unpack(Constants.SERVER_SEQUENCER_FORMAT, data[initial_size:]), first_sn)
+                    )
+            except ConnectionError:
+                logger.info('Server sequencer connection closed')
+            except Exception as e:
+                logger.error(f'Server KVS -> An error occurred: {e}')
+                traceback.print_exc()
+
+    def _run(self):
+        try:
+            if Constants.SERVER_MODE == 'asyncio':
+                asyncio.run(self._serve())
+            else:
+                self._accept_connections()
         except KeyboardInterrupt:
             logger.info('Exit command received.')
             self._disconnect()
+            self._storage.close()
 
             return
 
-    def _handle_connection(self, connection):
+    def _accept_connections(self):
+        while True:
+            logger.info('KVS Server listening')
+
+            connection, address = self._socket.accept()
+            logger.info(f'KVS Server connected to {address}')
+
+            threading.Thread(target=self._handle_connection, args=(connection,)).start()
+
+    async def _serve(self):
+        logger.info(f'KVS Server listening with an event loop and {Constants.SERVER_WORKERS} workers')
+
+        self._executor = ThreadPoolExecutor(max_workers=Constants.SERVER_WORKERS)
+        self._pending_requests = 0
+
+        server = await asyncio.start_server(self._handle_stream, sock=self._socket)
+
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_stream(self, reader, writer):
+        logger.info(f'KVS Server connected to {writer.get_extra_info("peername")}')
+        loop = asyncio.get_running_loop()
+        subscriber = None
+
         try:
-            data = connection.recv(4096)
-            logger.info(f'Received request {data}')
-
-            if data[0] == 0:
-                logger.info('Received fetch value request')
-                self._fetch_value(data, connection)
-            elif data[0] == 1:
-                self._deliver_transaction(data)
+            while True:
+                message_type, request_id, data = await read_frame(reader)
+                logger.info(f'Received request of type {message_type}')
+
+                if message_type in self._request_handlers:
+                    if self._pending_requests >= Constants.SERVER_MAX_PENDING_REQUESTS:
+                        logger.warning(f'Server KVS overloaded with {self._pending_requests} pending requests. Answering busy.')
+                        self._metrics.increment('busy_responses_total')
+                        writer.writelines(frame_parts(Constants.BUSY_RESPONSE, b'', request_id))
+                    else:
+                        self._pending_requests += 1
+                        asyncio.create_task(self._serve_request(writer, message_type, request_id, data))
+                elif message_type == Constants.DELIVER_REQUEST:
+                    if not self._handle_transaction(data, block=False):
+                        await loop.run_in_executor(self._executor, self._handle_transaction, data)
+                elif message_type == Constants.CACHE_SUBSCRIBE_REQUEST and subscriber is None:
+                    subscriber = lambda message: loop.call_soon_threadsafe(writer.writelines, list(frame_parts(Constants.INVALIDATION, message)))
+                    self._add_cache_subscriber(subscriber)
+                else:
+                    logger.error('Operation not known by server KVS!')
+                    return
+
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            logger.info('Connection closed by peer')
         except Exception as e:
             logger.error(f'Server KVS -> An error occurred: {e}')
             traceback.print_exc()
+        finally:
+            self._remove_cache_subscriber(subscriber)
+            writer.close()
+
+    async def _serve_request(self, writer, message_type, request_id, data):
+        try:
+            response_type, payload = await asyncio.get_running_loop().run_in_executor(self._executor, self._handle_request, message_type, data)
+
+            writer.writelines(frame_parts(response_type, payload, request_id))
+            await writer.drain()
+        except ConnectionError:
+            logger.info('Connection closed before the response was sent')
+        except Exception as e:
+            logger.error(f'Server KVS -> An error occurred: {e}')
+            traceback.print_exc()
+        finally:
+            self._pending_requests -= 1
+
+    def _handle_connection(self, connection):
+        send_lock = threading.Lock()
+        reader = FrameReader(connection)
+        subscriber = None
+
+        with connection:
+            try:
+                while True:
+                    message_type, request_id, data = reader.receive(keep=True)
+                    logger.info(f'Received request of type {message_type}')
+
+                    if message_type in self._request_handlers:
+                        try:
+                            response_type, payload = self._handle_request(message_type, data)
+                        except ServerBusyException:
+                            self._metrics.increment('busy_responses_total')
+                            response_type, payload = Constants.BUSY_RESPONSE, b''
+
+                        with send_lock:
+                            send_frame(connection, response_type, payload, request_id)
+                    elif message_type == Constants.DELIVER_REQUEST:
+                        self._handle_transaction(data)
+                    elif message_type == Constants.CACHE_SUBSCRIBE_REQUEST and subscriber is None:
+                        subscriber = lambda message: self._send_locked(connection, send_lock, Constants.INVALIDATION, message)
+                        self._add_cache_subscriber(subscriber)
+                    else:
+                        logger.error('Operation not known by server KVS!')
+                        return
+            except ConnectionError:
+                logger.info('Connection closed by peer')
+            except Exception as e:
+                logger.error(f'Server KVS -> An error occurred: {e}')
+                traceback.print_exc()
+            finally:
+                self._remove_cache_subscriber(subscriber)
+
+    def _handle_request(self, message_type, data):
+        response_type, handler, metric = self._request_handlers[message_type]
+
+        with self._metrics.timer(metric):
+            return response_type, handler(data)
+
+    def _send_locked(self, connection, send_lock, message_type, payload):
+        with send_lock:
+            send_frame(connection, message_type, payload)
+
+    def _add_cache_subscriber(self, subscriber):
+        with self._cache_subscribers_lock:
+            self._cache_subscribers.append(subscriber)
+
+        logger.info(f'Client subscribed to cache invalidations. {len(self._cache_subscribers)} subscribers')
+
+    def _remove_cache_subscriber(self, subscriber):
+        with self._cache_subscribers_lock:
+            if subscriber in self._cache_subscribers:
+                self._cache_subscribers.remove(subscriber)
+
+    def _push_invalidations(self):
+        while True:
+            versions = self._invalidations.get()
+
+            while not self._invalidations.empty():
+                versions.update(self._invalidations.get_nowait())
 
-    def _fetch_value(self, data, connection):
-        item = data[1:].decode('utf-8').strip('\x00')
+            encoded_keys = codec.encode_keys(list(versions))
+            message = struct.pack(Constants.INVALIDATION_INITIAL_FORMAT, len(encoded_keys)) + encoded_keys + struct.pack(f'!{len(versions)}I', *versions.values())
+
+            with self._cache_subscribers_lock:
+                subscribers = list(self._cache_subscribers)
+
+            logger.info(f'Server KVS pushing invalidations of {len(versions)} items to {len(subscribers)} subscribers')
+
+            for subscriber in subscribers:
+                try:
+                    subscriber(message)
+                except (OSError, RuntimeError) as e:
+                    logger.warning(f'Failed to push invalidations to a subscriber: {e}')
+                    self._remove_cache_subscriber(subscriber)
+
+    def _fetch_value(self, data):
+        item = str(data, 'utf-8')
 
         logger.info(f'Server KVS attempting to find item -> {item}')
-        try:
-            with shelve.open(Constants.FOLDER_NAME / str(Constants.EXAMPLE_INSTACE) / f'server{self._id}' / 'db') as db:
-                version, value = db[item]
+        entry = self._storage.get(item)
 
-            logger.info(f'Server KVS found item {item} -> Version {version}, Value {value}')
-            message = struct.pack(Constants.READ_RESPONSE_INITIAL_FORMAT, version)
-            message += pickle.dumps(value)
-        except KeyError:
+        if entry is None:
             logger.error(f'Item {item} not found in database.')
-            connection.close()
-            return
+            return struct.pack(Constants.READ_RESPONSE_INITIAL_FORMAT, 0, 0)
+
+        version, value = entry
+        logger.info(f'Server KVS found item {item} -> Version {version}, Value {value}')
+
+        return struct.pack(Constants.READ_RESPONSE_INITIAL_FORMAT, 1, version) + codec.encode_value(value)
+
+    def _fetch_values(self, data):
+        items = codec.decode_keys(data)
+
+        logger.info(f'Server KVS attempting to find {len(items)} items -> {items}')
+        entries = self._storage.get_many(items)
+
+        logger.info(f'Server KVS found {sum(entry is not None for entry in entries)} of {len(items)} items')
+        return codec.encode_entries(entries)
+
+    def _fetch_value_at(self, data):
+        initial_size = struct.calcsize(Constants.READ_AT_REQUEST_INITIAL_FORMAT)
+        sequence_number = struct.unpack(Constants.READ_AT_REQUEST_INITIAL_FORMAT, data[:initial_size])[0]
+        item = str(data[initial_size:], 'utf-8')
+
+        logger.info(f'Server KVS attempting to find item {item} at snapshot {sequence_number}')
+
+        try:
+            sequence_number = self._pin_snapshot(sequence_number)
+            entry = self._storage.get_at(item, sequence_number)
+        except SnapshotTooOldException as e:
+            logger.warning(e)
+            return struct.pack(Constants.READ_AT_RESPONSE_INITIAL_FORMAT, 2, sequence_number, 0)
+
+        if entry is None:
+            logger.error(f'Item {item} not found in snapshot {sequence_number}.')
+            return struct.pack(Constants.READ_AT_RESPONSE_INITIAL_FORMAT, 0, sequence_number, 0)
+
+        version, value = entry
+        logger.info(f'Server KVS found item {item} at snapshot {sequence_number} -> Version {version}, Value {value}')
+
+        return struct.pack(Constants.READ_AT_RESPONSE_INITIAL_FORMAT, 1, sequence_number, version) + codec.encode_value(value)
+
+    def _fetch_values_at(self, data):
+        initial_size = struct.calcsize(Constants.READ_AT_REQUEST_INITIAL_FORMAT)
+        sequence_number = struct.unpack(Constants.READ_AT_REQUEST_INITIAL_FORMAT, data[:initial_size])[0]
+        items = codec.decode_keys(data[initial_size:])
+
+        logger.info(f'Server KVS attempting to find {len(items)} items at snapshot {sequence_number} -> {items}')
+
+        try:
+            sequence_number = self._pin_snapshot(sequence_number)
+            entries = self._storage.get_many_at(items, sequence_number)
+        except SnapshotTooOldException as e:
+            logger.warning(e)
+            return struct.pack(Constants.READ_MANY_AT_RESPONSE_INITIAL_FORMAT, 2, sequence_number)
+
+        logger.info(f'Server KVS found {sum(entry is not None for entry in entries)} of {len(items)} items')
+        return struct.pack(Constants.READ_MANY_AT_RESPONSE_INITIAL_FORMAT, 1, sequence_number) + codec.encode_entries(entries)
+
+    def _scan(self, data):
+        initial_size = struct.calcsize(Constants.SCAN_REQUEST_INITIAL_FORMAT)
+        sequence_number, limit, bounded = struct.unpack(Constants.SCAN_REQUEST_INITIAL_FORMAT, data[:initial_size])
+        bounds = codec.decode_keys(data[initial_size:])
+        start, end = bounds[0], bounds[1] if bounded else None
+
+        logger.info(f'Server KVS scanning up to {limit} items from {start} to {end} at snapshot {sequence_number}')
+
+        try:
+            sequence_number = self._pin_snapshot(sequence_number)
+            items = self._storage.scan(start, end, limit + 1, sequence_number)
+        except SnapshotTooOldException as e:
+            logger.warning(e)
+            return struct.pack(Constants.SCAN_RESPONSE_INITIAL_FORMAT, 2, sequence_number, 0, 0)
+
+        more = len(items) > limit
+        items = items[:limit]
+        self._metrics.observe('scan_size', len(items), Constants.METRICS_SIZE_BUCKETS)
+
+        logger.info(f'Server KVS scanned {len(items)} items at snapshot {sequence_number}. More items -> {more}')
+
+        keys = codec.encode_keys([key for key, _ in items])
+        return struct.pack(Constants.SCAN_RESPONSE_INITIAL_FORMAT, 1, sequence_number, more, len(keys)) + keys + codec.encode_entries([entry for _, entry in items])
+
+    def _pin_snapshot(self, sequence_number):
+        with self._applied_condition:
+            if self._transferring:
+                if Constants.SERVER_MODE != 'asyncio':
+                    logger.info(f'Server KVS is transferring state. Answering busy to a read at snapshot {sequence_number}.')
+                    self._metrics.increment('snapshots_not_ready_total')
+                    raise ServerBusyException()
+
+                with self._metrics.timer('snapshot_wait_seconds'):
+                    resumed = self._applied_condition.wait_for(lambda: not self._transferring, Constants.MVCC_SNAPSHOT_WAIT)
+
+                if not resumed:
+                    self._metrics.increment('snapshots_unavailable_total')
+                    raise SnapshotTooOldException(sequence_number)
+
+            if sequence_number == Constants.SNAPSHOT_LATEST:
+                sequence_number = self._applied_sequence_number
+            elif self._applied_sequence_number < sequence_number:
+                if Constants.SERVER_MODE != 'asyncio':
+                    logger.info(f'Snapshot {sequence_number} not applied yet. Server KVS is at {self._applied_sequence_number}. Answering busy.')
+                    self._metrics.increment('snapshots_not_ready_total')
+                    raise ServerBusyException()
+
+                with self._metrics.timer('snapshot_wait_seconds'):
+                    applied = self._applied_condition.wait_for(lambda: self._applied_sequence_number >= sequence_number, Constants.MVCC_SNAPSHOT_WAIT)
+
+                if not applied:
+                    self._metrics.increment('snapshots_unavailable_total')
+                    raise SnapshotTooOldException(sequence_number)
+
+            if sequence_number < self._storage.horizon:
+                logger.info(f'Snapshot {sequence_number} is below the collected horizon {self._storage.horizon}')
+                self._metrics.increment('snapshots_too_old_total')
+                raise SnapshotTooOldException(sequence_number)
+
+            self._snapshots[sequence_number] = time.monotonic()
+
+        return sequence_number
+
+    def _set_applied(self, sequence_number):
+        with self._applied_condition:
+            self._applied_sequence_number = sequence_number
+            self._applied_condition.notify_all()
+
+    def _collect_versions(self):
+        while True:
+            time.sleep(Constants.MVCC_GC_INTERVAL)
+
+            with self._applied_condition:
+                deadline = time.monotonic() - Constants.MVCC_SNAPSHOT_TTL
+
+                for sequence_number in [sequence_number for sequence_number, last_read in self._snapshots.items() if last_read < deadline]:
+                    del self._snapshots[sequence_number]
+
+                pinned = self._read_snapshot.pinned(self._live_read_workers()) if self._read_snapshot is not None else []
+                horizon = min([*self._snapshots, *pinned], default=self._applied_sequence_number)
+                collected = self._storage.collect_versions(min(horizon, self._applied_sequence_number))
+
+            if collected:
+                logger.info(f'Server KVS collected {collected} old versions below snapshot {horizon}')
+
+    def _live_read_workers(self):
+        live = []
+
+        for worker, process in enumerate(self._read_workers):
+            if process is None:
+                continue
+
+            if process.is_alive():
+                live.append(worker)
+            else:
+                logger.warning(f'Read worker {worker} exited with code {process.exitcode}. Ignoring its pinned snapshot.')
+                self._read_workers[worker] = None
+
+        return live
+
+    def _validate_read_only(self, data):
+        _, read_set, ranges = codec.decode_transaction(data)
+
+        logger.info(f'Server KVS validating read-only transaction -> Read set {read_set}, Scanned ranges {ranges}')
+        changed_keys = self._storage.changed_keys(read_set) + self._storage.phantom_keys(ranges, read_set)
+
+        if changed_keys:
+            logger.warning(f'Read-only transaction read versions of items {changed_keys} that are not the current ones. Transaction needs to be aborted')
+        else:
+            logger.info('Read-only transaction validated')
+
+        return struct.pack(Constants.VALIDATE_RESPONSE_FORMAT, not changed_keys)
+
+    def _prevalidate(self, data):
+        _, read_set, ranges = codec.decode_transaction(data)
+
+        logger.info(f'Server KVS pre-validating read set {read_set} and scanned ranges {ranges}')
+        stale_keys = self._storage.outdated_keys(read_set) + self._storage.phantom_keys(ranges, read_set)
+
+        if stale_keys:
+            logger.warning(f'Pre-validation found out of date versions of items {stale_keys}. Client will abort before sequencing')
+            self._metrics.increment('prevalidation_stale_total')
+        else:
+            self._metrics.increment('prevalidation_passed_total')
+
+        keys = codec.encode_keys(stale_keys)
+        return struct.pack(Constants.PREVALIDATE_RESPONSE_INITIAL_FORMAT, len(keys)) + keys + codec.encode_entries(self._storage.get_many(stale_keys))
+
+    def _handle_transaction(self, data, block=True):
+        try:
+            return self._hold_transaction(data, block)
+        except Exception as e:
+            logger.error(f'Server KVS -> An error occurred: {e}')
+            traceback.print_exc()
 
-        logger.info(f'Server KVS sending value of item {item}: Message -> {message}')
-        connection.sendall(message)
+            return True
 
-    def _deliver_transaction(self, data):
-        _, requester_address, requester_port, message_id = struct.unpack(Constants.DELIVER_REQUEST_INITIAL_FORMAT, data[:11])
+    def _hold_transaction(self, data, block=True):
+        initial_size = struct.calcsize(Constants.DELIVER_REQUEST_INITIAL_FORMAT)
+        requester_address, requester_port, message_id = struct.unpack(Constants.DELIVER_REQUEST_INITIAL_FORMAT, data[:initial_size])
         requester_address = socket.inet_ntoa(requester_address)
 
-        write_set, read_set = pickle.loads(data[11:])
+        write_set, read_set, ranges = codec.decode_transaction(data[initial_size:])
 
-        logger.info(f'Server KVS received commit from {requester_address}:{requester_port} -> Transaction ID {message_id}, Write set {write_set}, Read set {read_set}')
+        logger.info(f'Server KVS received commit from {requester_address}:{requester_port} -> Transaction ID {message_id}, Write set {write_set}, Read set {read_set}, Scanned ranges {ranges}')
 
-        holdback_key = (requester_address, requester_port, message_id)
+        if not self._holdback.add_transaction((requester_address, requester_port, message_id), (write_set, read_set, ranges, time.perf_counter()), block):
+            return False
 
-        with self._holdback_condition:
-            while self._holdback.get(holdback_key) != self._sequence_number:
-                logger.info(f'Server KVS waiting for sequence number for: Address -> {requester_address}, Port -> {requester_port}, Transaction -> {message_id}')
-                self._holdback_condition.wait()
+        self._metrics.increment('transactions_received_total')
+        return True
 
-            with shelve.open(Constants.FOLDER_NAME / str(Constants.EXAMPLE_INSTACE) / f'server{self._id}' / 'db') as db:
-                if self._read_outdated_version(read_set, db):
-                    self._abort(requester_address, requester_port, holdback_key)
-                    return
+    def _hold_sequenced_transactions(self, data):
+        initial_size = struct.calcsize(Constants.SERVER_SEQUENCER_BATCH_INITIAL_FORMAT)
+        entry_size = struct.calcsize(Constants.SEQUENCED_TRANSACTION_FORMAT)
+
+        first_sn, count = struct.unpack(Constants.SERVER_SEQUENCER_BATCH_INITIAL_FORMAT, data[:initial_size])
+        logger.info(f'Server KVS received sequenced transactions {first_sn} to {first_sn + count - 1}')
+
+        received = time.perf_counter()
+        offset = initial_size
+        entries = []
+
+        for sequence_number in range(first_sn, first_sn + count):
+            address, port, message_id, size = struct.unpack(Constants.SEQUENCED_TRANSACTION_FORMAT, data[offset:offset + entry_size])
+            offset += entry_size
+
+            transaction = None
+            if size > 0:
+                write_set, read_set, ranges = codec.decode_transaction(data[offset:offset + size])
+                transaction = (write_set, read_set, ranges, received)
+                offset += size
+
+            entries.append((sequence_number, (socket.inet_ntoa(address), port, message_id), transaction))
+
+        self._metrics.observe('sequence_number_batch_size', count, Constants.METRICS_SIZE_BUCKETS)
+        self._holdback.add_sequenced_transactions(entries)
+
+    def _deliver_transactions(self, group):
+        delivered = time.perf_counter()
+        outcomes = []
+        committed_entries = {}
+
+        self._metrics.observe('group_size', len(group), Constants.METRICS_SIZE_BUCKETS)
+
+        if self._delivery_failed:
+            logger.error(f'Server KVS stopped delivering after a failure. Leaving {len(group)} transactions unanswered')
+            return
+
+        try:
+            for sequence_number, holdback_key, (write_set, read_set, ranges, received) in group:
+                self._metrics.observe('holdback_wait_seconds', delivered - received)
+
+                with self._metrics.timer('certify_seconds'):
+                    outdated = self._read_outdated_version(read_set) or self._scanned_phantom(ranges, read_set, write_set)
+
+                if outdated:
+                    logger.warning('Aborting transaction')
+                    outcomes.append((holdback_key, False))
+                else:
+                    with self._metrics.timer('apply_seconds'):
+                        for key, (version, value) in self._commit(write_set, sequence_number).items():
+                            committed_entries[key] = (version, value, sequence_number)
+                    outcomes.append((holdback_key, True))
+
+            if any(commit for _, commit in outcomes):
+                logger.info(f'Server KVS persisting a group of {len(outcomes)} transactions')
+
+                with self._metrics.timer('flush_seconds'):
+                    self._storage.flush()
+
+            if self._read_snapshot is not None:
+                with self._metrics.timer('publish_seconds'):
+                    self._read_snapshot.publish([(key, *entry) for key, entry in committed_entries.items()], group[-1][0] + 1)
+        except Exception as e:
+            logger.error(f'Server KVS -> Delivery of sequence numbers {group[0][0]} to {group[-1][0]} failed: {e}')
+            traceback.print_exc()
+
+            self._fail_delivery()
+            return
+
+        self._set_applied(group[-1][0] + 1)
+
+        for holdback_key, commit in outcomes:
+            self._metrics.increment('commits_total' if commit else 'aborts_total')
+            self._respond_to_client(*holdback_key, commit)
+
+        if committed_entries and self._cache_subscribers:
+            self._invalidations.put({key: version for key, (version, _, _) in committed_entries.items()})
+
+        self._metrics.observe('deliver_seconds', time.perf_counter() - delivered)
+
+    def _fail_delivery(self):
+        self._delivery_failed = True
+        self._metrics.increment('delivery_failures_total')
+
+        logger.error('Server KVS can no longer guarantee its committed state. It stops answering commits and leaves the cluster.')
 
-                self._commit(write_set, db, requester_address, requester_port, holdback_key)
+        try:
+            self._disconnect()
+        except OSError as e:
+            logger.warning(f'Server KVS could not leave the cluster: {e}')
 
-    def _read_outdated_version(self, read_set, db):
+    def _read_outdated_version(self, read_set):
         logger.info('Verifying item versions from read set compared to current database')
-        for key, value in read_set.items():
-            try:
-                item_version = db[key][0]
-                if item_version > value[1]:
-                    logger.warning(f'Client KVS has read an out of date version of item {key}. Current version {item_version}, CKVS version {value[1]}. Transaction needs to be aborted')
-                    return True
-            except KeyError:
-                pass
+        outdated_keys = self._storage.outdated_keys(read_set)
+
+        if outdated_keys:
+            logger.warning(f'Client KVS has read an out of date version of items {outdated_keys}. Transaction needs to be aborted')
+            return True
 
         logger.info('No outdated version reading detected')
         return False
 
-    def _abort(self, requester_address, requester_port, holdback_key):
-        logger.warning('Aborting transaction')
-        self._respond_to_client(requester_address, requester_port, False)
+    def _scanned_phantom(self, ranges, read_set, write_set):
+        if not ranges:
+            return False
 
-        self._update_holdback(holdback_key)
+        logger.info(f'Verifying that no item appeared in the scanned ranges {ranges}')
+        phantom_keys = self._storage.phantom_keys(ranges, read_set, write_set)
 
-    def _commit(self, write_set, db, requester_address, requester_port, holdback_key):
-        for key, value in write_set.items():
-            try:
-                next_version = db[key][0] + 1
+        if phantom_keys:
+            logger.warning(f'Items {phantom_keys} appeared in a range scanned by the client KVS. Transaction needs to be aborted')
+            self._metrics.increment('phantom_aborts_total')
+            return True
 
-                logger.info(f'Server KVS updating version and value of item {key}: ({next_version - 1}, {db[key][1]}) -> ({next_version}, {value})')
-            except KeyError:
-                next_version = 0
+        logger.info('No phantom items detected')
+        return False
 
-                logger.info(f'Server KVS creating item {key}: (0, {value})')
+    def _commit(self, write_set, sequence_number):
+        entries = self._storage.apply(write_set, sequence_number)
 
-            db[key] = (next_version, value)
+        for key, (version, value) in entries.items():
+            logger.info(f'Server KVS setting version and value of item {key} -> ({version}, {value})')
 
         logger.info(f'Server KVS finished commiting the transaction')
-        self._respond_to_client(requester_address, requester_port, True)
-
-        self._update_holdback(holdback_key)
+        return entries
 
-    def _respond_to_client(self, address, port, commit):
+    def _respond_to_client(self, address, port, transaction_id, commit):
         if commit:
             logger.info('Attempting to send commit message to client')
-            message = b'1'
         else:
             logger.info('Attempting to send abort message to client')
-            message = b'0'
 
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                logger.info(f'Server connecting to client -> Address {address}, Port {port}')
-                s.connect((address, port))
+        message = struct.pack(Constants.COMMIT_RESPONSE_FORMAT, commit)
+
+        with self._reply_lock:
+            replies = self._reply_queues.get((address, port))
+
+            if replies is None:
+                replies = self._reply_queues[(address, port)] = queue.Queue()
+                threading.Thread(target=self._send_replies, args=(address, port, replies), daemon=True).start()
+
+                while len(self._reply_queues) > Constants.SERVER_MAX_REPLY_CONNECTIONS:
+                    _, evicted = self._reply_queues.popitem(last=False)
+                    evicted.put(None)
+            else:
+                self._reply_queues.move_to_end((address, port))
+
+        replies.put((transaction_id, message))
+
+    def _send_replies(self, address, port, replies):
+        connection = None
+
+        while True:
+            reply = replies.get()
+            if reply is None:
+                break
+
+            transaction_id, message = reply
+
+            with self._metrics.timer('reply_seconds'):
+                connection = self._send_reply(connection, address, port, transaction_id, message)
+
+        if connection is not None:
+            connection.close()
+
+        logger.info(f'Server KVS closed reply connection to client {address}:{port}')
+
+    def _send_reply(self, connection, address, port, transaction_id, message):
+        for attempt in range(2):
+            try:
+                if connection is None:
+                    logger.info(f'Server connecting to client -> Address {address}, Port {port}')
+                    connection = socket.create_connection((address, port), timeout=Constants.CLIENT_CONNECT_TIMEOUT)
+                    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
                 logger.info(f'Server sending message -> {message}')
-                s.send(message)
-        except Exception as e:
-            logger.error(f'Server KVS -> An error occurred: {e}')
+                send_frame(connection, Constants.COMMIT_RESPONSE, message, transaction_id)
+                return connection
+            except OSError as e:
+                logger.warning(f'Reply connection to client {address}:{port} failed: {e}')
 
-    def _update_holdback(self, holdback_key):
-        logger.info('Server KVS removing transaction from holdback')
-        del self._holdback[holdback_key]
+                if connection is not None:
+                    connection.close()
+                connection = None
 
-        logger.info('Server KVS updating sequence number')
-        self._sequence_number += 1
+        logger.error(f'Server KVS could not answer transaction {transaction_id} of client {address}:{port}')
+        self._metrics.increment('reply_failures_total')
 
-        logger.info('Server KVS notifying all listeners of the sequence number update')
-        self._holdback_condition.notify_all()
+        return None
 
     def _disconnect(self):
         logger.info('Attempting to disconnect server from the server discoverer.')
@@ -234,8 +991,8 @@ class ServerKeyValueStore:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             s.connect((Constants.SERVER_DISCOVERER_ADDRESS, Constants.SERVER_DISCOVERER_PORT))
 
-            message = struct.pack(Constants.SERVER_DISCOVERER_REQUEST_FORMAT, 1, socket.inet_aton(self._address), self._port, socket.inet_aton(self._sequence_number_address), self._sequence_number_port)
+            message = struct.pack(Constants.SERVER_DISCOVERER_REQUEST_FORMAT, socket.inet_aton(self._address), self._port, socket.inet_aton(self._sequence_number_address), self._sequence_number_port)
 
-            s.send(message)
+            send_frame(s, Constants.DISCONNECT_REQUEST, message)
 
             logger.info('Server now disconnected!')
@@ -1,11 +1,17 @@
 import socket
 import struct
-import pickle
+import threading
+import time
 import traceback
+from collections import deque
 
 from utils.constants import Constants
 from utils.exceptions import ServerDiscovererNotFoundException, ServersNotFoundException
+from utils.framing import FrameReader, send_frame
 from utils.logger import logger
+from utils.membership_view import MembershipView
+from utils.metrics import Metrics
+from utils.network import create_listening_socket
 
 
 class ServerSequencer:
@@ -15,11 +21,19 @@ class ServerSequencer:
         self._address = Constants.SERVER_SEQUENCER_ADDRESS
         self._port = Constants.SERVER_SEQUENCER_PORT
 
+        self._pending = deque()
+        self._pending_condition = threading.Condition()
+        self._server_connections = {}
+        self._backlogs = {}
+
+        self._metrics = Metrics('sequencer', Constants.METRICS_SERVER_SEQUENCER_PORT)
+
         self._connect_to_server_discoverer()
+        self._membership = MembershipView()
+
+        self._socket = create_listening_socket(self._address, self._port)
 
-        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._socket.bind((self._address, self._port))
-        self._socket.listen(3)
+        threading.Thread(target=self._assign_sequence_numbers, daemon=True).start()
 
         self._run()
 
@@ -30,9 +44,9 @@ class ServerSequencer:
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
                 s.connect((Constants.SERVER_DISCOVERER_ADDRESS, Constants.SERVER_DISCOVERER_PORT))
 
-                message = struct.pack(Constants.SERVER_DISCOVERER_REQUEST_FORMAT, 0, socket.inet_aton(self._address), self._port, socket.inet_aton(self._address), self._port)
+                message = struct.pack(Constants.SERVER_DISCOVERER_REQUEST_FORMAT, socket.inet_aton(self._address), self._port, socket.inet_aton(self._address), self._port)
 
-                s.send(message)
+                send_frame(s, Constants.CONNECT_REQUEST, message)
 
                 logger.info('Server now known!')
         except Exception:
@@ -42,68 +56,176 @@ class ServerSequencer:
         while True:
             logger.info('Server sequencer listening')
 
-            connection, _ = self._socket.accept()
+            connection, address = self._socket.accept()
+            logger.info(f'Server sequencer connected to {address}')
 
+            threading.Thread(target=self._handle_connection, args=(connection,), daemon=True).start()
+
+    def _handle_connection(self, connection):
+        initial_size = struct.calcsize(Constants.DELIVER_REQUEST_INITIAL_FORMAT)
+        reader = FrameReader(connection)
+
+        with connection:
             try:
-                data = connection.recv(4096)
-                logger.info(f'Received request: {data}')
+                while True:
+                    message_type, _, data = reader.receive()
+
+                    if message_type not in (Constants.DELIVER_REQUEST, Constants.BROADCAST_REQUEST):
+                        logger.error('Operation not recognized by Server Sequencer')
+                        return
 
-                self._send_sequence_number(data)
+                    requester_address, requester_port, message_id = struct.unpack(Constants.DELIVER_REQUEST_INITIAL_FORMAT, data[:initial_size])
+                    logger.info(f'Received request: Requester address -> {socket.inet_ntoa(requester_address)}, Requester port -> {requester_port}, Message ID -> {message_id}')
 
-                self._sequence_number += 1
+                    transaction = bytes(data[initial_size:]) if message_type == Constants.BROADCAST_REQUEST else b''
+
+                    with self._pending_condition:
+                        self._pending.append(((requester_address, requester_port, message_id), time.perf_counter(), transaction))
+                        self._pending_condition.notify()
+            except ConnectionError:
+                logger.info('Connection closed by peer')
             except Exception as e:
-                logger.error(f'Server KVS -> An error occurred: {e}')
+                logger.error(f'Server sequencer -> An error occurred: {e}')
                 traceback.print_exc()
 
-    def _send_sequence_number(self, data):
-        if data[0] != 1:
-            logger.error('Operation not recognized by Server Sequencer')
-            return
+    def _assign_sequence_numbers(self):
+        while True:
+            batch = self._collect_batch()
+
+            if not batch:
+                self._retry_backlogs()
+                continue
+
+            try:
+                with self._metrics.timer('send_sequence_numbers_seconds'):
+                    self._send_sequence_numbers(batch)
+            except Exception as e:
+                logger.error(f'Server sequencer -> An error occurred: {e}')
+                traceback.print_exc()
+
+            self._sequence_number += len(batch)
+
+    def _collect_batch(self):
+        with self._pending_condition:
+            while not self._pending:
+                if not self._pending_condition.wait(Constants.SERVER_SEQUENCER_RETRY_INTERVAL if self._backlogs else None):
+                    return []
+
+            deadline = time.monotonic() + Constants.SERVER_SEQUENCER_BATCH_WINDOW
+
+            while len(self._pending) < Constants.SERVER_SEQUENCER_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+
+                self._pending_condition.wait(remaining)
+
+            batch_size = min(len(self._pending), Constants.SERVER_SEQUENCER_BATCH_SIZE)
+            return [self._pending.popleft() for _ in range(batch_size)]
 
-        _, requester_address, requester_port, message_id = struct.unpack(Constants.DELIVER_REQUEST_INITIAL_FORMAT, data[:11])
-        formatted_requester_address = socket.inet_ntoa(requester_address)
+    def _send_sequence_numbers(self, batch):
+        sequenced = time.perf_counter()
 
-        message = struct.pack(Constants.SERVER_SEQUENCER_FORMAT, requester_address, requester_port, message_id, self._sequence_number)
+        for _, received, _ in batch:
+            self._metrics.observe('queue_wait_seconds', sequenced - received)
 
-        logger.info(f'Requesting sequence number: Requester address -> {formatted_requester_address}, Requester port -> {requester_port}, Message ID -> {message_id}, Message -> {message}')
+        self._metrics.observe('batch_size', len(batch), Constants.METRICS_SIZE_BUCKETS)
+        self._metrics.increment('transactions_sequenced_total', len(batch))
+
+        message_type, message = self._encode_batch(batch)
+
+        logger.info(f'Assigning sequence numbers {self._sequence_number} to {self._sequence_number + len(batch) - 1} to a batch of {len(batch)} transactions')
+
+        logger.info('Attempting to send sequence numbers to every Server KVS.')
+        destinations = set()
 
-        logger.info('Attempting to send sequence number to every Server KVS.')
         for server_address, server_port, server_sn_address, server_sn_port in self._fetch_all_servers():
             if server_address == self._address and server_port == self._port:
                 continue
 
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                logger.info(f'Server sequencer sending sequence number to server KVS: Requester address -> {formatted_requester_address}, Requester port -> {requester_port}, Sequence number -> {self._sequence_number}, Address -> {server_sn_address}, Port -> {server_sn_port}')
-                s.connect((server_sn_address, server_sn_port))
+            logger.info(f'Server sequencer sending sequence numbers to server KVS: Address -> {server_sn_address}, Port -> {server_sn_port}')
 
-                s.send(message)
+            with self._metrics.timer('send_to_server_seconds'):
+                self._send_to_server(server_sn_address, server_sn_port, message_type, message)
+            destinations.add((server_sn_address, server_sn_port))
 
-    def _fetch_all_servers(self):
-        logger.info('Attempting to fetching all servers from server discoverer')
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.connect((Constants.SERVER_DISCOVERER_ADDRESS, Constants.SERVER_DISCOVERER_PORT))
+        for destination in set(self._server_connections) - destinations:
+            logger.info(f'Server sequencer closing connection to departed server KVS {destination}')
+            self._server_connections.pop(destination).close()
 
-            addr, port = s.getsockname()
-            message = struct.pack(Constants.SERVER_DISCOVERER_REQUEST_FORMAT, 2, socket.inet_aton(addr), port, socket.inet_aton(addr), port)
+        for destination in set(self._backlogs) - destinations:
+            logger.info(f'Server sequencer dropping the backlog of departed server KVS {destination}')
+            del self._backlogs[destination]
 
-            logger.info(f'Sending request for all servers to server discoverer. Message -> {message}')
-            s.send(message)
+    def _retry_backlogs(self):
+        for address, port in list(self._backlogs):
+            self._send_backlog(address, port)
 
-            response = b''
+    def _encode_batch(self, batch):
+        message = struct.pack(Constants.SERVER_SEQUENCER_BATCH_INITIAL_FORMAT, self._sequence_number, len(batch))
 
-            while True:
-                packet = s.recv(4096)
+        if not any(transaction for _, _, transaction in batch):
+            return Constants.SEQUENCE_NUMBERS, message + b''.join(struct.pack(Constants.SERVER_SEQUENCER_FORMAT, *entry) for entry, _, _ in batch)
 
-                if not packet:
-                    break
+        forwarded = sum(bool(transaction) for _, _, transaction in batch)
+
+        logger.info(f'Forwarding {forwarded} transactions of the batch to every server KVS')
+        self._metrics.increment('transactions_forwarded_total', forwarded)
+
+        return Constants.SEQUENCED_TRANSACTIONS, message + b''.join(
+            struct.pack(Constants.SEQUENCED_TRANSACTION_FORMAT, *entry, len(transaction)) + transaction
+            for entry, _, transaction in batch
+        )
+
+    def _send_to_server(self, address, port, message_type, message):
+        backlog = self._backlogs.setdefault((address, port), deque())
+        backlog.append((message_type, message))
+
+        if len(backlog) > Constants.SERVER_SEQUENCER_MAX_BACKLOG:
+            logger.error(f'Server sequencer backlog of {address}:{port} overflowed. Dropping its oldest batch, which it recovers by state transfer.')
+            self._metrics.increment('backlog_dropped_total')
+            backlog.popleft()
+
+        self._send_backlog(address, port)
 
-                logger.info(f'Received response from server discoverer. Response -> {packet}')
-                response += packet
+    def _send_backlog(self, address, port):
+        backlog = self._backlogs[(address, port)]
 
-                servers = pickle.loads(response)
+        while backlog:
+            if not self._send_frame_to_server(address, port, *backlog[0]):
+                logger.error(f'Server sequencer could not deliver sequence numbers to {address}:{port}. Keeping {len(backlog)} batches to send again.')
+                self._metrics.increment('delivery_failures_total')
+                return
+
+            backlog.popleft()
+
+        del self._backlogs[(address, port)]
+
+    def _send_frame_to_server(self, address, port, message_type, message):
+        for attempt in range(2):
+            connection = self._server_connections.get((address, port))
+
+            try:
+                if connection is None:
+                    connection = socket.create_connection((address, port))
+                    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    self._server_connections[(address, port)] = connection
+
+                send_frame(connection, message_type, message)
+                return True
+            except OSError as e:
+                logger.warning(f'Connection to server KVS {address}:{port} failed: {e}')
+
+                if connection is not None:
+                    connection.close()
+                self._server_connections.pop((address, port), None)
+
+        return False
+
+    def _fetch_all_servers(self):
+        servers = self._membership.servers()
 
         if len(servers) == 0:
             raise ServersNotFoundException()
 
-        logger.info(f'Deserialized fetch servers response from server discoverer -> {servers}')
         return servers
@@ -0,0 +1,103 @@
+import os
+import shelve
+import threading
+
+from models.storage import Storage, StorageSnapshot
+from utils.logger import logger
+from utils.sorted_key_index import SortedKeyIndex
+
+
+class ShelveStorage(Storage):
+    def __init__(self, path):
+        super().__init__(path)
+
+        self._database = shelve.open(str(path / 'db'))
+        self._database_lock = threading.Lock()
+
+        self._table = dict(self._database.items())
+        self._versions = {key: entry[0] for key, entry in self._table.items()}
+        self._keys = SortedKeyIndex(self._versions)
+        self._dirty = {}
+
+        self._start_background_flush()
+
+        logger.info(f'Storage opened at {path} with {len(self._table)} items')
+
+    def get(self, key):
+        return self._table.get(key)
+
+    def get_many(self, keys):
+        with self._lock:
+            return [self._table.get(key) for key in keys]
+
+    def load(self, items):
+        with self._lock:
+            for key, entry in items:
+                self._table[key] = entry
+                self._set_version(key, entry[0])
+                self._dirty[key] = entry
+
+    def apply(self, write_set, sequence_number=None):
+        entries = {}
+
+        with self._lock:
+            for key, value in write_set.items():
+                entry = (self._next_version(key), value)
+                self._record_version(key, self._table.get(key), entry, sequence_number)
+
+                self._table[key] = entry
+                self._set_version(key, entry[0])
+                self._dirty[key] = entry
+                entries[key] = entry
+
+        return entries
+
+    def snapshot(self):
+        with self._lock:
+            return StorageSnapshot(self._table.copy().items())
+
+    def flush(self):
+        with self._database_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+
+            if not dirty or self._database is None:
+                return
+
+            try:
+                for key, entry in dirty.items():
+                    self._database[key] = entry
+
+                self._database.sync()
+                self._sync_files()
+            except Exception:
+                with self._lock:
+                    self._dirty = {**dirty, **self._dirty}
+
+                raise
+
+        logger.info(f'Storage persisted {len(dirty)} items')
+
+    def _sync_files(self):
+        for name in os.listdir(self._path):
+            if name.split('.')[0] == 'db':
+                file = os.open(self._path / name, os.O_RDONLY)
+
+                try:
+                    os.fsync(file)
+                finally:
+                    os.close(file)
+
+        directory = os.open(self._path, os.O_RDONLY)
+
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def close(self):
+        super().close()
+
+        with self._database_lock:
+            self._database.close()
+            self._database = None
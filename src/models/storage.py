@@ -0,0 +1,195 @@
+import abc
+import threading
+
+from utils.constants import Constants
+from utils.exceptions import SnapshotTooOldException
+from utils.sorted_key_index import SortedKeyIndex
+
+
+class StorageSnapshot:
+    def __init__(self, items, release=None):
+        self._items = items
+        self._release = release
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        release, self._release = self._release, None
+
+        if release is not None:
+            release()
+
+
+class Storage(abc.ABC):
+    def __init__(self, path):
+        self._path = path
+
+        self._versions = {}
+        self._keys = SortedKeyIndex()
+        self._history = {}
+        self._trimmed = set()
+        self._horizon = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+    def __len__(self):
+        return len(self._versions)
+
+    @property
+    def horizon(self):
+        with self._lock:
+            return self._horizon
+
+    @abc.abstractmethod
+    def get(self, key):
+        pass
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def get_at(self, key, sequence_number):
+        while True:
+            with self._lock:
+                if sequence_number < self._horizon:
+                    raise SnapshotTooOldException(sequence_number)
+
+                history = self._history.get(key)
+                if history is not None:
+                    return self._visible_entry(key, history, sequence_number)
+
+            entry = self.get(key)
+
+            with self._lock:
+                if key not in self._history:
+                    return entry
+
+    def get_many_at(self, keys, sequence_number):
+        return [self.get_at(key, sequence_number) for key in keys]
+
+    def scan(self, start, end, limit, sequence_number=None):
+        entries = []
+
+        while len(entries) < limit:
+            with self._lock:
+                keys = self._keys.range(start, end, limit - len(entries))
+
+            if not keys:
+                break
+
+            found = self.get_many(keys) if sequence_number is None else self.get_many_at(keys, sequence_number)
+            entries.extend((key, entry) for key, entry in zip(keys, found) if entry is not None)
+
+            start = keys[-1] + '\0'
+
+        return entries
+
+    def collect_versions(self, horizon):
+        collected = 0
+
+        with self._lock:
+            horizon = self._horizon = max(self._horizon, horizon)
+
+            for key, history in list(self._history.items()):
+                visible = len(history) - 1
+                while visible > 0 and history[visible][0] >= horizon:
+                    visible -= 1
+
+                if visible == len(history) - 1 and history[visible][0] < horizon:
+                    collected += len(history)
+                    del self._history[key]
+                    self._trimmed.discard(key)
+                elif visible > 0:
+                    collected += visible
+                    del history[:visible]
+
+        return collected
+
+    def outdated_keys(self, read_set):
+        latest_versions = map(self._versions.get, read_set)
+
+        return [key for key, version, latest in zip(read_set, read_set.values(), latest_versions) if latest is not None and latest > version]
+
+    def changed_keys(self, read_set):
+        with self._lock:
+            latest_versions = list(map(self._versions.get, read_set))
+
+        return [key for key, version, latest in zip(read_set, read_set.values(), latest_versions) if latest != version]
+
+    def phantom_keys(self, ranges, read_set, write_set=()):
+        with self._lock:
+            keys = [key for start, end in ranges for key in self._keys.range(start, end) if key not in read_set and key not in write_set]
+
+        return list(dict.fromkeys(keys))
+
+    @abc.abstractmethod
+    def load(self, items):
+        pass
+
+    @abc.abstractmethod
+    def apply(self, write_set, sequence_number=None):
+        pass
+
+    @abc.abstractmethod
+    def snapshot(self):
+        pass
+
+    @abc.abstractmethod
+    def flush(self):
+        pass
+
+    def close(self):
+        self._closed.set()
+        self.flush()
+
+    def _record_version(self, key, previous, entry, sequence_number):
+        if sequence_number is None:
+            return
+
+        history = self._history.get(key)
+
+        if history is None:
+            history = self._history[key] = []
+
+            if previous is not None:
+                history.append((-1, *previous))
+
+        history.append((sequence_number, *entry))
+
+        if len(history) > Constants.MVCC_MAX_VERSIONS:
+            del history[0]
+            self._trimmed.add(key)
+
+    def _visible_entry(self, key, history, sequence_number):
+        for entry_sequence_number, version, value in reversed(history):
+            if entry_sequence_number < sequence_number:
+                return version, value
+
+        if key in self._trimmed:
+            raise SnapshotTooOldException(sequence_number)
+
+        return None
+
+    def _set_version(self, key, version):
+        if key not in self._versions:
+            self._keys.add(key)
+
+        self._versions[key] = version
+
+    def _next_version(self, key):
+        current = self._versions.get(key)
+
+        return 0 if current is None else current + 1
+
+    def _start_background_flush(self):
+        threading.Thread(target=self._flush_periodically, daemon=True).start()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(Constants.STORAGE_FLUSH_INTERVAL):
+            self.flush()
@@ -0,0 +1,327 @@
+import itertools
+import pickle
+import socket
+import struct
+
+from utils.constants import Constants
+from utils.exceptions import UnsupportedValueException
+
+NONE = 0
+FALSE = 1
+TRUE = 2
+SMALL_INT = 3
+INT = 4
+LONG = 5
+BIG_INT = 6
+FLOAT = 7
+SHORT_STR = 8
+STR = 9
+SHORT_BYTES = 10
+BYTES = 11
+LIST = 12
+TUPLE = 13
+DICT = 14
+PICKLED = 15
+
+_SMALL_INT = struct.Struct('!Bb')
+_INT = struct.Struct('!Bi')
+_LONG = struct.Struct('!Bq')
+_FLOAT = struct.Struct('!Bd')
+_SHORT_LENGTH = struct.Struct('!BB')
+_LENGTH = struct.Struct('!BI')
+_SIGNED_BYTE = struct.Struct('!b')
+_SIGNED_INT = struct.Struct('!i')
+_SIGNED_LONG = struct.Struct('!q')
+_DOUBLE = struct.Struct('!d')
+_UNSIGNED_INT = struct.Struct('!I')
+_COUNTS = struct.Struct('!II')
+_SERVER = struct.Struct('!4sH4sH')
+
+
+class BinaryCodec:
+    def encode_value(self, value):
+        buffer = bytearray()
+        self._encode(value, buffer)
+
+        return bytes(buffer)
+
+    def decode_value(self, data):
+        value, _ = self._decode(memoryview(data), 0)
+
+        return value
+
+    def encode_transaction(self, write_set, read_set, ranges=()):
+        keys = [key.encode('utf-8') for key in write_set]
+        keys += [key.encode('utf-8') for key in read_set]
+
+        buffer = bytearray(_COUNTS.pack(len(write_set), len(read_set)))
+        buffer += struct.pack(f'!{len(keys)}H', *map(len, keys))
+        buffer += b''.join(keys)
+        buffer += struct.pack(f'!{len(read_set)}I', *[version for _, version in read_set.values()])
+
+        for value in write_set.values():
+            self._encode(value, buffer)
+
+        if ranges:
+            bounds = [bound.encode('utf-8') for start, end in ranges for bound in (start, end or '')]
+
+            buffer += _UNSIGNED_INT.pack(len(ranges))
+            buffer += struct.pack(f'!{len(ranges)}?', *[end is not None for _, end in ranges])
+            buffer += struct.pack(f'!{len(bounds)}H', *map(len, bounds))
+            buffer += b''.join(bounds)
+
+        return bytes(buffer)
+
+    def decode_transaction(self, data):
+        view = memoryview(data)
+        write_count, read_count = _COUNTS.unpack_from(view, 0)
+        offset = _COUNTS.size
+
+        keys, offset = self._decode_keys(view, offset, write_count + read_count)
+
+        versions = struct.unpack_from(f'!{read_count}I', view, offset)
+        offset += 4 * read_count
+
+        write_set = {}
+        for key in keys[:write_count]:
+            write_set[key], offset = self._decode(view, offset)
+
+        ranges = []
+        if offset < len(view):
+            count = _UNSIGNED_INT.unpack_from(view, offset)[0]
+            offset += _UNSIGNED_INT.size
+
+            bounded = struct.unpack_from(f'!{count}?', view, offset)
+            offset += count
+
+            bounds, offset = self._decode_keys(view, offset, 2 * count)
+            ranges = [(bounds[2 * index], bounds[2 * index + 1] if bounded[index] else None) for index in range(count)]
+
+        return write_set, dict(zip(keys[write_count:], versions)), ranges
+
+    def encode_keys(self, keys):
+        encoded = [key.encode('utf-8') for key in keys]
+
+        return _UNSIGNED_INT.pack(len(encoded)) + struct.pack(f'!{len(encoded)}H', *map(len, encoded)) + b''.join(encoded)
+
+    def decode_keys(self, data):
+        view = memoryview(data)
+        count = _UNSIGNED_INT.unpack_from(view, 0)[0]
+
+        keys, _ = self._decode_keys(view, _UNSIGNED_INT.size, count)
+
+        return keys
+
+    def encode_entries(self, entries):
+        found = [entry is not None for entry in entries]
+
+        buffer = bytearray(_UNSIGNED_INT.pack(len(entries)))
+        buffer += struct.pack(f'!{len(entries)}?', *found)
+        buffer += struct.pack(f'!{len(entries)}I', *[entry[0] if entry is not None else 0 for entry in entries])
+
+        for entry in entries:
+            if entry is not None:
+                self._encode(entry[1], buffer)
+
+        return bytes(buffer)
+
+    def decode_entries(self, data):
+        view = memoryview(data)
+        count = _UNSIGNED_INT.unpack_from(view, 0)[0]
+        offset = _UNSIGNED_INT.size
+
+        found = struct.unpack_from(f'!{count}?', view, offset)
+        offset += count
+
+        versions = struct.unpack_from(f'!{count}I', view, offset)
+        offset += 4 * count
+
+        entries = []
+        for is_found, version in zip(found, versions):
+            if not is_found:
+                entries.append(None)
+                continue
+
+            value, offset = self._decode(view, offset)
+            entries.append((version, value))
+
+        return entries
+
+    def encode_servers(self, servers):
+        buffer = bytearray(_UNSIGNED_INT.pack(len(servers)))
+
+        for address, port, sn_address, sn_port in servers:
+            buffer += _SERVER.pack(socket.inet_aton(address), port, socket.inet_aton(sn_address), sn_port)
+
+        return bytes(buffer)
+
+    def decode_servers(self, data):
+        view = memoryview(data)
+        count = _UNSIGNED_INT.unpack_from(view, 0)[0]
+
+        return [
+            (socket.inet_ntoa(address), port, socket.inet_ntoa(sn_address), sn_port)
+            for address, port, sn_address, sn_port in _SERVER.iter_unpack(view[_UNSIGNED_INT.size:_UNSIGNED_INT.size + count * _SERVER.size])
+        ]
+
+    def _decode_keys(self, view, offset, count):
+        lengths = struct.unpack_from(f'!{count}H', view, offset)
+        offset += 2 * count
+
+        blob = bytes(view[offset:offset + sum(lengths)])
+        offset += len(blob)
+
+        if blob.isascii():
+            blob = blob.decode('ascii')
+            keys = [blob[end - length:end] for length, end in zip(lengths, itertools.accumulate(lengths))]
+        else:
+            keys = [str(blob[end - length:end], 'utf-8') for length, end in zip(lengths, itertools.accumulate(lengths))]
+
+        return keys, offset
+
+    def _encode(self, value, buffer):
+        value_type = type(value)
+
+        if value is None:
+            buffer.append(NONE)
+        elif value_type is bool:
+            buffer.append(TRUE if value else FALSE)
+        elif value_type is int:
+            if -0x80 <= value < 0x80:
+                buffer += _SMALL_INT.pack(SMALL_INT, value)
+            elif -0x80000000 <= value < 0x80000000:
+                buffer += _INT.pack(INT, value)
+            elif -0x8000000000000000 <= value < 0x8000000000000000:
+                buffer += _LONG.pack(LONG, value)
+            else:
+                encoded = value.to_bytes((value.bit_length() + 8) // 8, 'big', signed=True)
+                buffer += _LENGTH.pack(BIG_INT, len(encoded))
+                buffer += encoded
+        elif value_type is float:
+            buffer += _FLOAT.pack(FLOAT, value)
+        elif value_type is str:
+            self._encode_sized(SHORT_STR, STR, value.encode('utf-8'), buffer)
+        elif value_type is bytes or value_type is bytearray:
+            self._encode_sized(SHORT_BYTES, BYTES, value, buffer)
+        elif value_type is list or value_type is tuple:
+            buffer += _LENGTH.pack(LIST if value_type is list else TUPLE, len(value))
+            for item in value:
+                self._encode(item, buffer)
+        elif value_type is dict:
+            buffer += _LENGTH.pack(DICT, len(value))
+            for key, item in value.items():
+                self._encode(key, buffer)
+                self._encode(item, buffer)
+        elif Constants.CODEC_PICKLE_FALLBACK:
+            self._encode_sized(PICKLED, PICKLED, pickle.dumps(value), buffer, short=False)
+        else:
+            raise UnsupportedValueException(value_type.__name__)
+
+    def _encode_sized(self, short_tag, tag, data, buffer, short=True):
+        if short and len(data) < 0x100:
+            buffer += _SHORT_LENGTH.pack(short_tag, len(data))
+        else:
+            buffer += _LENGTH.pack(tag, len(data))
+
+        buffer += data
+
+    def _decode(self, view, offset):
+        tag = view[offset]
+        offset += 1
+
+        if tag == SHORT_STR or tag == SHORT_BYTES:
+            length = view[offset]
+            offset += 1
+        elif tag == SMALL_INT:
+            return _SIGNED_BYTE.unpack_from(view, offset)[0], offset + 1
+        elif tag == INT:
+            return _SIGNED_INT.unpack_from(view, offset)[0], offset + 4
+        elif tag == STR or tag == BYTES or tag == BIG_INT or tag == PICKLED:
+            length = _UNSIGNED_INT.unpack_from(view, offset)[0]
+            offset += 4
+        elif tag == NONE:
+            return None, offset
+        elif tag == FALSE:
+            return False, offset
+        elif tag == TRUE:
+            return True, offset
+        elif tag == LONG:
+            return _SIGNED_LONG.unpack_from(view, offset)[0], offset + 8
+        elif tag == FLOAT:
+            return _DOUBLE.unpack_from(view, offset)[0], offset + 8
+        elif tag == LIST or tag == TUPLE:
+            length = _UNSIGNED_INT.unpack_from(view, offset)[0]
+            offset += 4
+
+            items = []
+            for _ in range(length):
+                item, offset = self._decode(view, offset)
+                items.append(item)
+
+            return (items if tag == LIST else tuple(items)), offset
+        elif tag == DICT:
+            length = _UNSIGNED_INT.unpack_from(view, offset)[0]
+            offset += 4
+
+            items = {}
+            for _ in range(length):
+                key, offset = self._decode(view, offset)
+                items[key], offset = self._decode(view, offset)
+
+            return items, offset
+        else:
+            raise ValueError(f'Unknown value tag {tag}')
+
+        data = view[offset:offset + length]
+        offset += length
+
+        if tag == SHORT_STR or tag == STR:
+            return str(data, 'utf-8'), offset
+        if tag == SHORT_BYTES or tag == BYTES:
+            return bytes(data), offset
+        if tag == BIG_INT:
+            return int.from_bytes(data, 'big', signed=True), offset
+        if not Constants.CODEC_PICKLE_FALLBACK:
+            raise UnsupportedValueException('pickle')
+
+        return pickle.loads(data), offset
+
+
+class PickleCodec:
+    def encode_value(self, value):
+        return pickle.dumps(value)
+
+    def decode_value(self, data):
+        return pickle.loads(data)
+
+    def encode_transaction(self, write_set, read_set, ranges=()):
+        return pickle.dumps((write_set, {key: version for key, (_, version) in read_set.items()}, list(ranges)))
+
+    def decode_transaction(self, data):
+        return pickle.loads(data)
+
+    def encode_keys(self, keys):
+        return pickle.dumps(list(keys))
+
+    def decode_keys(self, data):
+        return pickle.loads(data)
+
+    def encode_entries(self, entries):
+        return pickle.dumps(entries)
+
+    def decode_entries(self, data):
+        return pickle.loads(data)
+
+    def encode_servers(self, servers):
+        return pickle.dumps(list(servers))
+
+    def decode_servers(self, data):
+        return pickle.loads(data)
+
+
+CODECS = {
+    'binary': BinaryCodec,
+    'pickle': PickleCodec,
+}
+
+codec = CODECS[Constants.CODEC]()
@@ -0,0 +1,175 @@
+import itertools
+import socket
+import threading
+from concurrent.futures import Future
+
+from utils.constants import Constants
+from utils.exceptions import ServerBusyException
+from utils.framing import FrameReader, send_frame
+from utils.logger import logger
+
+
+class PooledConnection:
+    def __init__(self, pool, address, port):
+        self._pool = pool
+        self._address = address
+        self._port = port
+
+        self._socket = socket.create_connection((address, port), timeout=Constants.CLIENT_CONNECT_TIMEOUT)
+        self._socket.settimeout(None)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self._send_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending = {}
+        self._alive = True
+
+        threading.Thread(target=self._receive_responses, daemon=True).start()
+
+    @property
+    def alive(self):
+        return self._alive
+
+    def send(self, message_type, payload, request_id=0):
+        with self._send_lock:
+            send_frame(self._socket, message_type, payload, request_id)
+
+    def request(self, message_type, payload, request_id, future=None):
+        future = future or Future()
+
+        with self._pending_lock:
+            if not self._alive:
+                raise ConnectionError(f'Connection to {self._address}:{self._port} is closed')
+
+            self._pending[request_id] = (message_type, payload, future)
+
+        try:
+            self.send(message_type, payload, request_id)
+        except OSError:
+            self._fail()
+
+        return future
+
+    def close(self):
+        pending = self._shutdown()
+
+        for _, _, future in pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError(f'Connection to {self._address}:{self._port} was closed'))
+
+    def _receive_responses(self):
+        reader = FrameReader(self._socket)
+
+        try:
+            while True:
+                message_type, request_id, payload = reader.receive(keep=True)
+
+                if request_id == 0 and self._pool.on_message is not None:
+                    self._pool.on_message(self._address, self._port, message_type, payload)
+                    continue
+
+                with self._pending_lock:
+                    entry = self._pending.pop(request_id, None)
+
+                if entry is None:
+                    logger.warning(f'Received response for unknown request {request_id} from {self._address}:{self._port}')
+                    continue
+
+                if message_type == Constants.BUSY_RESPONSE:
+                    entry[2].set_exception(ServerBusyException())
+                else:
+                    entry[2].set_result(payload)
+        except OSError:
+            if self._alive:
+                logger.warning(f'Connection to {self._address}:{self._port} lost')
+                self._fail()
+
+    def _fail(self):
+        pending = self._shutdown()
+
+        if self._pool.on_lost is not None:
+            self._pool.on_lost(self._address, self._port)
+
+        if pending:
+            self._pool.resend(self._address, self._port, pending)
+
+    def _shutdown(self):
+        with self._pending_lock:
+            self._alive = False
+            pending, self._pending = self._pending, {}
+
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        self._socket.close()
+
+        return pending
+
+
+class ConnectionPool:
+    def __init__(self, on_message=None, on_lost=None):
+        self.on_message = on_message
+        self.on_lost = on_lost
+
+        self._connections = {}
+        self._lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+
+    def _next_request_id(self):
+        return next(self._request_ids) & 0xFFFFFFFF
+
+    def get(self, address, port):
+        with self._lock:
+            connection = self._connections.get((address, port))
+
+            if connection is None or not connection.alive:
+                logger.info(f'Opening pooled connection to {address}:{port}')
+                connection = PooledConnection(self, address, port)
+                self._connections[(address, port)] = connection
+
+            return connection
+
+    def send(self, address, port, message_type, payload, request_id=0):
+        try:
+            self.get(address, port).send(message_type, payload, request_id)
+        except OSError:
+            logger.warning(f'Pooled connection to {address}:{port} failed while sending. Retrying on a new connection.')
+            self.discard(address, port)
+            self.get(address, port).send(message_type, payload, request_id)
+
+    def request(self, address, port, message_type, payload):
+        request_id = self._next_request_id()
+
+        return self.get(address, port).request(message_type, payload, request_id)
+
+    def discard(self, address, port):
+        with self._lock:
+            connection = self._connections.pop((address, port), None)
+
+        if connection is not None:
+            connection.close()
+
+            if self.on_lost is not None:
+                self.on_lost(address, port)
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, {}
+
+        for connection in connections.values():
+            connection.close()
+
+    def resend(self, address, port, pending):
+        logger.info(f'Replacing connection to {address}:{port} and resending {len(pending)} pending requests')
+
+        try:
+            replacement = self.get(address, port)
+
+            for request_id, (message_type, payload, future) in pending.items():
+                replacement.request(message_type, payload, request_id, future)
+        except OSError as e:
+            for _, _, future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
@@ -7,26 +7,310 @@ class Constants:
     SERVER_KEY_VALUE_STORE_ADDRESS = '127.0.0.1'
     SERVER_KEY_VALUE_STORE_BASE_PORT = 5000
 
+    # Serving mode of the server KVS and the server discoverer -> 'threaded' - One thread per connection; 'asyncio' - Event loop with a bounded worker pool
+    SERVER_MODE = 'threaded'
+    SERVER_BACKLOG = 128
+    # Worker threads for blocking storage work in asyncio mode
+    SERVER_WORKERS = 8
+    # Requests in progress above which new requests are answered with a busy response in asyncio mode
+    SERVER_MAX_PENDING_REQUESTS = 256
+    # Clients with an open reply connection and writer thread on each server KVS. The least recently used one is closed above the limit
+    SERVER_MAX_REPLY_CONNECTIONS = 1024
+
+    # Read worker processes of each server KVS (0 disables them). They share the read port (SO_REUSEPORT) and answer reads from a
+    # memory mapped snapshot of the committed state, forwarding to the server KVS what the snapshot cannot answer
+    SERVER_READ_WORKERS = 0
+    SERVER_KEY_VALUE_STORE_READ_BASE_PORT = 5600
+    # Time (in seconds) a server KVS waits for its read workers to listen
+    SERVER_READ_WORKERS_STARTUP_TIMEOUT = 30
+
     SERVER_DISCOVERER_ADDRESS = '127.0.0.1'
     SERVER_DISCOVERER_PORT = 5100
 
+    # Interval (in seconds) before a lost membership subscription is attempted again
+    MEMBERSHIP_RESUBSCRIBE_INTERVAL = 1
+    # Time (in seconds) the server discoverer waits to send a membership update to a subscriber before dropping it
+    MEMBERSHIP_SEND_TIMEOUT = 5
+
     SERVER_SEQUENCER_ADDRESS = '127.0.0.1'
     SERVER_SEQUENCER_PORT = 5200
 
+    # Commits arriving within the window (in seconds), up to the batch size, share one sequence number message
+    SERVER_SEQUENCER_BATCH_WINDOW = 0.002
+    SERVER_SEQUENCER_BATCH_SIZE = 512
+    # Batches a server KVS could not receive are kept, up to SERVER_SEQUENCER_MAX_BACKLOG per server KVS, and sent again with the next batch or
+    # every SERVER_SEQUENCER_RETRY_INTERVAL seconds. A server KVS whose backlog overflows recovers the missed sequence numbers by state transfer
+    SERVER_SEQUENCER_MAX_BACKLOG = 1024
+    SERVER_SEQUENCER_RETRY_INTERVAL = 0.5
+
+    # Commit broadcast -> 'client' - The client sends each commit to every replica and to the sequencer, which answers the replicas with sequence numbers only;
+    # 'sequencer' - The client sends each commit only to the sequencer, which forwards it to every replica together with its sequence number
+    BROADCAST_MODE = 'client'
+
     SERVER_KEY_VALUE_STORE_SN_ADDRESS = '127.0.0.1'
     SERVER_KEY_VALUE_STORE_SN_PORT = 5300
 
-    # Request type (1B) -> 0 - Connect; 1 - Disconnect; 2 - Fetch all servers; Requester address (4B String), Requester port (2B), Sequence number listener address (4B String), Sequence number listener port (2B)
-    SERVER_DISCOVERER_REQUEST_FORMAT = '!B4sH4sH'
+    # Storage backend used by the replicas: 'shelve' or 'log' (log structured segments with a memory mapped index)
+    STORAGE_BACKEND = 'shelve'
+
+    # Interval (in seconds) between background flushes of committed items to disk
+    STORAGE_FLUSH_INTERVAL = 1
+
+    # Log structured storage: segments are sealed after STORAGE_SEGMENT_SIZE bytes and compacted when
+    # less than STORAGE_COMPACTION_THRESHOLD of their bytes are still live
+    STORAGE_SEGMENT_SIZE = 64 * 1024 * 1024
+    STORAGE_COMPACTION_INTERVAL = 30
+    STORAGE_COMPACTION_THRESHOLD = 0.5
+    STORAGE_INDEX_INITIAL_CAPACITY = 1024
+    # Keys per chunk of the sorted key index used by scans. Chunks are split at twice this size
+    STORAGE_KEY_INDEX_CHUNK_SIZE = 1024
+
+    # Log record -> crc32, version, key length, value length, followed by the key and the encoded value
+    STORAGE_RECORD_HEADER_FORMAT = '!IIHI'
+    # Index slot -> key hash, version, offset, segment
+    STORAGE_INDEX_SLOT_FORMAT = '!QIQI'
+    # Checkpoint -> segment and offset up to which the index is persisted
+    STORAGE_CHECKPOINT_FORMAT = '!IQ'
+
+    # Time (in seconds) after which a delivered transaction still waiting for its sequence number is reported in the log. Replicas never decide
+    # the outcome of a transaction outside the total order, and any waiting transaction may still be sequenced, so it is only dropped once
+    # it receives a sequence number older than the start of delivery. While HOLDBACK_MAX_PAYLOADS transactions are waiting, senders of
+    # new transactions are blocked until one of them is sequenced
+    HOLDBACK_TIMEOUT = 60
+    HOLDBACK_MAX_PAYLOADS = 100000
+    HOLDBACK_GC_INTERVAL = 1
+    # Time (in seconds) the next sequence number waits for its transaction before the replica transfers the state again from a peer,
+    # as happens to a replica that joins after a client broadcast the transaction to the replicas it knew
+    HOLDBACK_PAYLOAD_WAIT = 5
+
+    # Transactions delivered in sequence are persisted together: at most GROUP_COMMIT_MAX_SIZE per group,
+    # waiting at most GROUP_COMMIT_MAX_WAIT (in seconds) for the next transaction in order
+    GROUP_COMMIT_MAX_SIZE = 64
+    GROUP_COMMIT_MAX_WAIT = 0.002
+
+    # Multi-version storage: versions kept per key, time (in seconds) a snapshot stays active after its last read,
+    # interval between garbage collections of old versions and time a read waits for its snapshot to be applied
+    # (only in asyncio mode: a threaded server answers busy instead of blocking the connection)
+    MVCC_MAX_VERSIONS = 16
+    MVCC_SNAPSHOT_TTL = 30
+    MVCC_GC_INTERVAL = 1
+    MVCC_SNAPSHOT_WAIT = 5
+
+    # Shared read snapshot: initial number of index slots and attempts of a read racing with the publication of new versions.
+    # Its data file is compacted when less than READ_SNAPSHOT_COMPACTION_THRESHOLD of its bytes are live, once above READ_SNAPSHOT_COMPACTION_MIN_SIZE bytes
+    READ_SNAPSHOT_INITIAL_CAPACITY = 1024
+    READ_SNAPSHOT_READ_ATTEMPTS = 100
+    READ_SNAPSHOT_COMPACTION_THRESHOLD = 0.5
+    READ_SNAPSHOT_COMPACTION_MIN_SIZE = 16 * 1024 * 1024
+
+    # Shared read snapshot header -> Publication counter (odd while new versions are being published), published sequence number, capacity,
+    # next generation (files replaced when non-zero), ready. Followed by one pin per read worker
+    READ_SNAPSHOT_HEADER_FORMAT = '!QQQQB'
+    # Shared read snapshot pin -> Pin counter (odd while the pin is being written), oldest snapshot read by the read worker
+    READ_SNAPSHOT_PIN_FORMAT = '!QQ'
+    # Shared read snapshot slot -> key hash, version, sequence number of the committing transaction, offset of the record
+    READ_SNAPSHOT_SLOT_FORMAT = '!QIIQ'
+    # Shared read snapshot record -> key length, value length, followed by the key and the encoded value
+    READ_SNAPSHOT_RECORD_FORMAT = '!HI'
+
+    # State transfer: time (in seconds) a joining replica waits for its first sequence number before asking a peer for a snapshot,
+    # time allowed for the whole transfer, and number of items per snapshot chunk
+    STATE_TRANSFER_WAIT = 2
+    STATE_TRANSFER_TIMEOUT = 60
+    SNAPSHOT_CHUNK_SIZE = 10000
+
+    CLIENT_CONNECT_TIMEOUT = 5
+    CLIENT_REQUEST_TIMEOUT = 20
+    CLIENT_COMMIT_TIMEOUT = 30
+    # Interval (in seconds) between checks for commits that outlived CLIENT_COMMIT_TIMEOUT, whose outcome becomes unknown (None)
+    CLIENT_COMMIT_EXPIRY_INTERVAL = 1
+    CLIENT_BROADCAST_WORKERS = 8
+    # Initial and maximum wait (in seconds) before retrying a request answered with a busy response
+    CLIENT_BUSY_BACKOFF = 0.01
+    CLIENT_BUSY_MAX_BACKOFF = 1
+    # Initial and maximum wait (in seconds) after a request failed on every server KVS, and number of such passes before giving up
+    CLIENT_RETRY_BACKOFF = 0.1
+    CLIENT_RETRY_MAX_BACKOFF = 2
+    CLIENT_RETRY_MAX_PASSES = 5
+
+    # Replica selection: weight of the newest sample in the latency moving average, probability of trying a random replica,
+    # and time (in seconds) a replica that failed is avoided
+    CLIENT_REPLICA_EWMA_ALPHA = 0.2
+    CLIENT_REPLICA_EXPLORATION = 0.05
+    CLIENT_REPLICA_UNHEALTHY_PERIOD = 5
+
+    # Hedged reads: a second replica is asked when the first has not answered within the CLIENT_HEDGE_PERCENTILE latency
+    # of the last CLIENT_LATENCY_WINDOW reads
+    CLIENT_HEDGED_READS = False
+    CLIENT_HEDGE_PERCENTILE = 95
+    CLIENT_LATENCY_WINDOW = 1000
+    CLIENT_HEDGE_MIN_SAMPLES = 20
+    CLIENT_HEDGE_RECOMPUTE_INTERVAL = 20
+
+    # Before an update transaction is sent for sequencing, its read set is checked by one server KVS and the transaction is aborted locally
+    # when it read a version that was already overwritten
+    CLIENT_PREVALIDATE = False
+
+    # Client reads every item of a transaction from the snapshot pinned by its first read. A transaction left idle for longer than
+    # MVCC_SNAPSHOT_TTL may then fail with SnapshotTooOldException, so interactive clients keep it disabled
+    CLIENT_SNAPSHOT_READS = False
+
+    # Items per page requested by client scans
+    CLIENT_SCAN_PAGE_SIZE = 500
+
+    # Client read cache kept across transactions, bounded by number of entries and approximate size in bytes
+    CLIENT_CACHE_ENABLED = False
+    CLIENT_CACHE_MAX_ENTRIES = 10000
+    CLIENT_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+    # Metrics: counters and histograms kept by every process, exposed at http://METRICS_ADDRESS:<port>/metrics (Prometheus text)
+    # and /metrics.json. Clients have no endpoint. A summary is logged every METRICS_DUMP_INTERVAL seconds (0 disables it)
+    METRICS_ENABLED = True
+    METRICS_HTTP_ENABLED = True
+    METRICS_ADDRESS = '127.0.0.1'
+    METRICS_SERVER_KEY_VALUE_STORE_BASE_PORT = 5400
+    METRICS_SERVER_DISCOVERER_PORT = 5110
+    METRICS_SERVER_SEQUENCER_PORT = 5210
+    METRICS_DUMP_INTERVAL = 0
+    # Upper bounds (in seconds) of the latency histogram buckets and upper bounds of the size histogram buckets
+    METRICS_LATENCY_BUCKETS = [0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+    METRICS_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+
+    # Benchmark: example instance holding the local cluster data, time (in seconds) allowed for the cluster to start and stop,
+    # and items written per transaction while loading the initial data
+    BENCHMARK_EXAMPLE_INSTANCE = 'benchmark'
+    BENCHMARK_STARTUP_TIMEOUT = 30
+    BENCHMARK_STOP_TIMEOUT = 5
+    BENCHMARK_LOAD_BATCH_SIZE = 500
+
+    # Serialization of values, transactions and server lists -> 'binary' - Compact tagged encoding; 'pickle' - Python pickle
+    CODEC = 'binary'
+    # Allows the binary codec to pickle values of types it does not support. Only enable it on trusted networks
+    CODEC_PICKLE_FALLBACK = False
+
+    # Every message exchanged by the system is sent as one or more frames.
+    # Message type (1B), Flags (1B) -> bit 0 - More chunks of the same message follow, Request ID (4B Integer), Payload length (4B Integer)
+    FRAME_HEADER_FORMAT = '!BBII'
+    FRAME_MORE_CHUNKS = 0x01
+
+    # Payloads larger than the chunk size are streamed in several frames. Receive buffers above the retain size are released after use
+    FRAME_CHUNK_SIZE = 64 * 1024
+    FRAME_BUFFER_RETAIN_SIZE = 1024 * 1024
+    FRAME_MAX_PAYLOAD_SIZE = 256 * 1024 * 1024
+
+    # Message types
+    CONNECT_REQUEST = 0
+    DISCONNECT_REQUEST = 1
+    FETCH_SERVERS_REQUEST = 2
+    SUBSCRIBE_REQUEST = 3
+    SERVERS_RESPONSE = 4
+    MEMBERSHIP_UPDATE = 5
+    READ_REQUEST = 6
+    READ_RESPONSE = 7
+    DELIVER_REQUEST = 8
+    COMMIT_RESPONSE = 9
+    SEQUENCE_NUMBERS = 10
+    READ_MANY_REQUEST = 11
+    READ_MANY_RESPONSE = 12
+    BUSY_RESPONSE = 13
+    SNAPSHOT_REQUEST = 14
+    SNAPSHOT_RESPONSE = 15
+    SNAPSHOT_CHUNK = 16
+    CACHE_SUBSCRIBE_REQUEST = 17
+    INVALIDATION = 18
+    VALIDATE_REQUEST = 19
+    VALIDATE_RESPONSE = 20
+    READ_AT_REQUEST = 21
+    READ_AT_RESPONSE = 22
+    READ_MANY_AT_REQUEST = 23
+    READ_MANY_AT_RESPONSE = 24
+    BROADCAST_REQUEST = 25
+    SEQUENCED_TRANSACTIONS = 26
+    PREVALIDATE_REQUEST = 27
+    PREVALIDATE_RESPONSE = 28
+    SCAN_REQUEST = 29
+    SCAN_RESPONSE = 30
+
+    HEDGED_REQUESTS = (READ_REQUEST, READ_MANY_REQUEST, READ_AT_REQUEST, READ_MANY_AT_REQUEST)
+    # Requests sent to the read port of a server KVS when it runs read workers
+    READ_WORKER_REQUESTS = (READ_REQUEST, READ_MANY_REQUEST, READ_AT_REQUEST, READ_MANY_AT_REQUEST)
+
+    # Connect and disconnect payload -> Requester address (4B String), Requester port (2B), Sequence number listener address (4B String), Sequence number listener port (2B)
+    SERVER_DISCOVERER_REQUEST_FORMAT = '!4sH4sH'
+
+    # Membership update payload -> Epoch (4B Integer), Update type (1B) -> 0 - Snapshot of all servers; 1 - Server added; 2 - Server removed, followed by the serialized servers (a single server for additions and removals)
+    MEMBERSHIP_UPDATE_INITIAL_FORMAT = '!IB'
+
+    # Read request payload -> Variable name (UTF-8 String)
+
+    # Read response payload -> Item found (1B), Variable version (4B Integer), followed by the serialized value
+    READ_RESPONSE_INITIAL_FORMAT = '!BI'
+
+    # Busy response payload -> Empty. Sent instead of the expected response when the server is overloaded
+
+    # Read many request payload -> Serialized list of variable names
+    # Read many response payload -> Serialized list with the (version, value) of each requested variable, or nothing for variables not found
+
+    # Deliver request payload -> Requester address (4B String), Requester port (2B), Client transaction ID (4B Integer), followed by the serialized write set, read set versions
+    # and scanned key ranges
+    DELIVER_REQUEST_INITIAL_FORMAT = '!4sHI'
+
+    # Commit response payload -> Outcome (1B) -> 0 - Abort; 1 - Commit. The request ID carries the client transaction ID.
+    # Sent over a long-lived connection from each server KVS to the reply channel of the client
+    COMMIT_RESPONSE_FORMAT = '!B'
+
+    # Sequence numbers payload -> First sequence number of the batch (4B Integer), Number of transactions in the batch (4B Integer)
+    SERVER_SEQUENCER_BATCH_INITIAL_FORMAT = '!II'
+
+    # Requester address (4B String), Requester port (2B), Requester transaction ID (4B Integer). Repeated once per transaction in the batch, in sequence number order
+    SERVER_SEQUENCER_FORMAT = '!4sHI'
+
+    # Broadcast request payload -> Same as the deliver request payload. Sent only to the sequencer, which forwards the transaction to every server KVS
+
+    # Sequenced transactions payload -> First sequence number of the batch (4B Integer), Number of transactions in the batch (4B Integer), followed by one entry per transaction in sequence number order:
+    # Requester address (4B String), Requester port (2B), Requester transaction ID (4B Integer), Transaction size (4B Integer), followed by the serialized transaction.
+    # A size of 0 means the transaction was sent to the server KVS by the client and only its sequence number is carried
+    SEQUENCED_TRANSACTION_FORMAT = '!4sHII'
+
+    # Snapshot request payload -> Minimum sequence number the snapshot must include (4B Integer). Sent to the sequence number listener of a peer
+    SNAPSHOT_REQUEST_FORMAT = '!I'
+
+    # Snapshot response payload -> Status (1B: 0 sequence number unknown, 1 known, 2 the peer is stalled), Next sequence number to be delivered after
+    # the snapshot, or the sequence number whose transaction the stalled peer is missing (4B Integer). No chunks follow a stalled status
+    SNAPSHOT_RESPONSE_FORMAT = '!BI'
+
+    # Snapshot chunk payload -> Size of the serialized keys (4B Integer), followed by the serialized keys and the serialized (version, value) entries. An empty chunk ends the snapshot
+    SNAPSHOT_CHUNK_INITIAL_FORMAT = '!I'
+
+    # Read at request payload -> Snapshot sequence number (4B Integer, SNAPSHOT_LATEST to pin the latest applied one), followed by the variable name (UTF-8 String)
+    READ_AT_REQUEST_INITIAL_FORMAT = '!I'
+    SNAPSHOT_LATEST = 0xFFFFFFFF
+
+    # Read at response payload -> Status (1B) -> 0 - Not found; 1 - Found; 2 - Snapshot not available, Snapshot sequence number (4B Integer), Variable version (4B Integer), followed by the serialized value
+    READ_AT_RESPONSE_INITIAL_FORMAT = '!BII'
+
+    # Read many at request payload -> Snapshot sequence number (4B Integer), followed by the serialized list of variable names
+    # Read many at response payload -> Status (1B) -> 1 - Found; 2 - Snapshot not available, Snapshot sequence number (4B Integer), followed by the serialized entries
+    READ_MANY_AT_RESPONSE_INITIAL_FORMAT = '!BI'
+
+    # Validate request payload -> Serialized read-only transaction (empty write set, read set versions and scanned key ranges)
+    # Validate response payload -> Outcome (1B) -> 0 - Abort; 1 - Commit
+    VALIDATE_RESPONSE_FORMAT = '!B'
+
+    # Prevalidate request payload -> Serialized transaction (empty write set, read set versions and scanned key ranges)
+    # Prevalidate response payload -> Size of the serialized stale keys (4B Integer), followed by the serialized keys and their current serialized (version, value) entries.
+    # Stale keys include keys that appeared in a scanned range without being read
+    PREVALIDATE_RESPONSE_INITIAL_FORMAT = '!I'
 
-    # Request type (1B) -> 0 - Read, Variable name (255B String)
-    READ_REQUEST_FORMAT = '!B255s'
+    # Scan request payload -> Snapshot sequence number (4B Integer, SNAPSHOT_LATEST to pin the latest applied one), Maximum number of items (4B Integer),
+    # Range bounded (1B), followed by the serialized first key and, when bounded, the key where the range ends (excluded)
+    SCAN_REQUEST_INITIAL_FORMAT = '!IIB'
 
-    # Request type (1B) -> 1 - Deliver, Requester address (4B String), Requester port (2B), Client transaction ID (4B Integer)
-    DELIVER_REQUEST_INITIAL_FORMAT = '!B4sHI'
+    # Scan response payload -> Status (1B) -> 1 - Scanned; 2 - Snapshot not available, Snapshot sequence number (4B Integer), More items in the range (1B),
+    # Size of the serialized keys (4B Integer), followed by the serialized keys in order and their serialized (version, value) entries
+    SCAN_RESPONSE_INITIAL_FORMAT = '!BIBI'
 
-    # Variable version (4B Integer)
-    READ_RESPONSE_INITIAL_FORMAT = '!I'
+    # Cache subscribe request payload -> Empty. Sent by clients over their pooled connection to receive invalidations on it
 
-    # Requester address (4B String), Requester port (2B), Requester transaction ID (4B Integer), Sequence number (4B)
-    SERVER_SEQUENCER_FORMAT = '!4sHII'
+    # Invalidation payload -> Size of the serialized keys (4B Integer), followed by the serialized keys and the new version of each key (4B Integer each). Pushed with request ID 0
+    INVALIDATION_INITIAL_FORMAT = '!I'
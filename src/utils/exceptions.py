@@ -7,3 +7,33 @@ class ServerDiscovererNotFoundException(Exception):
     def __init__(self) -> None:
         msg = 'Server discoverer not found'
         super().__init__(msg)
+
+class UnsupportedValueException(Exception):
+    def __init__(self, value_type) -> None:
+        msg = f'Values of type {value_type} are not supported by the binary codec'
+        super().__init__(msg)
+
+class ServerBusyException(Exception):
+    def __init__(self) -> None:
+        msg = 'Server is overloaded'
+        super().__init__(msg)
+
+class StateTransferException(Exception):
+    def __init__(self) -> None:
+        msg = 'Could not transfer state from any live peer'
+        super().__init__(msg)
+
+class StalledDeliveryException(Exception):
+    def __init__(self, sequence_number) -> None:
+        msg = f'Every live peer is missing the transaction of sequence number {sequence_number}'
+        super().__init__(msg)
+
+class SnapshotTooOldException(Exception):
+    def __init__(self, sequence_number) -> None:
+        msg = f'Snapshot at sequence number {sequence_number} is not available'
+        super().__init__(msg)
+
+class ClusterStartupException(Exception):
+    def __init__(self, timeout) -> None:
+        msg = f'Local cluster did not start within {timeout} seconds'
+        super().__init__(msg)
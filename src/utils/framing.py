@@ -0,0 +1,99 @@
+import struct
+
+from utils.constants import Constants
+
+FRAME_HEADER_SIZE = struct.calcsize(Constants.FRAME_HEADER_FORMAT)
+
+
+def receive_into(connection, view):
+    received = 0
+
+    while received < len(view):
+        size = connection.recv_into(view[received:])
+
+        if size == 0:
+            raise ConnectionError('Connection closed by peer')
+
+        received += size
+
+
+def frame_parts(message_type, payload=b'', request_id=0):
+    if len(payload) <= Constants.FRAME_CHUNK_SIZE:
+        yield struct.pack(Constants.FRAME_HEADER_FORMAT, message_type, 0, request_id, len(payload)) + payload
+        return
+
+    view = memoryview(payload)
+
+    for offset in range(0, len(view), Constants.FRAME_CHUNK_SIZE):
+        chunk = view[offset:offset + Constants.FRAME_CHUNK_SIZE]
+        flags = Constants.FRAME_MORE_CHUNKS if offset + len(chunk) < len(view) else 0
+
+        yield struct.pack(Constants.FRAME_HEADER_FORMAT, message_type, flags, request_id, len(chunk))
+        yield chunk
+
+
+def send_frame(connection, message_type, payload=b'', request_id=0):
+    for part in frame_parts(message_type, payload, request_id):
+        connection.sendall(part)
+
+
+async def read_frame(reader):
+    chunks = []
+    size = 0
+
+    while True:
+        message_type, flags, request_id, length = struct.unpack(Constants.FRAME_HEADER_FORMAT, await reader.readexactly(FRAME_HEADER_SIZE))
+
+        size += length
+        if size > Constants.FRAME_MAX_PAYLOAD_SIZE:
+            raise ValueError(f'Frame payload of {size} bytes exceeds the maximum allowed size')
+
+        chunks.append(await reader.readexactly(length))
+
+        if not flags & Constants.FRAME_MORE_CHUNKS:
+            break
+
+    return message_type, request_id, chunks[0] if len(chunks) == 1 else b''.join(chunks)
+
+
+class FrameReader:
+    def __init__(self, connection):
+        self._connection = connection
+
+        self._header = bytearray(FRAME_HEADER_SIZE)
+        self._header_view = memoryview(self._header)
+        self._buffer = bytearray(Constants.FRAME_CHUNK_SIZE)
+
+    def receive(self, keep=False):
+        if len(self._buffer) > Constants.FRAME_BUFFER_RETAIN_SIZE:
+            self._buffer = bytearray(Constants.FRAME_CHUNK_SIZE)
+
+        size = 0
+
+        while True:
+            receive_into(self._connection, self._header_view)
+            message_type, flags, request_id, length = struct.unpack(Constants.FRAME_HEADER_FORMAT, self._header)
+
+            if size + length > Constants.FRAME_MAX_PAYLOAD_SIZE:
+                raise ValueError(f'Frame payload of {size + length} bytes exceeds the maximum allowed size')
+
+            if size + length > len(self._buffer):
+                buffer = bytearray(max(size + length, 2 * len(self._buffer)))
+                buffer[:size] = memoryview(self._buffer)[:size]
+                self._buffer = buffer
+
+            receive_into(self._connection, memoryview(self._buffer)[size:size + length])
+            size += length
+
+            if not flags & Constants.FRAME_MORE_CHUNKS:
+                break
+
+        payload = memoryview(self._buffer)[:size]
+
+        if keep:
+            if len(self._buffer) > Constants.FRAME_CHUNK_SIZE:
+                self._buffer = bytearray(Constants.FRAME_CHUNK_SIZE)
+            else:
+                payload = bytes(payload)
+
+        return message_type, request_id, payload
@@ -0,0 +1,68 @@
+import sys
+import threading
+from collections import OrderedDict
+
+
+class LruCache:
+    def __init__(self, max_entries, max_bytes):
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or not entry[2]:
+                return None
+
+            self._entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def put(self, key, value, version):
+        with self._lock:
+            current = self._entries.get(key)
+
+            if current is not None and current[1] > version:
+                return
+
+            self._store(key, (value, version, True, len(key) + sys.getsizeof(value)))
+
+    def invalidate(self, key, version=None):
+        with self._lock:
+            current = self._entries.get(key)
+
+            if version is None:
+                if current is not None:
+                    self._remove(key)
+                return
+
+            if current is not None and current[1] >= version:
+                return
+
+            self._store(key, (None, version, False, len(key)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _store(self, key, entry):
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = entry
+        self._size += entry[3]
+
+        while self._entries and (len(self._entries) > self._max_entries or self._size > self._max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted[3]
+
+    def _remove(self, key):
+        self._size -= self._entries.pop(key)[3]
@@ -0,0 +1,84 @@
+import socket
+import struct
+import threading
+import time
+import traceback
+
+from utils.codec import codec
+from utils.constants import Constants
+from utils.exceptions import ServerDiscovererNotFoundException
+from utils.framing import FrameReader, send_frame
+from utils.logger import logger
+
+
+class MembershipView:
+    def __init__(self):
+        self._servers = ()
+        self._epoch = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+        threading.Thread(target=self._receive_updates, daemon=True).start()
+
+        if not self._ready.wait(Constants.CLIENT_CONNECT_TIMEOUT):
+            raise ServerDiscovererNotFoundException()
+
+    @property
+    def epoch(self):
+        return self._epoch
+
+    def servers(self):
+        return list(self._servers)
+
+    def _receive_updates(self):
+        initial_size = struct.calcsize(Constants.MEMBERSHIP_UPDATE_INITIAL_FORMAT)
+
+        while True:
+            try:
+                with socket.create_connection((Constants.SERVER_DISCOVERER_ADDRESS, Constants.SERVER_DISCOVERER_PORT)) as s:
+                    send_frame(s, Constants.SUBSCRIBE_REQUEST)
+                    logger.info('Subscribed to membership updates from server discoverer')
+
+                    reader = FrameReader(s)
+
+                    while True:
+                        message_type, _, data = reader.receive()
+
+                        if message_type == Constants.BUSY_RESPONSE:
+                            logger.warning('Server discoverer is overloaded. Subscribing again later.')
+                            break
+
+                        epoch, update_type = struct.unpack(Constants.MEMBERSHIP_UPDATE_INITIAL_FORMAT, data[:initial_size])
+                        servers = codec.decode_servers(data[initial_size:])
+
+                        if update_type != 0 and self._epoch is None:
+                            logger.warning(f'Membership update of epoch {epoch} arrived before the membership snapshot. Subscribing again.')
+                            break
+
+                        if update_type != 0 and epoch != self._epoch + 1:
+                            logger.warning(f'Membership update of epoch {epoch} does not follow epoch {self._epoch}. Subscribing again.')
+                            break
+
+                        self._apply(epoch, update_type, servers)
+            except OSError as e:
+                logger.warning(f'Membership subscription to server discoverer lost: {e}')
+            except Exception as e:
+                logger.error(f'Membership update from server discoverer could not be decoded: {e}. Subscribing again.')
+                traceback.print_exc()
+
+            time.sleep(Constants.MEMBERSHIP_RESUBSCRIBE_INTERVAL)
+
+    def _apply(self, epoch, update_type, changed_servers):
+        with self._lock:
+            if update_type == 0:
+                servers = tuple(changed_servers)
+            elif update_type == 1:
+                servers = self._servers + tuple(changed_servers)
+            else:
+                servers = tuple(server for server in self._servers if server not in changed_servers)
+
+            self._servers = servers
+            self._epoch = epoch
+
+        logger.info(f'Membership view updated to epoch {epoch} -> {servers}')
+        self._ready.set()
@@ -0,0 +1,191 @@
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.constants import Constants
+from utils.logger import logger
+
+
+class Counter:
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def increment(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def snapshot(self):
+        return self._value
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self._count = 0
+        self._sum = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self._bounds, value)
+
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+
+    def snapshot(self):
+        with self._lock:
+            counts, count, total = list(self._counts), self._count, self._sum
+
+        summary = {'count': count, 'sum': total, 'buckets': list(zip(self._bounds + ['+Inf'], counts))}
+
+        for percentile in (50, 95, 99):
+            summary[f'p{percentile}'] = self._estimate(counts, count, percentile)
+
+        return summary
+
+    def _estimate(self, counts, count, percentile):
+        if count == 0:
+            return None
+
+        rank = count * percentile / 100
+        cumulative = 0
+
+        for bound, bucket_count in zip(self._bounds, counts):
+            cumulative += bucket_count
+
+            if cumulative >= rank:
+                return bound
+
+        return None
+
+
+class Metrics:
+    def __init__(self, role, port=None):
+        self._role = role
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+        if not Constants.METRICS_ENABLED:
+            return
+
+        if port is not None and Constants.METRICS_HTTP_ENABLED:
+            self._start_endpoint(port)
+
+        if Constants.METRICS_DUMP_INTERVAL > 0:
+            threading.Thread(target=self._dump_periodically, daemon=True).start()
+
+    def increment(self, name, amount=1):
+        if not Constants.METRICS_ENABLED:
+            return
+
+        counter = self._counters.get(name)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(name, Counter())
+
+        counter.increment(amount)
+
+    def observe(self, name, value, bounds=None):
+        if not Constants.METRICS_ENABLED:
+            return
+
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram(bounds or Constants.METRICS_LATENCY_BUCKETS))
+
+        histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = dict(self._histograms)
+
+        return {
+            'role': self._role,
+            'counters': {name: counter.snapshot() for name, counter in sorted(counters.items())},
+            'histograms': {name: histogram.snapshot() for name, histogram in sorted(histograms.items())},
+        }
+
+    def render(self):
+        snapshot = self.snapshot()
+        role = f'role="{self._role}"'
+        lines = []
+
+        for name, value in snapshot['counters'].items():
+            lines.append(f'# TYPE dur_{name} counter')
+            lines.append(f'dur_{name}{{{role}}} {value}')
+
+        for name, histogram in snapshot['histograms'].items():
+            lines.append(f'# TYPE dur_{name} histogram')
+            cumulative = 0
+
+            for bound, count in histogram['buckets']:
+                cumulative += count
+                lines.append(f'dur_{name}_bucket{{{role},le="{bound}"}} {cumulative}')
+
+            lines.append(f'dur_{name}_sum{{{role}}} {histogram["sum"]}')
+            lines.append(f'dur_{name}_count{{{role}}} {histogram["count"]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def _start_endpoint(self, port):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = metrics.render().encode('utf-8'), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = json.dumps(metrics.snapshot()).encode('utf-8'), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            server = ThreadingHTTPServer((Constants.METRICS_ADDRESS, port), Handler)
+        except OSError as e:
+            logger.warning(f'Metrics endpoint of {self._role} could not listen on port {port}: {e}')
+            return
+
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        logger.info(f'Metrics of {self._role} exposed at http://{Constants.METRICS_ADDRESS}:{port}/metrics')
+
+    def _dump_periodically(self):
+        while True:
+            time.sleep(Constants.METRICS_DUMP_INTERVAL)
+            snapshot = self.snapshot()
+
+            for name, value in snapshot['counters'].items():
+                logger.info(f'Metrics {self._role} -> {name} {value}')
+
+            for name, histogram in snapshot['histograms'].items():
+                if histogram['count']:
+                    logger.info(f'Metrics {self._role} -> {name} count {histogram["count"]}, mean {histogram["sum"] / histogram["count"]:.6f}, p50 <= {"+Inf" if histogram["p50"] is None else histogram["p50"]}, p99 <= {"+Inf" if histogram["p99"] is None else histogram["p99"]}')
@@ -0,0 +1,132 @@
+import hashlib
+import mmap
+import os
+import struct
+
+from utils.constants import Constants
+
+_HEADER = struct.Struct('!QQ')
+_SLOT = struct.Struct(Constants.STORAGE_INDEX_SLOT_FORMAT)
+
+
+def key_hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big') or 1
+
+
+def slot_entries(slots):
+    for hashed, version, offset, segment in _SLOT.iter_unpack(slots):
+        if hashed != 0:
+            yield version, segment, offset
+
+
+class MmapHashIndex:
+    def __init__(self, path, read_key):
+        self._path = path
+        self._read_key = read_key
+
+        if not os.path.isfile(path):
+            self._create(path, Constants.STORAGE_INDEX_INITIAL_CAPACITY)
+
+        self._open(path)
+
+    def __len__(self):
+        return self._count
+
+    def get(self, key):
+        slot = self._find(key, key_hash(key))
+
+        if slot is None:
+            return None
+
+        _, version, offset, segment = _SLOT.unpack_from(self._map, self._slot_offset(slot))
+        return version, segment, offset
+
+    def put(self, key, version, segment, offset):
+        if 10 * (self._count + 1) > 7 * self._capacity:
+            self._grow()
+
+        self._put(key, key_hash(key), version, segment, offset)
+
+    def entries(self):
+        return slot_entries(self.copy())
+
+    def copy(self):
+        return self._map[_HEADER.size:self._slot_offset(self._capacity)]
+
+    def flush(self):
+        _HEADER.pack_into(self._map, 0, self._capacity, self._count)
+        self._map.flush()
+
+    def close(self):
+        self.flush()
+        self._map.close()
+        os.close(self._file)
+
+    def _put(self, key, hashed, version, segment, offset):
+        slot = self._find(key, hashed, free=True)
+
+        if _SLOT.unpack_from(self._map, self._slot_offset(slot))[0] == 0:
+            self._count += 1
+
+        _SLOT.pack_into(self._map, self._slot_offset(slot), hashed, version, offset, segment)
+
+    def _find(self, key, hashed, free=False):
+        slot = hashed % self._capacity
+
+        while True:
+            current, _, offset, segment = _SLOT.unpack_from(self._map, self._slot_offset(slot))
+
+            if current == 0:
+                return slot if free else None
+            if current == hashed and key is not None and self._read_key(segment, offset) == key:
+                return slot
+
+            slot = (slot + 1) % self._capacity
+
+    def _grow(self):
+        entries = [
+            _SLOT.unpack_from(self._map, self._slot_offset(slot))
+            for slot in range(self._capacity)
+        ]
+
+        self.close()
+
+        temporary_path = f'{self._path}.tmp'
+        self._create(temporary_path, 2 * self._capacity)
+        self._open(temporary_path)
+
+        for hashed, version, offset, segment in entries:
+            if hashed != 0:
+                self._put(None, hashed, version, segment, offset)
+
+        self.flush()
+        os.fsync(self._file)
+        self.close()
+
+        os.replace(temporary_path, self._path)
+        self._sync_directory()
+
+        self._open(self._path)
+
+    def _create(self, path, capacity):
+        with open(path, 'wb') as file:
+            file.write(_HEADER.pack(capacity, 0))
+            file.truncate(_HEADER.size + capacity * _SLOT.size)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _open(self, path):
+        self._file = os.open(path, os.O_RDWR)
+        self._map = mmap.mmap(self._file, 0)
+        self._capacity, self._count = _HEADER.unpack_from(self._map, 0)
+
+    def _sync_directory(self):
+        directory = os.open(os.path.dirname(self._path) or '.', os.O_RDONLY)
+
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def _slot_offset(self, slot):
+        return _HEADER.size + slot * _SLOT.size
@@ -0,0 +1,16 @@
+import socket
+
+from utils.constants import Constants
+
+
+def create_listening_socket(address, port, reuse_port=False):
+    listening_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listening_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+    if reuse_port:
+        listening_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+    listening_socket.bind((address, port))
+    listening_socket.listen(Constants.SERVER_BACKLOG)
+
+    return listening_socket
@@ -0,0 +1,58 @@
+import random
+import threading
+import time
+from collections import deque
+
+from utils.constants import Constants
+
+
+class ReplicaSelector:
+    def __init__(self):
+        self._latencies = {}
+        self._unhealthy = {}
+        self._window = deque(maxlen=Constants.CLIENT_LATENCY_WINDOW)
+        self._hedge_delay = None
+        self._recorded = 0
+        self._lock = threading.Lock()
+
+    def choose(self, servers, exclude=()):
+        now = time.monotonic()
+
+        with self._lock:
+            candidates = [server for server in servers if server[:2] not in exclude]
+            healthy = [server for server in candidates if self._unhealthy.get(server[:2], 0) <= now]
+            candidates = healthy or candidates
+
+            if not candidates:
+                return None
+
+            unknown = [server for server in candidates if server[:2] not in self._latencies]
+            if unknown:
+                return random.choice(unknown)
+
+            if random.random() < Constants.CLIENT_REPLICA_EXPLORATION:
+                return random.choice(candidates)
+
+            return min(candidates, key=lambda server: self._latencies[server[:2]])
+
+    def record(self, server, latency):
+        with self._lock:
+            current = self._latencies.get(server[:2])
+            alpha = Constants.CLIENT_REPLICA_EWMA_ALPHA
+
+            self._latencies[server[:2]] = latency if current is None else alpha * latency + (1 - alpha) * current
+            self._unhealthy.pop(server[:2], None)
+
+            self._window.append(latency)
+            self._recorded += 1
+
+            if self._recorded % Constants.CLIENT_HEDGE_RECOMPUTE_INTERVAL == 0 and len(self._window) >= Constants.CLIENT_HEDGE_MIN_SAMPLES:
+                latencies = sorted(self._window)
+                self._hedge_delay = latencies[min(len(latencies) - 1, len(latencies) * Constants.CLIENT_HEDGE_PERCENTILE // 100)]
+
+    def record_failure(self, server):
+        with self._lock:
+            self._unhealthy[server[:2]] = time.monotonic() + Constants.CLIENT_REPLICA_UNHEALTHY_PERIOD
+
+    def hedge_delay(self):
+        return self._hedge_delay
@@ -0,0 +1,371 @@
+import mmap
+import os
+import struct
+import threading
+
+from utils.codec import codec
+from utils.constants import Constants
+from utils.mmap_hash_index import key_hash
+
+_HEADER = struct.Struct(Constants.READ_SNAPSHOT_HEADER_FORMAT)
+_PIN = struct.Struct(Constants.READ_SNAPSHOT_PIN_FORMAT)
+_SLOT = struct.Struct(Constants.READ_SNAPSHOT_SLOT_FORMAT)
+_RECORD = struct.Struct(Constants.READ_SNAPSHOT_RECORD_FORMAT)
+
+NO_PIN = 0xFFFFFFFFFFFFFFFF
+
+
+class SharedSnapshot:
+    def __init__(self, path, workers, writer=False):
+        self._path = path
+        self._workers = workers
+        self._map = None
+        self._pins = {}
+        self._lock = threading.Lock()
+
+        if writer:
+            for name in os.listdir(path):
+                if name.startswith('read-snapshot-'):
+                    os.remove(path / name)
+
+            self._generation = 0
+            self._create(1, Constants.READ_SNAPSHOT_INITIAL_CAPACITY, [], 0, False)
+        else:
+            self._open_latest()
+
+    def read(self, keys):
+        with self._lock:
+            return self._read(keys)
+
+    def published(self):
+        with self._lock:
+            return self._read_published()
+
+    def pin(self, worker, sequence_number):
+        with self._lock:
+            self._pins[worker] = sequence_number
+            self._follow(repin=True)
+
+    def pinned(self, workers=None):
+        workers = range(self._workers) if workers is None else workers
+
+        with self._lock:
+            pins = [self._pinned(self._map, worker) for worker in workers]
+
+        return [pin for pin in pins if pin != NO_PIN]
+
+    def rebuild(self, items, sequence_number):
+        entries = [(key, version, codec.encode_value(value), sequence_number) for key, (version, value) in items]
+        capacity = Constants.READ_SNAPSHOT_INITIAL_CAPACITY
+
+        while 10 * len(entries) > 7 * capacity:
+            capacity *= 2
+
+        with self._lock:
+            self._replace(capacity, entries, sequence_number, True)
+
+    def publish(self, entries, sequence_number):
+        with self._lock:
+            self._publish(entries, sequence_number)
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _read(self, keys):
+        for _ in range(Constants.READ_SNAPSHOT_READ_ATTEMPTS):
+            self._follow()
+
+            counter, published, _, _, ready = _HEADER.unpack_from(self._map, 0)
+            if not ready:
+                return None
+            if counter & 1:
+                continue
+
+            try:
+                entries = [self._lookup(key) for key in keys]
+            except (struct.error, ValueError, IndexError):
+                continue
+
+            if _HEADER.unpack_from(self._map, 0)[0] == counter:
+                return published, entries
+
+        return None
+
+    def _read_published(self):
+        for _ in range(Constants.READ_SNAPSHOT_READ_ATTEMPTS):
+            self._follow()
+
+            counter, published, _, _, ready = _HEADER.unpack_from(self._map, 0)
+            if not ready:
+                return None
+            if counter & 1:
+                continue
+
+            if _HEADER.unpack_from(self._map, 0)[0] == counter:
+                return published
+
+        return None
+
+    def _publish(self, entries, sequence_number):
+        if 10 * (self._count + len(entries)) > 7 * self._capacity:
+            self._replace(2 * self._capacity, self._live_entries(), self._published())
+
+        records = []
+        for key, version, value, commit_sequence_number in entries:
+            encoded_key = key.encode('utf-8')
+            encoded_value = codec.encode_value(value)
+            record = _RECORD.pack(len(encoded_key), len(encoded_value)) + encoded_key + encoded_value
+
+            records.append((key_hash(key), version, commit_sequence_number, self._data_size, len(record)))
+            os.write(self._data, record)
+            self._data_size += len(record)
+
+        self._advance_counter()
+
+        for hashed, version, commit_sequence_number, offset, size in records:
+            slot = self._find(hashed, free=True)
+            previous = _SLOT.unpack_from(self._map, self._slot_offset(slot))
+
+            if previous[0] == 0:
+                self._count += 1
+            else:
+                self._live_bytes -= self._record_size(previous[3])
+
+            _SLOT.pack_into(self._map, self._slot_offset(slot), hashed, version, commit_sequence_number, offset)
+            self._live_bytes += size
+
+        self._set_published(sequence_number)
+        self._advance_counter()
+
+        if self._data_size > Constants.READ_SNAPSHOT_COMPACTION_MIN_SIZE and self._live_bytes < Constants.READ_SNAPSHOT_COMPACTION_THRESHOLD * self._data_size:
+            self._replace(self._capacity, self._live_entries(), self._published())
+
+    def _close(self):
+        if self._map is not None:
+            self._map.close()
+            self._data_map.close()
+            os.close(self._index)
+            os.close(self._data)
+
+    def _lookup(self, key):
+        slot = self._find(key_hash(key))
+        if slot is None:
+            return None
+
+        _, version, commit_sequence_number, offset = _SLOT.unpack_from(self._map, self._slot_offset(slot))
+        key_length, value_length = _RECORD.unpack_from(self._data_view(offset + _RECORD.size), offset)
+
+        start = offset + _RECORD.size
+        data = self._data_view(start + key_length + value_length)
+
+        if str(data[start:start + key_length], 'utf-8') != key:
+            raise ValueError(f'Shared snapshot slot of item {key} points to another item')
+
+        return version, commit_sequence_number, data[start + key_length:start + key_length + value_length]
+
+    def _find(self, hashed, free=False):
+        slot = hashed % self._capacity
+
+        for _ in range(self._capacity):
+            current = _SLOT.unpack_from(self._map, self._slot_offset(slot))[0]
+
+            if current == hashed:
+                return slot
+            if current == 0:
+                return slot if free else None
+
+            slot = (slot + 1) % self._capacity
+
+        return None
+
+    def _data_view(self, end):
+        if end > len(self._data_map):
+            self._data_map.close()
+            self._data_map = mmap.mmap(self._data, 0, access=mmap.ACCESS_READ)
+
+        if end > len(self._data_map):
+            raise IndexError(f'Shared snapshot record ends at {end}, beyond the data written')
+
+        return self._data_map
+
+    def _record_size(self, offset):
+        key_length, value_length = _RECORD.unpack(os.pread(self._data, _RECORD.size, offset))
+        return _RECORD.size + key_length + value_length
+
+    def _live_entries(self):
+        entries = []
+
+        for slot in range(self._capacity):
+            hashed, version, commit_sequence_number, offset = _SLOT.unpack_from(self._map, self._slot_offset(slot))
+            if hashed == 0:
+                continue
+
+            key_length, value_length = _RECORD.unpack(os.pread(self._data, _RECORD.size, offset))
+            data = os.pread(self._data, key_length + value_length, offset + _RECORD.size)
+
+            entries.append((str(data[:key_length], 'utf-8'), version, data[key_length:], commit_sequence_number))
+
+        return entries
+
+    def _replace(self, capacity, entries, sequence_number, ready=None):
+        if ready is None:
+            ready = _HEADER.unpack_from(self._map, 0)[4]
+
+        previous_generation = self._generation
+
+        self._create(previous_generation + 1, capacity, entries, sequence_number, ready)
+
+        for suffix in ('index', 'data'):
+            path = self._file_path(previous_generation - 1, suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _create(self, generation, capacity, entries, sequence_number, ready):
+        index_path = self._file_path(generation, 'index')
+        data_path = self._file_path(generation, 'data')
+
+        data = bytearray()
+        slots = []
+        for key, version, encoded_value, commit_sequence_number in entries:
+            encoded_key = key.encode('utf-8')
+
+            slots.append((key_hash(key), version, commit_sequence_number, len(data)))
+            data += _RECORD.pack(len(encoded_key), len(encoded_value)) + encoded_key + encoded_value
+
+        with open(f'{data_path}.tmp', 'wb') as file:
+            file.write(data)
+
+        with open(f'{index_path}.tmp', 'wb') as file:
+            file.truncate(_HEADER.size + self._workers * _PIN.size + capacity * _SLOT.size)
+
+        previous_map = self._map
+        previous_files = (self._index, self._data, self._data_map) if previous_map is not None else None
+
+        self._generation = generation
+        self._index = os.open(f'{index_path}.tmp', os.O_RDWR)
+        self._data = os.open(f'{data_path}.tmp', os.O_RDWR | os.O_APPEND)
+        self._map = mmap.mmap(self._index, 0)
+        self._data_map = mmap.mmap(self._data, 0, access=mmap.ACCESS_READ) if data else mmap.mmap(-1, 1)
+        self._capacity = capacity
+        self._count = 0
+        self._data_size = len(data)
+        self._live_bytes = len(data)
+
+        _HEADER.pack_into(self._map, 0, 0, sequence_number, capacity, 0, ready)
+
+        for worker in range(self._workers):
+            self._pin(worker, None)
+
+        for hashed, version, commit_sequence_number, offset in slots:
+            slot = self._find(hashed, free=True)
+
+            if _SLOT.unpack_from(self._map, self._slot_offset(slot))[0] == 0:
+                self._count += 1
+
+            _SLOT.pack_into(self._map, self._slot_offset(slot), hashed, version, commit_sequence_number, offset)
+
+        if previous_map is None:
+            os.replace(f'{data_path}.tmp', data_path)
+            os.replace(f'{index_path}.tmp', index_path)
+        else:
+            counter, published, previous_capacity, _, previous_ready = _HEADER.unpack_from(previous_map, 0)
+            struct.pack_into('!Q', previous_map, 0, counter + 1)
+
+            for worker in range(self._workers):
+                self._pin(worker, self._pinned(previous_map, worker))
+
+            os.replace(f'{data_path}.tmp', data_path)
+            os.replace(f'{index_path}.tmp', index_path)
+
+            _HEADER.pack_into(previous_map, 0, counter + 2, published, previous_capacity, generation, previous_ready)
+
+            previous_map.close()
+            previous_files[2].close()
+            os.close(previous_files[0])
+            os.close(previous_files[1])
+
+    def _open(self, generation):
+        index = os.open(self._file_path(generation, 'index'), os.O_RDWR)
+
+        try:
+            self._data = os.open(self._file_path(generation, 'data'), os.O_RDONLY)
+        except FileNotFoundError:
+            os.close(index)
+            raise
+
+        self._generation = generation
+        self._index = index
+        self._map = mmap.mmap(self._index, 0)
+        self._data_map = mmap.mmap(self._data, 0, access=mmap.ACCESS_READ) if os.fstat(self._data).st_size else mmap.mmap(-1, 1)
+        self._capacity = _HEADER.unpack_from(self._map, 0)[2]
+
+    def _open_latest(self):
+        while True:
+            generations = [int(name.split('-')[2].split('.')[0]) for name in os.listdir(self._path) if name.startswith('read-snapshot-') and name.endswith('.index')]
+
+            try:
+                self._open(max(generations))
+                return
+            except FileNotFoundError:
+                continue
+
+    def _follow(self, repin=False):
+        while True:
+            counter, _, _, next_generation, _ = _HEADER.unpack_from(self._map, 0)
+
+            if next_generation:
+                self._close()
+
+                try:
+                    self._open(next_generation)
+                except FileNotFoundError:
+                    self._open_latest()
+
+                repin = True
+                continue
+
+            if not repin or not self._pins:
+                return
+            if counter & 1:
+                continue
+
+            for worker, sequence_number in self._pins.items():
+                self._pin(worker, sequence_number)
+
+            counter_after, _, _, next_generation, _ = _HEADER.unpack_from(self._map, 0)
+            if counter_after == counter and not next_generation:
+                return
+
+    def _pin(self, worker, sequence_number):
+        offset = _HEADER.size + worker * _PIN.size
+        counter = _PIN.unpack_from(self._map, offset)[0]
+
+        struct.pack_into('!Q', self._map, offset, counter + 1)
+        struct.pack_into('!Q', self._map, offset + 8, NO_PIN if sequence_number is None else sequence_number)
+        struct.pack_into('!Q', self._map, offset, counter + 2)
+
+    def _pinned(self, target, worker):
+        offset = _HEADER.size + worker * _PIN.size
+
+        while True:
+            counter, sequence_number = _PIN.unpack_from(target, offset)
+
+            if not counter & 1 and _PIN.unpack_from(target, offset)[0] == counter:
+                return sequence_number
+
+    def _advance_counter(self):
+        counter = _HEADER.unpack_from(self._map, 0)[0]
+        struct.pack_into('!Q', self._map, 0, counter + 1)
+
+    def _published(self):
+        return _HEADER.unpack_from(self._map, 0)[1]
+
+    def _set_published(self, sequence_number):
+        struct.pack_into('!Q', self._map, 8, sequence_number)
+
+    def _slot_offset(self, slot):
+        return _HEADER.size + self._workers * _PIN.size + slot * _SLOT.size
+
+    def _file_path(self, generation, suffix):
+        return self._path / f'read-snapshot-{generation}.{suffix}'
@@ -0,0 +1,66 @@
+import bisect
+import itertools
+
+from utils.constants import Constants
+
+
+class SortedKeyIndex:
+    def __init__(self, keys=()):
+        keys = sorted(set(keys))
+        size = Constants.STORAGE_KEY_INDEX_CHUNK_SIZE
+
+        self._chunks = [keys[start:start + size] for start in range(0, len(keys), size)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._count = len(keys)
+
+    def __len__(self):
+        return self._count
+
+    def add(self, key):
+        if not self._chunks:
+            self._chunks.append([key])
+            self._maxes.append(key)
+            self._count += 1
+            return
+
+        position = min(bisect.bisect_left(self._maxes, key), len(self._chunks) - 1)
+        chunk = self._chunks[position]
+
+        index = bisect.bisect_left(chunk, key)
+        if index < len(chunk) and chunk[index] == key:
+            return
+
+        chunk.insert(index, key)
+        self._maxes[position] = chunk[-1]
+        self._count += 1
+
+        if len(chunk) > 2 * Constants.STORAGE_KEY_INDEX_CHUNK_SIZE:
+            half = len(chunk) // 2
+
+            self._chunks[position:position + 1] = [chunk[:half], chunk[half:]]
+            self._maxes[position:position + 1] = [chunk[half - 1], chunk[-1]]
+
+    def range(self, start, end=None, limit=None):
+        return list(itertools.islice(self._iterate(start, end), limit))
+
+    def _iterate(self, start, end):
+        position = bisect.bisect_left(self._maxes, start)
+
+        for chunk in self._chunks[position:]:
+            for key in chunk[bisect.bisect_left(chunk, start):]:
+                if end is not None and key >= end:
+                    return
+
+                yield key
+
+
+def prefix_end(prefix):
+    prefix = prefix.rstrip(chr(0x10FFFF))
+    if not prefix:
+        return None
+
+    following = ord(prefix[-1]) + 1
+    if 0xD800 <= following <= 0xDFFF:
+        following = 0xE000
+
+    return prefix[:-1] + chr(following)
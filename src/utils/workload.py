@@ -0,0 +1,63 @@
+import random
+
+
+class ZipfianGenerator:
+    def __init__(self, items, theta, rng):
+        if not 0 <= theta < 1:
+            raise ValueError(f'Zipfian skew must be in [0, 1), got {theta}')
+
+        self._items = items
+        self._theta = theta
+        self._rng = rng
+
+        self._zeta = sum(1 / (i ** theta) for i in range(1, items + 1))
+        zeta_2 = sum(1 / (i ** theta) for i in range(1, min(items, 2) + 1))
+
+        self._alpha = 1 / (1 - theta)
+        self._eta = (1 - (2 / items) ** (1 - theta)) / (1 - zeta_2 / self._zeta) if items > 2 else 1
+
+    def next(self):
+        u = self._rng.random()
+        uz = u * self._zeta
+
+        if uz < 1:
+            return 0
+        if uz < 1 + 0.5 ** self._theta:
+            return min(1, self._items - 1)
+
+        return min(int(self._items * (self._eta * u - self._eta + 1) ** self._alpha), self._items - 1)
+
+
+class Workload:
+    def __init__(self, keys, read_proportion, operations, value_size, zipf_theta, seed=None):
+        self._keys = keys
+        self._read_proportion = read_proportion
+        self._operations = operations
+
+        self._rng = random.Random(seed)
+        self._value = self._rng.randbytes(value_size)
+        self._generator = ZipfianGenerator(keys, zipf_theta, self._rng)
+
+    @staticmethod
+    def key(index):
+        return f'user{index}'
+
+    def items(self):
+        for index in range(self._keys):
+            yield self.key(index), self._value
+
+    def transaction(self):
+        operations = []
+
+        for _ in range(self._operations):
+            key = self.key(self._generator.next())
+
+            if self._rng.random() < self._read_proportion:
+                operations.append(('read', key))
+            else:
+                operations.append(('write', key))
+
+        return operations
+
+    def value(self):
+        return self._value
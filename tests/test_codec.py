@@ -0,0 +1,53 @@
+import pytest
+
+from utils.codec import BinaryCodec, PickleCodec
+
+
+@pytest.fixture(params=[BinaryCodec, PickleCodec], ids=['binary', 'pickle'])
+def codec(request):
+    return request.param()
+
+
+@pytest.mark.parametrize('value', [
+    None, True, False, 0, -7, 2 ** 20, -2 ** 40, 2 ** 80, 1.5, '', 'ação', 'x' * 300, b'\x00\xff', b'y' * 300,
+    [1, 'two', None], (1, (2, 3)), {'nested': {'list': [1.0, b'bytes']}},
+])
+def test_value_round_trip(codec, value):
+    assert codec.decode_value(codec.encode_value(value)) == value
+
+
+def test_transaction_round_trip(codec):
+    write_set = {'a': 1, 'ção': 'value', 'c': [1, 2]}
+    read_set = {'a': (0, 3), 'd': ('old', 0)}
+
+    assert codec.decode_transaction(codec.encode_transaction(write_set, read_set)) == (write_set, {'a': 3, 'd': 0}, [])
+
+
+def test_transaction_round_trip_with_scanned_ranges(codec):
+    write_set = {'user:9': 'new'}
+    read_set = {'user:1': ('one', 4)}
+    ranges = [('user:', 'user;'), ('order:ção', None), ('', 'b')]
+
+    assert codec.decode_transaction(codec.encode_transaction(write_set, read_set, ranges)) == (write_set, {'user:1': 4}, ranges)
+
+
+def test_empty_transaction_round_trip(codec):
+    assert codec.decode_transaction(codec.encode_transaction({}, {}, [])) == ({}, {}, [])
+
+
+def test_keys_round_trip(codec):
+    keys = ['a', '', 'ção', 'k' * 1000]
+
+    assert codec.decode_keys(codec.encode_keys(keys)) == keys
+
+
+def test_entries_round_trip(codec):
+    entries = [(0, 'value'), None, (7, [1, 2]), None]
+
+    assert codec.decode_entries(codec.encode_entries(entries)) == entries
+
+
+def test_servers_round_trip(codec):
+    servers = [('127.0.0.1', 5000, '127.0.0.1', 5300), ('10.0.0.2', 5001, '10.0.0.2', 5301)]
+
+    assert codec.decode_servers(codec.encode_servers(servers)) == servers
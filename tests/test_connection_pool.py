@@ -0,0 +1,119 @@
+import socket
+
+import pytest
+
+from utils.connection_pool import ConnectionPool
+from utils.constants import Constants
+from utils.exceptions import ServerBusyException
+from utils.framing import FrameReader, send_frame
+
+TIMEOUT = 5
+
+
+@pytest.fixture
+def listener():
+    listener = socket.create_server(('127.0.0.1', 0))
+    listener.settimeout(TIMEOUT)
+
+    yield listener
+
+    listener.close()
+
+
+def accept(listener):
+    connection, _ = listener.accept()
+    connection.settimeout(TIMEOUT)
+
+    return connection, FrameReader(connection)
+
+
+def test_matches_out_of_order_responses_by_request_id(listener):
+    pool = ConnectionPool()
+    port = listener.getsockname()[1]
+
+    first = pool.request('127.0.0.1', port, Constants.READ_REQUEST, b'first')
+    second = pool.request('127.0.0.1', port, Constants.READ_REQUEST, b'second')
+    connection, reader = accept(listener)
+
+    requests = {}
+    for _ in range(2):
+        message_type, request_id, payload = reader.receive()
+        requests[bytes(payload)] = request_id
+        assert message_type == Constants.READ_REQUEST
+
+    assert requests[b'first'] != requests[b'second']
+
+    send_frame(connection, Constants.READ_RESPONSE, b'to second', requests[b'second'])
+    send_frame(connection, Constants.READ_RESPONSE, b'to first', requests[b'first'])
+
+    assert bytes(first.result(TIMEOUT)) == b'to first'
+    assert bytes(second.result(TIMEOUT)) == b'to second'
+
+    pool.close()
+    connection.close()
+
+
+def test_routes_unsolicited_and_busy_responses(listener):
+    messages = []
+    pool = ConnectionPool(on_message=lambda *message: messages.append(message))
+    port = listener.getsockname()[1]
+
+    future = pool.request('127.0.0.1', port, Constants.READ_REQUEST, b'key')
+    connection, reader = accept(listener)
+    _, request_id, _ = reader.receive()
+
+    send_frame(connection, Constants.INVALIDATION, b'pushed')
+    send_frame(connection, Constants.BUSY_RESPONSE, b'', request_id)
+
+    with pytest.raises(ServerBusyException):
+        future.result(TIMEOUT)
+
+    assert [(message[2], bytes(message[3])) for message in messages] == [(Constants.INVALIDATION, b'pushed')]
+
+    pool.close()
+    connection.close()
+
+
+def test_close_fails_pending_requests_and_closes_connections(listener):
+    lost = []
+    pool = ConnectionPool(on_lost=lambda address, port: lost.append(port))
+    port = listener.getsockname()[1]
+
+    future = pool.request('127.0.0.1', port, Constants.READ_REQUEST, b'key')
+    connection, reader = accept(listener)
+    reader.receive()
+
+    pool.close()
+
+    with pytest.raises(ConnectionError):
+        future.result(TIMEOUT)
+
+    assert connection.recv(1) == b''
+    assert lost == []
+
+    connection.close()
+
+
+def test_resends_pending_requests_on_a_new_connection(listener):
+    lost = []
+    pool = ConnectionPool(on_lost=lambda address, port: lost.append(port))
+    port = listener.getsockname()[1]
+
+    future = pool.request('127.0.0.1', port, Constants.READ_REQUEST, b'key')
+    connection, reader = accept(listener)
+    _, request_id, _ = reader.receive()
+    connection.close()
+
+    replacement, reader = accept(listener)
+    _, resent_id, payload = reader.receive()
+
+    assert resent_id == request_id
+    assert bytes(payload) == b'key'
+
+    send_frame(replacement, Constants.READ_RESPONSE, b'value', resent_id)
+
+    assert bytes(future.result(TIMEOUT)) == b'value'
+    assert lost == [port]
+
+    pool.close()
+    replacement.close()
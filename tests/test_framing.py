@@ -0,0 +1,96 @@
+import asyncio
+import socket
+
+import pytest
+
+from utils.constants import Constants
+from utils.framing import FrameReader, read_frame, send_frame
+
+
+class TrickleConnection:
+    def __init__(self, data, step):
+        self._data = memoryview(data)
+        self._step = step
+
+    def recv_into(self, view):
+        size = min(len(view), self._step, len(self._data))
+        view[:size] = self._data[:size]
+        self._data = self._data[size:]
+
+        return size
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(Constants, 'FRAME_CHUNK_SIZE', 16)
+
+
+@pytest.fixture
+def connections():
+    sender, receiver = socket.socketpair()
+
+    yield sender, receiver
+
+    sender.close()
+    receiver.close()
+
+
+def test_sends_large_payloads_in_chunks(small_chunks, connections):
+    sender, receiver = connections
+    payload = bytes(range(100))
+
+    send_frame(sender, Constants.READ_REQUEST, payload, 7)
+    send_frame(sender, Constants.READ_RESPONSE, b'short')
+
+    reader = FrameReader(receiver)
+
+    assert reader.receive(keep=True) == (Constants.READ_REQUEST, 7, payload)
+    assert reader.receive(keep=True) == (Constants.READ_RESPONSE, 0, b'short')
+
+
+def test_reassembles_frames_from_short_reads(small_chunks, connections):
+    sender, receiver = connections
+    payload = b'x' * 50
+
+    send_frame(sender, Constants.READ_REQUEST, payload, 3)
+    sender.shutdown(socket.SHUT_WR)
+    data = receiver.recv(4096)
+
+    message_type, request_id, received = FrameReader(TrickleConnection(data, 3)).receive()
+
+    assert (message_type, request_id, bytes(received)) == (Constants.READ_REQUEST, 3, payload)
+
+
+def test_reports_a_connection_closed_mid_frame(connections):
+    sender, receiver = connections
+    send_frame(sender, Constants.READ_REQUEST, b'payload')
+    data = receiver.recv(4096)
+
+    with pytest.raises(ConnectionError):
+        FrameReader(TrickleConnection(data[:-2], 4)).receive()
+
+
+def test_rejects_oversize_frames(small_chunks, connections, monkeypatch):
+    monkeypatch.setattr(Constants, 'FRAME_MAX_PAYLOAD_SIZE', 40)
+    sender, receiver = connections
+
+    send_frame(sender, Constants.READ_REQUEST, b'x' * 50)
+
+    with pytest.raises(ValueError):
+        FrameReader(receiver).receive()
+
+
+def test_reads_chunked_frames_from_streams(small_chunks, connections):
+    sender, receiver = connections
+    payload = bytes(range(100))
+
+    send_frame(sender, Constants.READ_REQUEST, payload, 9)
+
+    async def receive():
+        reader, writer = await asyncio.open_connection(sock=receiver)
+        frame = await read_frame(reader)
+        writer.close()
+
+        return frame
+
+    assert asyncio.run(receive()) == (Constants.READ_REQUEST, 9, payload)
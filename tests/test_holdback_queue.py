@@ -0,0 +1,235 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from models.holdback_queue import HoldbackQueue
+from utils.constants import Constants
+
+TIMEOUT = 2
+
+
+@pytest.fixture
+def delivered():
+    return queue.Queue()
+
+
+@pytest.fixture
+def holdback(delivered):
+    return HoldbackQueue(delivered.put)
+
+
+def delivered_sequence_numbers(delivered, count):
+    sequence_numbers = []
+
+    while len(sequence_numbers) < count:
+        sequence_numbers += [sequence_number for sequence_number, _, _ in delivered.get(timeout=TIMEOUT)]
+
+    return sequence_numbers
+
+
+def test_delivers_out_of_order_sequence_numbers_in_order(holdback, delivered):
+    holdback.start(1)
+
+    for sequence_number in (3, 1, 2):
+        holdback.add_sequenced_transactions([(sequence_number, f'key{sequence_number}', f'transaction{sequence_number}')])
+
+    assert delivered_sequence_numbers(delivered, 3) == [1, 2, 3]
+
+
+def test_waits_for_a_missing_sequence_number(holdback, delivered):
+    holdback.start(1)
+    holdback.add_sequenced_transactions([(2, 'key2', 'transaction2')])
+
+    with pytest.raises(queue.Empty):
+        delivered.get(timeout=0.1)
+
+    assert holdback.first_missing_sequence_number() == 2
+
+    holdback.add_sequenced_transactions([(1, 'key1', 'transaction1')])
+
+    assert delivered_sequence_numbers(delivered, 2) == [1, 2]
+    assert holdback.sequence_number == 3
+
+
+def test_delivers_when_the_sequence_number_arrives_before_the_payload(holdback, delivered):
+    holdback.start(1)
+    holdback.add_sequence_numbers([(1, 'key')])
+    holdback.add_transaction('key', 'transaction')
+
+    assert delivered.get(timeout=TIMEOUT) == [(1, 'key', 'transaction')]
+
+
+def test_delivers_when_the_payload_arrives_before_the_sequence_number(holdback, delivered):
+    holdback.start(1)
+    holdback.add_transaction('key', 'transaction')
+    holdback.add_sequence_numbers([(1, 'key')])
+
+    assert delivered.get(timeout=TIMEOUT) == [(1, 'key', 'transaction')]
+
+
+def test_ignores_sequence_numbers_before_the_start(holdback, delivered):
+    holdback.add_sequenced_transactions([(3, 'key3', 'transaction3'), (5, 'key5', 'transaction5')])
+    holdback.start(5)
+
+    holdback.add_sequenced_transactions([(4, 'key4', 'transaction4'), (6, 'key6', 'transaction6')])
+
+    assert delivered_sequence_numbers(delivered, 2) == [5, 6]
+
+    with pytest.raises(queue.Empty):
+        delivered.get(timeout=0.1)
+
+
+def test_starts_at_the_first_sequence_number_received(holdback, delivered):
+    holdback.add_sequenced_transactions([(7, 'key7', 'transaction7')])
+
+    assert holdback.wait_first_sequence_number(TIMEOUT) == 7
+
+    holdback.start()
+
+    assert delivered.get(timeout=TIMEOUT) == [(7, 'key7', 'transaction7')]
+
+
+def test_runs_captures_between_groups(holdback, delivered):
+    holdback.start(1)
+    capture = holdback.capture(lambda: 'captured', 3)
+
+    holdback.add_sequenced_transactions([(1, 'key1', 'transaction1'), (2, 'key2', 'transaction2')])
+
+    assert capture.result(timeout=TIMEOUT) == (3, 'captured')
+    assert delivered_sequence_numbers(delivered, 2) == [1, 2]
+
+
+def test_cancelled_captures_never_run(holdback, delivered):
+    holdback.start(1)
+    capture = holdback.capture(lambda: 'captured', 2)
+
+    assert holdback.cancel_capture(capture)
+    assert not holdback.cancel_capture(capture)
+
+    holdback.add_sequenced_transactions([(1, 'key1', 'transaction1')])
+
+    assert delivered_sequence_numbers(delivered, 1) == [1]
+    assert not capture.done()
+
+
+def test_reports_a_stall_before_the_requested_sequence_number(holdback, delivered):
+    holdback.start(1)
+    holdback.add_sequence_numbers([(1, 'key1')])
+
+    with pytest.raises(queue.Empty):
+        delivered.get(timeout=0.1)
+
+    assert holdback.stalled_before(2, TIMEOUT) is None
+    assert holdback.stalled_before(1, 0) is None
+    assert holdback.stalled_before(2, 0) == 1
+
+    assert holdback.suspend_if_stalled(0, 1) is None
+    assert holdback.suspend_if_stalled(0) == 1
+    assert holdback.stalled_before(2, 0) == 1
+
+
+def test_suspends_when_the_next_sequence_number_misses_its_transaction(holdback, delivered):
+    holdback.start(1)
+    holdback.add_sequence_numbers([(1, 'key1'), (2, 'key2')])
+    holdback.add_transaction('key2', 'transaction2')
+
+    with pytest.raises(queue.Empty):
+        delivered.get(timeout=0.1)
+
+    assert holdback.suspend_if_stalled(TIMEOUT) is None
+    assert holdback.suspend_if_stalled(0) == 1
+
+    holdback.add_transaction('key1', 'transaction1')
+
+    with pytest.raises(queue.Empty):
+        delivered.get(timeout=0.1)
+
+    holdback.add_sequenced_transactions([(3, 'key3', 'transaction3')])
+    holdback.start(3)
+
+    assert delivered.get(timeout=TIMEOUT) == [(3, 'key3', 'transaction3')]
+
+
+def test_suspends_when_the_next_sequence_number_never_arrives(holdback, delivered):
+    holdback.start(1)
+    holdback.add_sequenced_transactions([(2, 'key2', 'transaction2')])
+
+    with pytest.raises(queue.Empty):
+        delivered.get(timeout=0.1)
+
+    assert holdback.suspend_if_stalled(TIMEOUT) is None
+    assert holdback.stalled_before(2, 0) == 1
+    assert holdback.suspend_if_stalled(0) == 1
+
+
+def test_does_not_suspend_while_the_next_transaction_is_unsequenced(holdback, delivered):
+    holdback.start(1)
+    holdback.add_transaction('key1', 'transaction1')
+
+    with pytest.raises(queue.Empty):
+        delivered.get(timeout=0.1)
+
+    assert holdback.suspend_if_stalled(0) is None
+
+    holdback.add_sequence_numbers([(1, 'key1')])
+
+    assert delivered.get(timeout=TIMEOUT) == [(1, 'key1', 'transaction1')]
+
+
+def test_drops_transactions_sequenced_before_the_start(delivered):
+    dropped = []
+    holdback = HoldbackQueue(delivered.put, dropped.append)
+
+    holdback.add_transaction('key4', 'transaction4')
+    holdback.start(5)
+    holdback.add_sequence_numbers([(4, 'key4')])
+
+    assert dropped == [1]
+
+    holdback.add_sequenced_transactions([(5, 'key5', 'transaction5')])
+
+    assert delivered.get(timeout=TIMEOUT) == [(5, 'key5', 'transaction5')]
+
+
+def test_blocks_the_sender_over_the_limit(delivered, monkeypatch):
+    monkeypatch.setattr(Constants, 'HOLDBACK_MAX_PAYLOADS', 2)
+    dropped = []
+    holdback = HoldbackQueue(delivered.put, dropped.append)
+    holdback.start(1)
+
+    for position in range(1, 3):
+        holdback.add_transaction(f'key{position}', f'transaction{position}')
+
+    sender = threading.Thread(target=holdback.add_transaction, args=('key3', 'transaction3'))
+    sender.start()
+    sender.join(0.1)
+
+    assert sender.is_alive()
+    assert not holdback.add_transaction('key4', 'transaction4', block=False)
+
+    holdback.add_sequence_numbers([(1, 'key1')])
+    sender.join(TIMEOUT)
+
+    assert not sender.is_alive()
+
+    holdback.add_sequence_numbers([(2, 'key2'), (3, 'key3')])
+
+    assert delivered_sequence_numbers(delivered, 3) == [1, 2, 3]
+    assert dropped == []
+
+
+def test_keeps_transactions_waiting_for_their_sequence_numbers(delivered, monkeypatch):
+    monkeypatch.setattr(Constants, 'HOLDBACK_TIMEOUT', 0)
+    monkeypatch.setattr(Constants, 'HOLDBACK_GC_INTERVAL', 0.01)
+    dropped = []
+    holdback = HoldbackQueue(delivered.put, dropped.append)
+    holdback.start(1)
+
+    holdback.add_transaction('key1', 'transaction1')
+    time.sleep(0.1)
+    holdback.add_sequence_numbers([(1, 'key1')])
+
+    assert delivered.get(timeout=TIMEOUT) == [(1, 'key1', 'transaction1')]
+    assert dropped == []
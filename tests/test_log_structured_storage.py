@@ -0,0 +1,150 @@
+import os
+
+import pytest
+
+from models.log_structured_storage import LogStructuredStorage
+from utils.constants import Constants
+
+
+@pytest.fixture(autouse=True)
+def no_background_work(monkeypatch):
+    monkeypatch.setattr(Constants, 'STORAGE_FLUSH_INTERVAL', 3600)
+    monkeypatch.setattr(Constants, 'STORAGE_COMPACTION_INTERVAL', 3600)
+
+
+def crash(storage):
+    storage._closed.set()
+
+
+def segments(path):
+    return sorted(name for name in os.listdir(path) if name.startswith('segment-'))
+
+
+def test_reopens_with_the_flushed_items_after_a_crash(tmp_path):
+    storage = LogStructuredStorage(tmp_path)
+    storage.apply({'a': 'a0', 'b': 'b0'})
+    storage.apply({'a': 'a1'})
+    storage.flush()
+    storage.apply({'c': 'c0'})
+    crash(storage)
+
+    storage = LogStructuredStorage(tmp_path)
+
+    assert len(storage) == 2
+    assert storage.get_many(['a', 'b', 'c']) == [(1, 'a1'), (0, 'b0'), None]
+    assert storage.scan('', None, 10) == [('a', (1, 'a1')), ('b', (0, 'b0'))]
+
+    storage.close()
+
+
+def test_replays_the_records_after_the_checkpoint(tmp_path):
+    storage = LogStructuredStorage(tmp_path)
+    storage.apply({'a': 'a0', 'b': 'b0'})
+    storage.apply({'a': 'a1'})
+    storage.flush()
+    crash(storage)
+
+    os.remove(tmp_path / 'index')
+    storage._write_checkpoint(0, 0)
+
+    storage = LogStructuredStorage(tmp_path)
+
+    assert storage.get_many(['a', 'b']) == [(1, 'a1'), (0, 'b0')]
+
+    storage.apply({'b': 'b1'})
+
+    assert storage.get('b') == (1, 'b1')
+
+    storage.close()
+
+
+def test_truncates_a_torn_record_at_the_tail(tmp_path):
+    storage = LogStructuredStorage(tmp_path)
+    storage.apply({'a': 'a0'})
+    storage.flush()
+    crash(storage)
+
+    segment_path = tmp_path / segments(tmp_path)[-1]
+    size = os.path.getsize(segment_path)
+
+    with open(segment_path, 'ab') as file:
+        file.write(b'\x00\x00\x00\x01\x00\x00\x00\x00\x00\x05')
+
+    storage = LogStructuredStorage(tmp_path)
+
+    assert os.path.getsize(segment_path) == size
+    assert storage.get('a') == (0, 'a0')
+
+    storage.apply({'b': 'b0'})
+    storage.close()
+
+    storage = LogStructuredStorage(tmp_path)
+
+    assert storage.get_many(['a', 'b']) == [(0, 'a0'), (0, 'b0')]
+
+    storage.close()
+
+
+def test_compacts_segments_of_superseded_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(Constants, 'STORAGE_SEGMENT_SIZE', 256)
+    storage = LogStructuredStorage(tmp_path)
+
+    for round in range(20):
+        storage.apply({'a': f'a{round}', 'b': f'b{round}'})
+        storage.flush()
+
+    first_segment = segments(tmp_path)[0]
+    assert int(first_segment[8:-4]) < storage._checkpoint_segment
+
+    storage._compact(int(first_segment[8:-4]))
+
+    assert first_segment not in segments(tmp_path)
+    assert storage.get_many(['a', 'b']) == [(19, 'a19'), (19, 'b19')]
+
+    storage.close()
+    storage = LogStructuredStorage(tmp_path)
+
+    assert storage.get_many(['a', 'b']) == [(19, 'a19'), (19, 'b19')]
+
+    storage.close()
+
+
+def test_compaction_moves_the_live_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(Constants, 'STORAGE_SEGMENT_SIZE', 256)
+    monkeypatch.setattr(Constants, 'STORAGE_COMPACTION_THRESHOLD', 1.1)
+    storage = LogStructuredStorage(tmp_path)
+
+    storage.apply({'kept': 'value'})
+    for round in range(20):
+        storage.apply({'a': f'a{round}'})
+        storage.flush()
+
+    first_segment = segments(tmp_path)[0]
+    assert int(first_segment[8:-4]) < storage._checkpoint_segment
+
+    storage._compact(int(first_segment[8:-4]))
+
+    assert first_segment not in segments(tmp_path)
+    assert storage.get('kept') == (0, 'value')
+
+    storage.close()
+    storage = LogStructuredStorage(tmp_path)
+
+    assert storage.get_many(['kept', 'a']) == [(0, 'value'), (19, 'a19')]
+
+    storage.close()
+
+
+def test_grows_the_index_and_reopens(tmp_path, monkeypatch):
+    monkeypatch.setattr(Constants, 'STORAGE_INDEX_INITIAL_CAPACITY', 8)
+    storage = LogStructuredStorage(tmp_path)
+
+    storage.apply({f'key{position}': position for position in range(100)})
+    storage.close()
+
+    storage = LogStructuredStorage(tmp_path)
+
+    assert len(storage) == 100
+    assert storage.get_many([f'key{position}' for position in range(100)]) == [(0, position) for position in range(100)]
+
+    storage.close()
@@ -0,0 +1,65 @@
+from utils.lru_cache import LruCache
+
+
+def test_evicts_the_least_recently_used_entries():
+    cache = LruCache(2, 1024 * 1024)
+    cache.put('a', 'a0', 0)
+    cache.put('b', 'b0', 0)
+
+    assert cache.get('a') == ('a0', 0)
+
+    cache.put('c', 'c0', 0)
+
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == ('a0', 0)
+    assert cache.get('c') == ('c0', 0)
+
+
+def test_evicts_entries_over_the_size_limit():
+    cache = LruCache(100, 200)
+    cache.put('a', 'x' * 100, 0)
+    cache.put('b', 'y' * 100, 0)
+
+    assert cache.get('a') is None
+    assert cache.get('b') == ('y' * 100, 0)
+
+
+def test_ignores_puts_older_than_an_invalidation():
+    cache = LruCache(10, 1024 * 1024)
+    cache.put('a', 'a0', 0)
+    cache.invalidate('a', 2)
+
+    assert cache.get('a') is None
+
+    cache.put('a', 'a1', 1)
+
+    assert cache.get('a') is None
+
+    cache.put('a', 'a2', 2)
+
+    assert cache.get('a') == ('a2', 2)
+
+
+def test_ignores_invalidations_older_than_the_cached_version():
+    cache = LruCache(10, 1024 * 1024)
+    cache.put('a', 'a3', 3)
+    cache.invalidate('a', 2)
+    cache.invalidate('a', 3)
+
+    assert cache.get('a') == ('a3', 3)
+
+    cache.invalidate('a')
+
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_clear_drops_every_entry():
+    cache = LruCache(10, 1024 * 1024)
+    cache.put('a', 'a0', 0)
+    cache.invalidate('b', 1)
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.get('a') is None
@@ -0,0 +1,59 @@
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from utils.codec import codec
+from utils.constants import Constants
+from utils.framing import FrameReader, send_frame
+from utils.membership_view import MembershipView
+
+TIMEOUT = 2
+SERVER = ('127.0.0.1', 5000, '127.0.0.1', 5300)
+
+
+def update(epoch, update_type, servers):
+    return struct.pack(Constants.MEMBERSHIP_UPDATE_INITIAL_FORMAT, epoch, update_type) + codec.encode_servers(servers)
+
+
+@pytest.fixture
+def discoverer(monkeypatch):
+    listening_socket = socket.create_server(('127.0.0.1', 0))
+    monkeypatch.setattr(Constants, 'SERVER_DISCOVERER_ADDRESS', '127.0.0.1')
+    monkeypatch.setattr(Constants, 'SERVER_DISCOVERER_PORT', listening_socket.getsockname()[1])
+    monkeypatch.setattr(Constants, 'MEMBERSHIP_RESUBSCRIBE_INTERVAL', 0.01)
+
+    subscriptions = []
+    connections = []
+
+    def serve():
+        for messages in subscriptions:
+            connection, _ = listening_socket.accept()
+            connections.append(connection)
+            FrameReader(connection).receive()
+
+            for message in messages:
+                send_frame(connection, Constants.MEMBERSHIP_UPDATE, message)
+
+    yield subscriptions, lambda: threading.Thread(target=serve, daemon=True).start()
+
+    for connection in connections:
+        connection.close()
+    listening_socket.close()
+
+
+def test_subscribes_again_after_a_malformed_or_out_of_order_update(discoverer):
+    subscriptions, start = discoverer
+    subscriptions += [[b'\x00\x01'], [update(4, 1, [SERVER])], [update(4, 0, []), update(5, 1, [SERVER])]]
+    start()
+
+    view = MembershipView()
+    deadline = time.monotonic() + TIMEOUT
+
+    while view.epoch != 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert view.epoch == 5
+    assert view.servers() == [SERVER]
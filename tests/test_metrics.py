@@ -0,0 +1,16 @@
+import json
+
+from utils.metrics import Histogram
+
+
+def test_histogram_snapshot_is_valid_json():
+    histogram = Histogram([0.001, 0.01])
+
+    for value in (0.0005, 0.005, 0.5, 0.6):
+        histogram.observe(value)
+
+    snapshot = json.loads(json.dumps(histogram.snapshot(), allow_nan=False))
+
+    assert snapshot['buckets'] == [[0.001, 1], [0.01, 1], ['+Inf', 2]]
+    assert snapshot['p50'] == 0.01
+    assert snapshot['p99'] is None
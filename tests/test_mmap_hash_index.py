@@ -0,0 +1,108 @@
+import pytest
+
+import utils.mmap_hash_index
+from utils.constants import Constants
+from utils.mmap_hash_index import MmapHashIndex
+
+
+@pytest.fixture
+def small_capacity(monkeypatch):
+    monkeypatch.setattr(Constants, 'STORAGE_INDEX_INITIAL_CAPACITY', 8)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'index')
+
+
+@pytest.fixture
+def records():
+    return {}
+
+
+def open_index(path, records):
+    return MmapHashIndex(path, lambda segment, offset: records[(segment, offset)])
+
+
+def put(index, records, key, version, segment, offset):
+    records[(segment, offset)] = key
+    index.put(key, version, segment, offset)
+
+
+def test_put_and_get(path, records):
+    index = open_index(path, records)
+    put(index, records, 'a', 0, 1, 10)
+    put(index, records, 'b', 3, 2, 20)
+    put(index, records, 'a', 1, 1, 30)
+
+    assert len(index) == 2
+    assert index.get('a') == (1, 1, 30)
+    assert index.get('b') == (3, 2, 20)
+    assert index.get('c') is None
+
+    index.close()
+
+
+def test_keeps_keys_with_colliding_hashes_apart(small_capacity, path, records, monkeypatch):
+    monkeypatch.setattr(utils.mmap_hash_index, 'key_hash', lambda key: 42)
+    index = open_index(path, records)
+
+    for position in range(10):
+        put(index, records, f'key{position}', position, 0, position)
+
+    put(index, records, 'key3', 30, 1, 3)
+
+    assert len(index) == 10
+    assert index.get('key3') == (30, 1, 3)
+    assert all(index.get(f'key{position}') == (position, 0, position) for position in range(10) if position != 3)
+    assert index.get('other') is None
+
+    index.close()
+    index = open_index(path, records)
+
+    assert index.get('key9') == (9, 0, 9)
+
+    index.close()
+
+
+def test_grows_and_reopens(small_capacity, path, records):
+    index = open_index(path, records)
+
+    for position in range(100):
+        put(index, records, f'key{position}', position, 0, position)
+
+    index.close()
+    index = open_index(path, records)
+
+    assert len(index) == 100
+    assert all(index.get(f'key{position}') == (position, 0, position) for position in range(100))
+    assert sorted(index.entries()) == [(position, 0, position) for position in range(100)]
+
+    index.close()
+
+
+def test_interrupted_growth_keeps_the_previous_table(small_capacity, path, records, monkeypatch):
+    index = open_index(path, records)
+
+    for position in range(5):
+        put(index, records, f'key{position}', position, 0, position)
+
+    def crash(*_):
+        raise OSError('crash')
+
+    monkeypatch.setattr(MmapHashIndex, '_put', crash)
+
+    with pytest.raises(OSError):
+        put(index, records, 'key5', 5, 0, 5)
+
+    monkeypatch.undo()
+    index = open_index(path, records)
+
+    assert len(index) == 5
+    assert all(index.get(f'key{position}') == (position, 0, position) for position in range(5))
+
+    put(index, records, 'key5', 5, 0, 5)
+
+    assert index.get('key5') == (5, 0, 5)
+
+    index.close()
@@ -0,0 +1,69 @@
+import pytest
+
+from utils.constants import Constants
+from utils.replica_selector import ReplicaSelector
+
+FAST = ('127.0.0.1', 5000, '127.0.0.1', 5300)
+SLOW = ('127.0.0.1', 5001, '127.0.0.1', 5301)
+
+
+@pytest.fixture(autouse=True)
+def no_exploration(monkeypatch):
+    monkeypatch.setattr(Constants, 'CLIENT_REPLICA_EXPLORATION', 0)
+
+
+def test_tries_replicas_without_latency_first():
+    selector = ReplicaSelector()
+    selector.record(FAST, 0.001)
+
+    assert selector.choose([FAST, SLOW]) == SLOW
+
+
+def test_chooses_the_lowest_moving_average(monkeypatch):
+    monkeypatch.setattr(Constants, 'CLIENT_REPLICA_EWMA_ALPHA', 0.5)
+    selector = ReplicaSelector()
+    selector.record(FAST, 0.001)
+    selector.record(SLOW, 0.004)
+
+    assert selector.choose([FAST, SLOW]) == FAST
+
+    selector.record(FAST, 0.010)
+
+    assert selector.choose([FAST, SLOW]) == SLOW
+
+    selector.record(FAST, 0.001)
+    selector.record(FAST, 0.001)
+
+    assert selector.choose([FAST, SLOW]) == FAST
+
+
+def test_avoids_failed_replicas_unless_all_failed():
+    selector = ReplicaSelector()
+    selector.record(FAST, 0.001)
+    selector.record(SLOW, 0.004)
+    selector.record_failure(FAST)
+
+    assert selector.choose([FAST, SLOW]) == SLOW
+    assert selector.choose([FAST, SLOW], {SLOW[:2]}) == FAST
+    assert selector.choose([FAST, SLOW], {FAST[:2], SLOW[:2]}) is None
+
+    selector.record(FAST, 0.001)
+
+    assert selector.choose([FAST, SLOW]) == FAST
+
+
+def test_hedges_at_the_latency_percentile(monkeypatch):
+    monkeypatch.setattr(Constants, 'CLIENT_HEDGE_MIN_SAMPLES', 20)
+    monkeypatch.setattr(Constants, 'CLIENT_HEDGE_RECOMPUTE_INTERVAL', 10)
+    monkeypatch.setattr(Constants, 'CLIENT_HEDGE_PERCENTILE', 90)
+    selector = ReplicaSelector()
+
+    for sample in range(1, 11):
+        selector.record(FAST, sample / 1000)
+
+    assert selector.hedge_delay() is None
+
+    for sample in range(11, 21):
+        selector.record(FAST, sample / 1000)
+
+    assert selector.hedge_delay() == 0.019
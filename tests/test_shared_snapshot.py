@@ -0,0 +1,138 @@
+import os
+import threading
+
+import pytest
+
+from utils.codec import codec
+from utils.constants import Constants
+from utils.shared_snapshot import SharedSnapshot
+
+WORKERS = 2
+
+
+@pytest.fixture
+def writer(tmp_path):
+    writer = SharedSnapshot(tmp_path, WORKERS, writer=True)
+
+    yield writer
+
+    writer.close()
+
+
+@pytest.fixture
+def reader(tmp_path, writer):
+    reader = SharedSnapshot(tmp_path, WORKERS)
+
+    yield reader
+
+    reader.close()
+
+
+def decode(published, entries):
+    return published, [None if entry is None else (entry[0], entry[1], codec.decode_value(entry[2])) for entry in entries]
+
+
+def values(snapshot, keys):
+    return decode(*snapshot.read(keys))
+
+
+def generations(path):
+    return sorted(int(name.split('-')[2].split('.')[0]) for name in os.listdir(path) if name.endswith('.index'))
+
+
+def test_serves_nothing_until_the_first_rebuild(writer, reader):
+    assert reader.read(['a']) is None
+    assert reader.published() is None
+
+    writer.rebuild([('a', (0, 'a0'))], 1)
+
+    assert reader.published() == 1
+    assert values(reader, ['a', 'b']) == (1, [(0, 1, 'a0'), None])
+
+
+def test_reads_published_entries(writer, reader):
+    writer.rebuild([('a', (0, 'a0'))], 1)
+    writer.publish([('a', 1, 'a1', 1), ('b', 0, 'b0', 1)], 2)
+
+    assert values(reader, ['a', 'b']) == (2, [(1, 1, 'a1'), (0, 1, 'b0')])
+
+
+def test_does_not_read_while_an_update_is_in_progress(writer, reader):
+    writer.rebuild([('a', (0, 'a0'))], 1)
+    writer._advance_counter()
+
+    assert reader.read(['a']) is None
+    assert reader.published() is None
+
+    writer._advance_counter()
+
+    assert values(reader, ['a']) == (1, [(0, 1, 'a0')])
+
+
+def test_follows_generation_swaps(tmp_path, writer, reader):
+    writer.rebuild([('a', (0, 'a0'))], 1)
+
+    assert values(reader, ['a']) == (1, [(0, 1, 'a0')])
+
+    for sequence_number in range(2, 5):
+        writer.rebuild([('a', (sequence_number, f'a{sequence_number}'))], sequence_number)
+
+    assert generations(tmp_path) == [4, 5]
+    assert values(reader, ['a']) == (4, [(4, 4, 'a4')])
+
+
+def test_reads_consistent_entries_while_generations_swap(writer, reader):
+    writer.rebuild([('a', (0, 'a0')), ('b', (0, 'b0'))], 0)
+    done = threading.Event()
+
+    def rebuild():
+        for sequence_number in range(1, 200):
+            writer.rebuild([('a', (sequence_number, f'a{sequence_number}')), ('b', (sequence_number, f'b{sequence_number}'))], sequence_number)
+
+        done.set()
+
+    thread = threading.Thread(target=rebuild)
+    thread.start()
+
+    while not done.is_set():
+        snapshot = reader.read(['a', 'b'])
+        if snapshot is None:
+            continue
+
+        published, (a, b) = decode(*snapshot)
+
+        assert a == (published, published, f'a{published}')
+        assert b == (published, published, f'b{published}')
+
+    thread.join()
+
+    assert values(reader, ['a', 'b']) == (199, [(199, 199, 'a199'), (199, 199, 'b199')])
+
+
+def test_keeps_pins_across_generations(writer, reader):
+    reader.pin(1, 3)
+
+    assert writer.pinned() == [3]
+    assert writer.pinned([0]) == []
+
+    writer.rebuild([('a', (0, 'a0'))], 5)
+
+    assert writer.pinned() == [3]
+
+    reader.pin(1, None)
+
+    assert writer.pinned() == []
+
+
+def test_compacts_overwritten_entries(monkeypatch, tmp_path, writer, reader):
+    monkeypatch.setattr(Constants, 'READ_SNAPSHOT_COMPACTION_MIN_SIZE', 1024)
+    writer.rebuild([], 1)
+    reader.pin(0, 1)
+
+    for sequence_number in range(2, 200):
+        writer.publish([('a', sequence_number, 'x' * 32, sequence_number)], sequence_number)
+
+    assert max(generations(tmp_path)) > 2
+    assert os.path.getsize(tmp_path / f'read-snapshot-{max(generations(tmp_path))}.data') < 1024
+    assert values(reader, ['a']) == (199, [(199, 199, 'x' * 32)])
+    assert writer.pinned() == [1]
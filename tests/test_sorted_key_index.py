@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+from utils.constants import Constants
+from utils.sorted_key_index import SortedKeyIndex, prefix_end
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(Constants, 'STORAGE_KEY_INDEX_CHUNK_SIZE', 2)
+
+
+def test_ranges_are_sorted_and_half_open():
+    index = SortedKeyIndex(['c', 'a', 'e', 'b', 'd'])
+
+    assert index.range('') == ['a', 'b', 'c', 'd', 'e']
+    assert index.range('b', 'd') == ['b', 'c']
+    assert index.range('bb', 'dd') == ['c', 'd']
+    assert index.range('f') == []
+    assert index.range('a', 'a') == []
+
+
+def test_range_limit():
+    index = SortedKeyIndex(['a', 'b', 'c'])
+
+    assert index.range('a', limit=2) == ['a', 'b']
+    assert index.range('a', limit=0) == []
+
+
+def test_add_ignores_duplicates():
+    index = SortedKeyIndex(['a', 'a'])
+    index.add('b')
+    index.add('a')
+
+    assert len(index) == 2
+    assert index.range('') == ['a', 'b']
+
+
+def test_add_to_an_empty_index():
+    index = SortedKeyIndex()
+    index.add('z')
+
+    assert len(index) == 1
+    assert index.range('a') == ['z']
+
+
+def test_prefix_range():
+    index = SortedKeyIndex(['user:1', 'user:2', 'username', 'users', 'order:1'])
+
+    assert index.range('user:', 'user;') == ['user:1', 'user:2']
+
+
+def test_prefix_end():
+    assert prefix_end('user:') == 'user;'
+    assert prefix_end('a' + chr(0x10FFFF)) == 'b'
+    assert prefix_end(chr(0x10FFFF)) is None
+    assert prefix_end('') is None
+
+
+def test_prefix_end_skips_surrogates():
+    end = prefix_end('a' + chr(0xD7FF))
+
+    assert end == 'a' + chr(0xE000)
+    assert end.encode('utf-8')
+
+    index = SortedKeyIndex(['a' + chr(0xD7FF), 'a' + chr(0xD7FF) + 'b', 'a' + chr(0xE000)])
+
+    assert index.range('a' + chr(0xD7FF), end) == ['a' + chr(0xD7FF), 'a' + chr(0xD7FF) + 'b']
+
+
+def test_matches_a_sorted_list_across_chunk_splits(small_chunks):
+    generator = random.Random(0)
+    keys = [f'key{generator.randrange(500):03}' for _ in range(300)]
+
+    index = SortedKeyIndex(keys[:50])
+    for key in keys[50:]:
+        index.add(key)
+
+    expected = sorted(set(keys))
+
+    assert len(index) == len(expected)
+    assert index.range('') == expected
+
+    for _ in range(100):
+        start, end = sorted(f'key{generator.randrange(500):03}' for _ in range(2))
+
+        assert index.range(start, end) == [key for key in expected if start <= key < end]
+        assert index.range(start, limit=5) == [key for key in expected if key >= start][:5]
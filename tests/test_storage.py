@@ -0,0 +1,89 @@
+import pytest
+
+from models.log_structured_storage import LogStructuredStorage
+from models.shelve_storage import ShelveStorage
+from utils.constants import Constants
+from utils.exceptions import SnapshotTooOldException
+
+
+@pytest.fixture(params=[ShelveStorage, LogStructuredStorage], ids=['shelve', 'log'])
+def storage(request, tmp_path):
+    storage = request.param(tmp_path)
+    storage.apply({'a': 'a0', 'b': 'b0'})
+
+    yield storage
+
+    storage.close()
+
+
+def test_reads_the_version_visible_at_a_sequence_number(storage):
+    storage.apply({'a': 'a1'}, 5)
+    storage.apply({'b': 'b1'}, 10)
+
+    assert storage.get_at('a', 5) == (0, 'a0')
+    assert storage.get_at('a', 6) == (1, 'a1')
+    assert storage.get_at('b', 10) == (0, 'b0')
+    assert storage.get_at('b', 11) == (1, 'b1')
+    assert storage.get('b') == (1, 'b1')
+
+
+def test_keys_created_after_a_snapshot_are_not_visible(storage):
+    storage.apply({'c': 'c0'}, 5)
+
+    assert storage.get_at('c', 5) is None
+    assert storage.get_at('c', 6) == (0, 'c0')
+    assert storage.scan('', None, 10, 5) == [('a', (0, 'a0')), ('b', (0, 'b0'))]
+
+
+def test_collecting_keeps_the_versions_visible_at_the_horizon(storage):
+    storage.apply({'a': 'a1'}, 5)
+    storage.apply({'a': 'a2'}, 10)
+
+    assert storage.collect_versions(8) == 1
+    assert storage.get_at('a', 8) == (1, 'a1')
+    assert storage.get_at('a', 11) == (2, 'a2')
+
+    with pytest.raises(SnapshotTooOldException):
+        storage.get_at('a', 3)
+
+
+def test_horizon_never_moves_backwards(storage):
+    storage.apply({'a': 'a1'}, 5)
+    storage.apply({'b': 'b1'}, 10)
+    storage.apply({'b': 'b2'}, 12)
+
+    storage.collect_versions(13)
+
+    with pytest.raises(SnapshotTooOldException):
+        storage.get_at('a', 3)
+
+    storage.collect_versions(3)
+
+    assert storage.horizon == 13
+
+    with pytest.raises(SnapshotTooOldException):
+        storage.get_at('a', 3)
+
+    with pytest.raises(SnapshotTooOldException):
+        storage.get_at('b', 3)
+
+
+def test_trimmed_history_rejects_old_snapshots(storage):
+    for sequence_number in range(1, Constants.MVCC_MAX_VERSIONS + 2):
+        storage.apply({'a': f'a{sequence_number}'}, sequence_number)
+
+    assert storage.get_at('a', Constants.MVCC_MAX_VERSIONS + 2) == (Constants.MVCC_MAX_VERSIONS + 1, f'a{Constants.MVCC_MAX_VERSIONS + 1}')
+
+    with pytest.raises(SnapshotTooOldException):
+        storage.get_at('a', 1)
+
+
+def test_snapshot_ignores_later_writes(storage):
+    storage.flush()
+    storage.apply({'c': 'c0'})
+
+    with storage.snapshot() as snapshot:
+        storage.apply({'a': 'a1', 'd': 'd0'})
+        storage.flush()
+
+        assert sorted(snapshot) == [('a', (0, 'a0')), ('b', (0, 'b0')), ('c', (0, 'c0'))]